@@ -0,0 +1,13 @@
+"""ASGI entry point (async variant of the API)
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 4
+"""
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from backend.asgi_app import app
+
+application = app
@@ -0,0 +1,255 @@
+"""Columnar class analytics over saved student progress
+
+ProgressColumns keeps one flat numeric column per metric (quiz average,
+quiz count, practice accuracy, exercises completed, overall progress) plus
+a 64-bit weak-area and strong-area bitmask per student, instead of a dict
+per student. Class-level aggregates are then a pass over a few contiguous
+arrays: NumPy when it is installed, the stdlib array module otherwise.
+
+The mirror is rebuilt from progress.json (streamed, see progress_bulk) when
+the file changes, at most once every ITS_ANALYTICS_MAX_AGE seconds, so a
+busy classroom does not trigger a rebuild per saved answer. Rebuilds after
+the first run on a background thread and are swapped in when done; queries
+meanwhile answer from the previous snapshot instead of waiting.
+
+    columns = ProgressColumns.from_file("data/progress.json")
+    columns.summary()["overall_progress"]["mean"]
+"""
+import logging
+import os
+import threading
+import time
+from array import array
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python fallback over array.array
+    np = None
+
+logger = logging.getLogger("its.analytics")
+
+COLUMNS = ["quiz_average", "quiz_count", "practice_accuracy", "practice_completed", "overall_progress"]
+MAX_AREAS = 64
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def _record_values(record):
+    """Column values of one progress record (the ProgressManager layout)"""
+    quiz = record.get("quiz") or {}
+    practice = record.get("practice") or {}
+    return (
+        float(quiz.get("average_score") or 0),
+        float(quiz.get("total_quizzes") or 0),
+        float(practice.get("accuracy") or 0),
+        float(practice.get("completed_exercises") or 0),
+        float(record.get("overall_progress") or 0),
+    )
+
+
+class ProgressColumns:
+    """Immutable columnar snapshot of every student's progress"""
+
+    def __init__(self):
+        self.user_ids = []
+        self.columns = {name: array("d") for name in COLUMNS}
+        self.weak = array("Q")
+        self.strong = array("Q")
+        # Area name -> bit position in the weak/strong masks
+        self.areas = {}
+        self.built_at = None
+        # Snapshots never change, so whole-class results are computed once
+        self._summary = None
+        self._area_counts = None
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def _area_mask(self, names):
+        mask = 0
+        for name in names or ():
+            bit = self.areas.get(name)
+            if bit is None:
+                if len(self.areas) >= MAX_AREAS:
+                    continue
+                bit = self.areas[name] = len(self.areas)
+            mask |= 1 << bit
+        return mask
+
+    def append(self, user_id, record):
+        """Add one student's record (only while building)"""
+        self.user_ids.append(user_id)
+        for name, value in zip(COLUMNS, _record_values(record)):
+            self.columns[name].append(value)
+        patterns = record.get("learning_patterns") or {}
+        self.weak.append(self._area_mask(patterns.get("weak_areas")))
+        self.strong.append(self._area_mask(patterns.get("strong_areas")))
+
+    def finish(self):
+        """Freeze the columns, viewing them as NumPy arrays when available"""
+        if len(self.areas) >= MAX_AREAS:
+            logger.warning("More than %d distinct learning areas, extra areas are not counted", MAX_AREAS)
+        if np is not None:
+            # Zero-copy views over the array buffers
+            self.columns = {name: np.frombuffer(col, dtype=np.float64) for name, col in self.columns.items()}
+            self.weak = np.frombuffer(self.weak, dtype=np.uint64)
+            self.strong = np.frombuffer(self.strong, dtype=np.uint64)
+        self.built_at = datetime.now().isoformat()
+        return self
+
+    @classmethod
+    def from_items(cls, items):
+        """Build from (user_id, record) pairs"""
+        columns = cls()
+        for user_id, record in items:
+            if isinstance(record, dict):
+                columns.append(record.get("user_id", user_id), record)
+        return columns.finish()
+
+    @classmethod
+    def from_file(cls, path):
+        """Build from progress.json without loading it as one document"""
+        from backend.progress_bulk import iter_progress_items
+        return cls.from_items(iter_progress_items(path))
+
+    # ---------- aggregates ----------
+
+    def column_stats(self, name):
+        """count/mean/min/max/std and percentiles of one column"""
+        col = self.columns[name]
+        n = len(col)
+        if n == 0:
+            return {"count": 0, "mean": 0, "min": 0, "max": 0, "std": 0, "percentiles": {}}
+        if np is not None:
+            values = np.percentile(col, PERCENTILES)
+            return {
+                "count": n, "mean": float(col.mean()), "min": float(col.min()), "max": float(col.max()),
+                "std": float(col.std()), "percentiles": {str(p): float(v) for p, v in zip(PERCENTILES, values)},
+            }
+        ordered = sorted(col)
+        mean = sum(ordered) / n
+        std = (sum((v - mean) ** 2 for v in ordered) / n) ** 0.5
+        return {
+            "count": n, "mean": mean, "min": ordered[0], "max": ordered[-1], "std": std,
+            "percentiles": {str(p): _interpolate(ordered, p) for p in PERCENTILES},
+        }
+
+    def summary(self):
+        """Stats for every column, computed once per snapshot"""
+        if self._summary is None:
+            self._summary = {name: self.column_stats(name) for name in COLUMNS}
+        return self._summary
+
+    def histogram(self, name, bins=10, low=0.0, high=100.0):
+        """Counts per equal-width bin over [low, high]; values outside are clipped"""
+        col = self.columns[name]
+        edges = [low + (high - low) * i / bins for i in range(bins + 1)]
+        if np is not None:
+            counts, _ = np.histogram(np.clip(col, low, high), bins=bins, range=(low, high))
+            counts = [int(c) for c in counts]
+        else:
+            counts = [0] * bins
+            width = (high - low) / bins
+            for value in col:
+                index = int((min(max(value, low), high) - low) / width)
+                counts[min(index, bins - 1)] += 1
+        return {"column": name, "edges": edges, "counts": counts}
+
+    def area_counts(self):
+        """Students with each area marked weak / strong, computed once per snapshot"""
+        if self._area_counts is None:
+            counts = {}
+            for name, bit in self.areas.items():
+                if np is not None:
+                    flag = np.uint64(1 << bit)
+                    weak = int(np.count_nonzero(self.weak & flag))
+                    strong = int(np.count_nonzero(self.strong & flag))
+                else:
+                    flag = 1 << bit
+                    weak = sum(1 for mask in self.weak if mask & flag)
+                    strong = sum(1 for mask in self.strong if mask & flag)
+                counts[name] = {"weak": weak, "strong": strong}
+            self._area_counts = counts
+        return self._area_counts
+
+    def below(self, name, threshold, limit=50):
+        """Students whose column value is under a threshold (lowest first)"""
+        col = self.columns[name]
+        if np is not None:
+            index = np.flatnonzero(col < threshold)
+            index = index[np.argsort(col[index], kind="stable")][:limit]
+        else:
+            index = sorted((i for i, v in enumerate(col) if v < threshold), key=col.__getitem__)[:limit]
+        return [{"user_id": self.user_ids[i], name: float(col[i])} for i in index]
+
+
+def _interpolate(ordered, percentile):
+    """Linear-interpolated percentile of a sorted list (NumPy's default method)"""
+    position = (len(ordered) - 1) * percentile / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class ProgressAnalytics:
+    """Keeps a ProgressColumns snapshot in step with the progress file"""
+
+    def __init__(self, progress_file, max_age=None):
+        self.progress_file = str(progress_file)
+        if max_age is None:
+            max_age = float(os.environ.get("ITS_ANALYTICS_MAX_AGE", "5"))
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._columns = None
+        self._signature = None
+        self._checked_at = 0.0
+        self._rebuilding = False
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.progress_file)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _build(self):
+        started = time.perf_counter()
+        columns = ProgressColumns.from_file(self.progress_file)
+        logger.debug("Rebuilt analytics columns for %d students in %.1f ms",
+                     len(columns), (time.perf_counter() - started) * 1000)
+        return columns
+
+    def columns(self):
+        """The current snapshot; a rebuild starts in the background if the file changed (at most every max_age seconds)"""
+        now = time.monotonic()
+        if self._columns is not None and now - self._checked_at < self.max_age:
+            return self._columns
+        with self._lock:
+            if self._columns is None:
+                # Nothing to answer from yet: the first query waits for the build
+                signature = self._file_signature()
+                self._columns, self._signature = self._build(), signature
+                self._checked_at = time.monotonic()
+            elif now - self._checked_at >= self.max_age:
+                self._checked_at = now
+                signature = self._file_signature()
+                if signature != self._signature and not self._rebuilding:
+                    self._rebuilding = True
+                    threading.Thread(target=self._rebuild, args=(signature,), name="analytics-rebuild",
+                                     daemon=True).start()
+        return self._columns
+
+    def _rebuild(self, signature):
+        # signature is taken before reading, so a save during the build is picked up by the next check
+        try:
+            columns = self._build()
+            with self._lock:
+                self._columns, self._signature = columns, signature
+        except Exception as e:
+            logger.exception("Rebuilding analytics columns failed: %s", e)
+        finally:
+            self._rebuilding = False
+
+    def invalidate(self):
+        """Force a rebuild on the next query"""
+        self._checked_at = 0.0
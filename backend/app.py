@@ -1,94 +1,379 @@
 import sys
 import os
-from flask import Flask, jsonify, request, send_from_directory
+
+# Get absolute paths
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+
+# Run as a script (python backend/app.py): make the project packages importable.
+# Imported as backend.app (run.py, wsgi.py, asgi.py) the path is already set up.
+if __name__ == '__main__' and project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from flask import Blueprint, Flask, Response, g, jsonify, request, send_from_directory, stream_with_context
 from flask_cors import CORS
+import contextlib
+import hmac
 import json
+import logging
+import secrets
+import threading
+from datetime import datetime, timedelta
 from pathlib import Path
 from collections import defaultdict  # Added import
 
-# Get absolute paths
-current_dir = os.path.dirname(os.path.abspath(__file__))
-project_root = os.path.dirname(current_dir)
+from backend import metrics, profiling, pubsub, ratelimit, tenants
+from backend.cache_backend import CacheError
+from backend.logging_config import configure_logging, sample
+from backend.static_assets import StaticAssets, install_json_compression
 
-# Add both current dir and project root to Python path
-sys.path.insert(0, current_dir)  # Add backend directory
-sys.path.insert(0, project_root)  # Add project root
+data_dir = os.environ.get("ITS_DATA_DIR", os.path.join(project_root, "data"))
+# Multi-tenant mode (backend/tenants.py): one directory per school under ITS_TENANTS_DIR
+tenants_dir = os.environ.get("ITS_TENANTS_DIR")
+tenant_domain = os.environ.get("ITS_TENANT_DOMAIN")
+# Shared user/session/progress cache for several nodes (backend/cache_backend.py), e.g. redis://cache:6379
+cache_url = os.environ.get("ITS_CACHE_URL")
+# Guests (backend/guests.py) live in signed tokens until their first save and are removed after this long idle
+guest_tokens_enabled = os.environ.get("ITS_GUEST_TOKENS", "1") == "1"
+guest_idle_days = float(os.environ.get("ITS_GUEST_IDLE_DAYS", "30"))
+guest_gc_interval = float(os.environ.get("ITS_GUEST_GC_INTERVAL", "3600"))
+frontend_dir = os.path.join(project_root, "frontend")
 
-print(f" Debug: Current directory: {current_dir}")
-print(f"Debug: Project root: {project_root}")
-print(f" Debug: Python path: {sys.path}")
+logger = logging.getLogger("its.app")
 
-# First check if we can import auth directly
-print("\n Testing imports...")
+# Opt-in profiling: no hooks at all unless ITS_PROFILING=1
+profiling_enabled = os.environ.get("ITS_PROFILING", "0") == "1"
+# Sent as X-Admin-Token to bulk import/export all progress; unset, those endpoints are refused
+admin_token = os.environ.get("ITS_ADMIN_TOKEN")
 
-# Try to import auth module with different approaches
-auth_module = None
-progress_module = None
-tutor_module = None
+# Heavy subsystems are created on first use (or by preload()), not at import:
+# the ontology, the storage managers, the AI tutor and the static asset cache.
+_init_lock = threading.RLock()
+_auth_manager = None
+_progress_manager = None
+_ai_tutor = None
+_static_assets = None
+_static_assets_built = False
+_analytics = None
+_recommender = None
+_chat_pool = None
+_tenant_registry = None
+_cache_backend = None
+_rate_limits = None
+_secret_key = None
+_guest_collector = None
 ontology_loader = None
 
-# Method 1: direct file import for auth
-try:
-    import importlib.util
-    spec = importlib.util.spec_from_file_location("auth", os.path.join(current_dir, "auth.py"))
-    auth_module = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(auth_module)
-    print("Method 1: auth imported via file path")
-except Exception as e:
-    print(f"Method 1 failed: {e}")
-
-# import ontology loader
-try:
-    from ontology.ontology_loader import OntologyLoader
-    ontology_path = os.path.join(project_root, "ontology", "my_ontologyIts.xml")
-    print(f" OntologyLoader imported, loading from: {ontology_path}")
-    
-    if os.path.exists(ontology_path):
-        ontology_loader = OntologyLoader(ontology_path)
-        if ontology_loader.load_ontology():
-            print("Ontology loaded successfully!")
+# Ontology loading runs in a background thread (see start_ontology_loading) so the
+# server accepts connections straight away; routes fall back to hardcoded data
+# while ontology_loader is still None.
+ontology_ready = threading.Event()
+ONTOLOGY_ACCESSORS = [
+    "get_classes_by_category", "get_all_students", "get_all_shapes_with_formulas",
+    "get_learning_activities", "get_progress_data", "get_tutoring_sessions", "get_ai_tutor",
+]
+ontology_status = {"state": "pending", "error": None, "started_at": None, "finished_at": None}
+
+def load_ontology_in_background():
+    """Parse the ontology, then publish it to the routes and managers"""
+    global ontology_loader
+    ontology_status["state"] = "loading"
+    ontology_status["started_at"] = datetime.now().isoformat()
+    try:
+        from ontology.ontology_loader import OntologyLoader
+        # ITS_ONTOLOGY_PATH may point to a single OWL file, a directory of modules or a JSON manifest
+        ontology_path = os.environ.get("ITS_ONTOLOGY_PATH", os.path.join(project_root, "ontology", "my_ontologyIts.xml"))
+        logger.info("Loading ontology from: %s", ontology_path)
+        
+        if os.path.exists(ontology_path):
+            loader = OntologyLoader(ontology_path)
+            with metrics.timed("ontology.load_ontology"):
+                loaded = loader.load_ontology()
+            if loaded:
+                logger.info("Ontology loaded successfully")
+                if profiling_enabled:
+                    profiling.wrap_sections(loader, ONTOLOGY_ACCESSORS, "ontology")
+                # Publish, then wire the managers that already exist
+                # (managers created later pick the loader up themselves)
+                with _init_lock:
+                    ontology_loader = loader
+                    wire_ontology(_ai_tutor, _progress_manager, _recommender, loader)
+                    # Tenants without an ontology of their own share this one
+                    if _tenant_registry is not None:
+                        for tenant in _tenant_registry.tenants():
+                            if not tenant.ontology_path:
+                                wire_tenant_ontology(tenant, loader)
+                ontology_status["state"] = "loaded"
+            else:
+                logger.warning("Ontology loading failed, serving fallback data")
+                ontology_status["state"] = "failed"
         else:
-            print("Ontology loading failed")
-    else:
-        print(f" Ontology file not found at: {ontology_path}")
-        ontology_loader = None
-except ImportError as e:
-    print(f" OntologyLoader import failed: {e}")
-    ontology_loader = None
-except Exception as e:
-    print(f" Ontology error: {e}")
-    ontology_loader = None
-
-# Create the Flask app
-app = Flask(__name__, 
-            static_folder='../frontend',
-            template_folder='../frontend')
-CORS(app)
-
-# If auth_module was imported successfully, use it
-if auth_module:
-    auth_manager = auth_module.AuthManager()
-    print(" AuthManager created successfully")
-else:
-    # Create a dummy AuthManager
-    print(" Creating dummy AuthManager")
-    class AuthManager:
-        def create_guest_user(self):
-            return {"user_id": "guest_001", "name": "Guest", "type": "guest"}
-        def login_user(self, username):
-            return {"user_id": f"student_{username}", "name": username, "type": "student"}
-    auth_manager = AuthManager()
+            logger.warning("Ontology file not found at: %s", ontology_path)
+            ontology_status["state"] = "failed"
+            ontology_status["error"] = "Ontology file not found"
+    except ImportError as e:
+        logger.error("OntologyLoader import failed: %s", e)
+        ontology_status["state"] = "failed"
+        ontology_status["error"] = str(e)
+    except Exception as e:
+        logger.exception("Ontology error: %s", e)
+        ontology_status["state"] = "failed"
+        ontology_status["error"] = str(e)
+    finally:
+        ontology_status["finished_at"] = datetime.now().isoformat()
+        ontology_ready.set()
+
+def start_ontology_loading():
+    """Start the background ontology load (once)"""
+    if ontology_status["state"] != "pending":
+        return
+    with _init_lock:
+        if ontology_status["state"] != "pending":
+            return
+        ontology_status["state"] = "loading"
+    thread = threading.Thread(target=load_ontology_in_background, name="ontology-loader", daemon=True)
+    thread.start()
+
+def wire_ontology(tutor, progress_manager, recommender, loader, directory=None):
+    """Hand a freshly loaded ontology to the subsystems that already exist
+    (subsystems created later pick the loader up themselves)"""
+    if tutor is not None:
+        tutor.load_from_ontology(loader)
+    if progress_manager is not None:
+        progress_manager.ontology_loader = loader
+    if recommender is not None:
+        recommender.set_bank(build_item_bank(loader, directory))
+
+def wire_tenant_ontology(tenant, loader):
+    """wire_ontology() for a tenant's subsystems"""
+    components = tenant.components
+    directory = tenant.data_dir if tenant.ontology_path else None
+    wire_ontology(components.get("tutor"), components.get("progress"), components.get("recommender"), loader, directory)
+
+# ==================== TENANTS ====================
+
+def get_tenant_registry():
+    """The open tenants (backend/tenants.py); None unless ITS_TENANTS_DIR is set"""
+    global _tenant_registry
+    if _tenant_registry is None and tenants_dir:
+        with _init_lock:
+            if _tenant_registry is None:
+                _tenant_registry = tenants.TenantRegistry(tenants_dir, on_ontology_loaded=wire_tenant_ontology)
+    return _tenant_registry
+
+def get_cache_backend():
+    """The shared cache; None unless ITS_CACHE_URL is set"""
+    global _cache_backend
+    if _cache_backend is None and cache_url:
+        with _init_lock:
+            if _cache_backend is None:
+                from backend.cache_backend import from_url
+                _cache_backend = from_url(cache_url)
+                logger.info("Shared cache: %s", cache_url)
+    return _cache_backend
+
+def current_cache():
+    """The current tenant's namespace of the shared cache, or None"""
+    backend = get_cache_backend()
+    if backend is None:
+        return None
+    tenant = tenants.current()
+    return backend.namespace(f"its:{tenant.id if tenant is not None else 'default'}:")
+
+def current_ontology_loader():
+    """The ontology of the current tenant, or the default one (None while loading)"""
+    tenant = tenants.current()
+    if tenant is not None and tenant.ontology_path:
+        return tenant.ontology()
+    return ontology_loader
+
+def current_data_dir():
+    """Data directory of the current tenant, or the default one"""
+    tenant = tenants.current()
+    return tenant.data_dir if tenant is not None else data_dir
+
+def progress_channel():
+    """Pub/sub channel of the current tenant's progress updates"""
+    tenant = tenants.current()
+    return f"progress:{tenant.id}" if tenant is not None else "progress"
+
+def _check_update(progress):
+    """Raise ValueError for an update the event log and the store could not fold in"""
+    from backend.progress_bulk import validate_update
+    error = validate_update(progress)
+    if error:
+        raise ValueError(error)
 
 # Create progress manager use ontology data
 class ProgressManager:
-    def __init__(self):
-        self.ontology_loader = ontology_loader
+    def __init__(self, store=None):
+        # JSON progress store (backend/progress.py), None if it failed to import
+        self.store = store
+        # Set by the background ontology load once it finishes
+        self.ontology_loader = None
+        # Append-only learning history (backend/events.py), None if unavailable
+        self.events = None
+        # User x topic mastery, a projection of the event log (backend/mastery.py)
+        self.mastery = None
+        # Pub/sub channel for live updates (one per tenant)
+        self.channel = "progress"
+        # Shared cache: the record every node saves on top of and reads from
+        self.cache = None
+    
+    def _share(self, user_id, record, replace=True):
+        """Copy a record to the shared cache (replace=False: only if it has none yet)"""
+        if self.cache is None or not record:
+            return
+        try:
+            if replace:
+                self.cache.set_json(f"progress:{user_id}", record)
+            else:
+                self.cache.add_json(f"progress:{user_id}", record)
+        except CacheError as e:
+            logger.warning("Cache write of progress for %s failed: %s", user_id, e)
+    
+    @contextlib.contextmanager
+    def _shared_records(self, user_ids):
+        """Lock users' shared records for a read-modify-write across nodes
+        
+        Yields {user_id: record} from the cache for the store to save on top of (empty without a
+        cache); the records put back into it are shared before the locks are released."""
+        records = {}
+        if self.cache is None:
+            yield records
+            return
+        with contextlib.ExitStack() as locks:
+            try:
+                for user_id in sorted(set(user_ids)):
+                    locks.enter_context(self.cache.lock(f"progress:{user_id}"))
+                found = self.cache.get_many([f"progress:{user_id}" for user_id in set(user_ids)])
+                records.update((key.partition(":")[2], json.loads(value)) for key, value in found.items())
+                shared = True
+            except CacheError as e:
+                logger.warning("Shared progress unavailable, saving on this node only: %s", e)
+                shared = False
+            yield records
+            if shared:
+                for user_id, record in records.items():
+                    self._share(user_id, record)
+    
+    def _with_areas(self, user_id, progress):
+        """Add the user's strong/weak topics from the mastery matrix to an update
+        
+        Users with no topic-tagged answers keep the areas they already have."""
+        if self.mastery is None or not self.mastery.row_version(user_id):
+            return progress
+        strong, weak = self.mastery.classify(user_id)
+        return dict(progress, areas={"strong": strong, "weak": weak})
     
     def save_progress(self, user_id, progress):
-        print(f" Saving progress for {user_id}: {progress}")
+        logger.debug("Saving progress for %s: %s", user_id, progress)
+        _check_update(progress)
+        if self.events:
+            self.events.record_progress_update(user_id, progress)
+        if self.store:
+            with self._shared_records([user_id]) as records:
+                record = records[user_id] = self.store.save_progress(user_id, self._with_areas(user_id, progress), records)
+            self._publish(user_id, progress, record)
+            return record
+        return True
+    
+    def apply_updates(self, updates):
+        """Apply a batch of (user_id, progress) updates with one store write"""
+        for _, progress in updates:
+            _check_update(progress)
+        if self.events:
+            self.events.record_updates(updates)
+        if self.store:
+            user_ids = list(dict.fromkeys(user_id for user_id, _ in updates))
+            with self._shared_records(user_ids) as records:
+                applied = self.store.apply_updates(
+                    [(user_id, self._with_areas(user_id, progress)) for user_id, progress in updates], records)
+                if self.cache is not None:
+                    saved = self.store.load_progress()
+                    records.update((user_id, saved[user_id]) for user_id in user_ids)
+            pubsub.bus.publish(self.channel, {"type": "bulk", "updates": applied, "user_ids": user_ids[:100],
+                                            "ts": datetime.now().isoformat()})
+            return applied
+        return 0
+    
+    def _publish(self, user_id, progress, record):
+        """Tell live dashboards about a committed save (a small delta, not the whole record)"""
+        quiz, practice = record.get("quiz", {}), record.get("practice", {})
+        patterns = record.get("learning_patterns", {})
+        pubsub.bus.publish(self.channel, {
+            "type": "progress",
+            "user_id": user_id,
+            "update": {key: progress[key] for key in ("quiz", "practice", "topic") if key in progress},
+            "progress": {
+                "overall_progress": record.get("overall_progress", 0),
+                "quiz_average": quiz.get("average_score", 0),
+                "practice_accuracy": practice.get("accuracy", 0),
+                "strong_areas": patterns.get("strong_areas", []),
+                "weak_areas": patterns.get("weak_areas", []),
+            },
+            "ts": patterns.get("last_activity"),
+        })
+    
+    def transfer(self, from_id, to_id):
+        """Move a converted guest's saved progress to their student id; returns the merged record or None"""
+        if not self.store:
+            return None
+        with self._shared_records([from_id, to_id]) as records:
+            record = self.store.transfer(from_id, to_id, records)
+            records.pop(from_id, None)
+            if record is not None:
+                records[to_id] = record
+        if record is not None:
+            self._forget([from_id])
+        return record
+    
+    def remove_users(self, user_ids):
+        """Drop the saved progress of removed guests"""
+        removed = self.store.remove_users(user_ids) if self.store else 0
+        self._forget(user_ids)
+        return removed
+    
+    def _forget(self, user_ids):
+        if self.cache is None:
+            return
+        try:
+            for user_id in user_ids:
+                self.cache.delete(f"progress:{user_id}")
+        except CacheError as e:
+            logger.warning("Cache delete of progress failed: %s", e)
+    
+    def flush(self):
+        """Snapshot the event aggregates (progress writes are synchronous)"""
+        if self.events:
+            self.events.flush()
         return True
     
+    def get_history(self, user_id, full=False):
+        """Incrementally maintained aggregates (and optionally every event) for a user"""
+        if not self.events:
+            return None
+        history = {"aggregates": self.events.user_aggregates(user_id)}
+        if full:
+            history["events"] = self.events.user_events(user_id)
+        return history
+    
     def get_progress(self, user_id):
+        # Saved progress first: the shared copy (it may have been saved on another node), then ours
+        if self.cache is not None:
+            try:
+                record = self.cache.get_json(f"progress:{user_id}")
+                if record:
+                    return dict(record, from_ontology=False)
+            except CacheError as e:
+                logger.warning("Cache read of progress for %s failed: %s", user_id, e)
+        if self.store:
+            record = self.store.load_progress().get(user_id)
+            if record:
+                # Never over a record another node saved meanwhile
+                self._share(user_id, record, replace=False)
+                return dict(record, from_ontology=False)
+        
         # get progress from ontology 
         if self.ontology_loader and hasattr(self.ontology_loader, 'get_progress_data'):
             try:
@@ -103,121 +388,503 @@ class ProgressManager:
                             "from_ontology": True
                         }
             except Exception as e:
-                print(f"Error getting progress from ontology: {e}")
+                logger.error("Error getting progress from ontology: %s", e)
         
         # Fallback to default
         return {"quiz_score": 0, "practice_score": 0, "overall": 0, "from_ontology": False}
 
-# Create AI Tutor from ontology data
-class AITutor:
-    def __init__(self):
-        self.name = "AI Tutor"
-        self.specialization = "Geometry"
-        self.from_ontology = False
-        
-        # get AI Tutor from ontology
-        if ontology_loader and hasattr(ontology_loader, 'get_ai_tutor'):
+# ==================== LAZY SUBSYSTEMS ====================
+
+class DummyAuthManager:
+    """Stand-in used when backend/auth.py cannot be imported"""
+    def create_guest_user(self):
+        return {"user_id": "guest_001", "name": "Guest", "type": "guest"}
+    def login_user(self, username):
+        return {"user_id": f"student_{username}", "name": username, "type": "student"}
+    def get_session(self, session_id):
+        return None
+    def known_session(self, session_id):
+        return False
+    def materialize_guest(self, guest_id):
+        return False
+    def is_converted(self, guest_id):
+        return False
+
+def secret_key():
+    """ITS_SECRET_KEY (the same on every node), or a key kept in the data directory"""
+    global _secret_key
+    if _secret_key is None:
+        with _init_lock:
+            if _secret_key is None:
+                _secret_key = os.environ.get("ITS_SECRET_KEY") or _stored_secret_key(os.path.join(data_dir, "secret.key"))
+    return _secret_key
+
+def _stored_secret_key(path):
+    # Created once and shared by the workers of this host; other nodes need ITS_SECRET_KEY
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+        logger.warning("ITS_SECRET_KEY is not set, generated %s (set ITS_SECRET_KEY when running several nodes)", path)
+    except FileExistsError:
+        pass
+    with open(path) as f:
+        return f.read().strip()
+
+def create_guest_tokens(namespace):
+    """Guest token signer for one tenant; None with ITS_GUEST_TOKENS=0 (guests stored at login)"""
+    if not guest_tokens_enabled:
+        return None
+    try:
+        from backend.guests import GuestTokens
+    except ImportError as e:
+        logger.warning("guest tokens unavailable, storing guests at login: %s", e)
+        return None
+    return GuestTokens(secret_key(), f"its-guest:{namespace}", max_age=guest_idle_days * 86400)
+
+def create_auth_manager(directory, cache=None, guest_tokens=None):
+    """The JSON-file AuthManager over directory/users.json, sharing users and sessions through cache"""
+    try:
+        from backend.auth import AuthManager
+        manager = AuthManager(os.path.join(directory, "users.json"), cache, guest_tokens=guest_tokens)
+        metrics.instrument(manager, ["load_users", "save_users"], "auth")
+        logger.debug("AuthManager created")
+    except ImportError as e:
+        logger.warning("auth module unavailable, using dummy AuthManager: %s", e)
+        manager = DummyAuthManager()
+    if profiling_enabled:
+        profiling.wrap_sections(manager, ["load_users", "save_users", "create_guest_user", "login_user"], "auth")
+    return manager
+
+def get_auth_manager():
+    """The current tenant's AuthManager, created on first use"""
+    global _auth_manager
+    tenant = tenants.current()
+    if tenant is not None:
+        return tenant.component("auth", lambda tenant: create_auth_manager(
+            tenant.data_dir, current_cache(), create_guest_tokens(tenant.id)))
+    if _auth_manager is None:
+        with _init_lock:
+            if _auth_manager is None:
+                _auth_manager = create_auth_manager(data_dir, current_cache(), create_guest_tokens("default"))
+    return _auth_manager
+
+def create_progress_manager(directory, loader, channel="progress", cache=None):
+    """The progress manager (JSON store + event log + ontology fallback) over directory"""
+    store = None
+    try:
+        from backend.progress import ProgressManager as ProgressStore
+        store = ProgressStore(os.path.join(directory, "progress.json"))
+        metrics.instrument(store, ["load_progress", "save_progress_data"], "progress_store")
+    except ImportError as e:
+        logger.error("progress import failed: %s", e)
+    manager = ProgressManager(store)
+    manager.ontology_loader = loader
+    manager.channel = channel
+    manager.cache = cache
+    try:
+        from backend.events import EventStore
+        from backend.mastery import MasteryMatrix
+        mastery = MasteryMatrix()
+        manager.events = EventStore(os.path.join(directory, "events.ndjson"), projections={"mastery": mastery})
+        manager.mastery = mastery
+        metrics.instrument(manager.events, ["append", "record_progress_update", "catch_up", "snapshot"], "events")
+    except (ImportError, OSError) as e:
+        logger.error("event log unavailable: %s", e)
+    metrics.instrument(manager, ["get_progress", "save_progress", "flush"], "progress")
+    if profiling_enabled:
+        profiling.wrap_sections(manager, ["get_progress", "save_progress"], "progress")
+    return manager
+
+def get_progress_manager():
+    """The current tenant's progress manager, created on first use"""
+    global _progress_manager
+    tenant = tenants.current()
+    if tenant is not None:
+        return tenant.component("progress", lambda tenant: create_progress_manager(
+            tenant.data_dir, current_ontology_loader(), progress_channel(), current_cache()))
+    if _progress_manager is None:
+        with _init_lock:
+            if _progress_manager is None:
+                _progress_manager = create_progress_manager(data_dir, ontology_loader, cache=current_cache())
+    return _progress_manager
+
+def create_ai_tutor(loader):
+    """An AI tutor, named from the ontology if it is loaded"""
+    from backend.tutor import AITutor
+    tutor = AITutor()
+    logger.debug("AI tutor created with the %s matcher", tutor.matcher.name)
+    if loader:
+        tutor.load_from_ontology(loader)
+    return tutor
+
+def get_ai_tutor():
+    """The current tenant's AI tutor, created on first use and named from the ontology when loaded"""
+    global _ai_tutor
+    tenant = tenants.current()
+    if tenant is not None:
+        return tenant.component("tutor", lambda tenant: create_ai_tutor(current_ontology_loader()))
+    if _ai_tutor is None:
+        with _init_lock:
+            if _ai_tutor is None:
+                _ai_tutor = create_ai_tutor(ontology_loader)
+    return _ai_tutor
+
+def get_static_assets():
+    """Hashed/precompressed frontend files, built on first use; None serves from disk"""
+    global _static_assets, _static_assets_built
+    if not _static_assets_built:
+        with _init_lock:
+            if not _static_assets_built:
+                # ITS_STATIC_CACHE=0 serves files straight from disk (development)
+                if os.environ.get("ITS_STATIC_CACHE", "1") != "0":
+                    try:
+                        _static_assets = StaticAssets(frontend_dir).build()
+                        logger.debug("Prepared %d static assets", len(_static_assets.by_path))
+                    except OSError as e:
+                        logger.error("Could not prepare static assets, serving from disk: %s", e)
+                _static_assets_built = True
+    return _static_assets
+
+def create_analytics(directory):
+    """Columnar class analytics over the progress store of directory"""
+    from backend.analytics import ProgressAnalytics
+    store = get_progress_manager().store
+    progress_file = store.progress_file if store else os.path.join(directory, "progress.json")
+    analytics = ProgressAnalytics(progress_file)
+    metrics.instrument(analytics, ["columns"], "analytics")
+    return analytics
+
+def get_analytics():
+    """Columnar class analytics over the current tenant's progress store, created on first use"""
+    global _analytics
+    tenant = tenants.current()
+    if tenant is not None:
+        return tenant.component("analytics", lambda tenant: create_analytics(tenant.data_dir))
+    if _analytics is None:
+        with _init_lock:
+            if _analytics is None:
+                _analytics = create_analytics(data_dir)
+    return _analytics
+
+def build_item_bank(loader, directory=None):
+    """Practice items for the ontology's shapes (all built-in topics without it);
+    directory holds the generated bank of a tenant with its own ontology"""
+    from backend import exercises
+    from backend.recommender import ItemBank
+    shapes = None
+    if loader and hasattr(loader, 'get_all_shapes_with_formulas'):
+        try:
+            shapes = loader.get_all_shapes_with_formulas() or None
+        except Exception as e:
+            logger.error("Error reading shapes for the item bank: %s", e)
+    if exercises.np is not None:
+        # Memory-mapped generated bank, shared between worker processes
+        if directory:
+            path = os.path.join(directory, "item_bank")
+        else:
+            path = os.environ.get("ITS_ITEM_BANK", os.path.join(data_dir, "item_bank"))
+        per_level = int(os.environ.get("ITS_ITEM_BANK_SIZE", exercises.DEFAULT_PER_LEVEL))
+        try:
+            return exercises.load_or_generate(path, shapes, per_level)
+        except OSError as e:
+            logger.error("Could not prepare the item bank at %s, using the built-in one: %s", path, e)
+    return ItemBank.build(shapes)
+
+def create_recommender(loader, directory=None):
+    """The exercise recommender over the item bank for loader's shapes"""
+    from backend.recommender import Recommender
+    recommender = Recommender(build_item_bank(loader, directory), get_progress_manager().mastery)
+    metrics.instrument(recommender, ["recommend"], "recommender")
+    return recommender
+
+def get_recommender():
+    """The current tenant's exercise recommender, created on first use"""
+    global _recommender
+    tenant = tenants.current()
+    if tenant is not None:
+        return tenant.component("recommender", lambda tenant: create_recommender(
+            current_ontology_loader(), tenant.data_dir if tenant.ontology_path else None))
+    if _recommender is None:
+        with _init_lock:
+            if _recommender is None:
+                _recommender = create_recommender(ontology_loader)
+    return _recommender
+
+def get_chat_pool():
+    """The tutor chat worker pool, created on first use"""
+    global _chat_pool
+    if _chat_pool is None:
+        with _init_lock:
+            if _chat_pool is None:
+                from backend.chat import ChatPool
+                _chat_pool = ChatPool(get_ai_tutor)
+    return _chat_pool
+
+def get_rate_limits():
+    """Rate limits and admission control of the routes that write storage (backend/ratelimit.py)"""
+    global _rate_limits
+    if _rate_limits is None:
+        with _init_lock:
+            if _rate_limits is None:
+                _rate_limits = ratelimit.RouteLimits.from_env()
+    return _rate_limits
+
+# Rate limits apply per client address, or per X-Session-ID when ITS_RATE_LIMIT_KEY=session
+# (a classroom behind one NAT address) if the server issued that session; behind load balancers
+# set ITS_TRUST_FORWARDED to how many of them append to X-Forwarded-For (1 for one proxy)
+rate_limit_key = os.environ.get("ITS_RATE_LIMIT_KEY", "address")
+trust_forwarded = int(os.environ.get("ITS_TRUST_FORWARDED", "0"))
+
+def client_key(remote_addr, forwarded_for=None, session_id=None):
+    """Who a rate limit is counted against"""
+    # A made-up session id would get a fresh bucket per request, so only verified ones count
+    # (and only cheaply verifiable ones: guest tokens, cached sessions); otherwise the address does
+    if rate_limit_key == "session" and session_id and get_auth_manager().known_session(session_id):
+        return "session:" + session_id
+    if trust_forwarded and forwarded_for:
+        # The client may send any X-Forwarded-For; only the entries our proxies appended (the
+        # rightmost trust_forwarded) are real, the first of those being the client's address
+        hops = [hop.strip() for hop in forwarded_for.split(",")]
+        if len(hops) >= trust_forwarded and hops[-trust_forwarded]:
+            return hops[-trust_forwarded]
+    return remote_addr
+
+def limited(route, client, handler, *args):
+    """handler(*args) if route admits client, else a 429 body; returns (body, status)"""
+    try:
+        with get_rate_limits().admit(route, client):
+            return handler(*args)
+    except ratelimit.RateLimited as e:
+        return {"error": "Too many requests, try again shortly", "retry_after": e.retry_after}, 429
+
+def request_client():
+    """Rate limit key of the current Flask request"""
+    return client_key(request.remote_addr, request.headers.get("X-Forwarded-For"), request.headers.get("X-Session-ID"))
+
+def _retry_response(body, status):
+    response = jsonify(body)
+    if status == 429:
+        response.headers["Retry-After"] = str(body.get("retry_after", 1))
+    return response, status
+
+def collect_idle_guests():
+    """Remove idle guests of the default data and of every open tenant; returns how many"""
+    removed = _collect_guests()
+    registry = get_tenant_registry()
+    if registry is not None:
+        for tenant in registry.tenants():
             try:
-                ontology_tutor = ontology_loader.get_ai_tutor()
-                if ontology_tutor:
-                    self.name = ontology_tutor.get('name', self.name)
-                    self.specialization = ontology_tutor.get('specialization', self.specialization)
-                    self.from_ontology = True
-                    print(f" Using AI Tutor from ontology: {self.name}")
-                else:
-                    print(" No AI Tutor found in ontology, using default")
-            except Exception as e:
-                print(f"Error getting AI Tutor from ontology: {e}")
-        
-        self.responses = {
-            "hello": f"Hello! I'm {self.name}, your {self.specialization} tutor. How can I help?",
-            "cube": "A cube has 6 faces. Volume = a³, Surface Area = 6a²",
-            "sphere": "A sphere is round. Volume = 4/3 π r³, Surface Area = 4πr²",
-            "cone": "A cone has a circular base. Volume = (1/3) π r² h",
-            "cylinder": "A cylinder has two circular bases. Volume = π r² h",
-            "triangle": "A triangle has 3 sides. Area = 1/2 × base × height",
-            "rectangle": "A rectangle has 4 sides. Area = length × width",
-            "hi": f"Hi! I'm {self.name}, here to help with geometry!",
-            "help": f"I'm {self.name}, specializing in {self.specialization}. I can help with: cubes, spheres, cones, cylinders, triangles, rectangles.",
-            "formula": "I can provide formulas for volume, surface area, and area of geometric shapes.",
-            "shapes": "I know about: Cube, Sphere, Cone, Cylinder, Triangle, Rectangle.",
-            "progress": "I can help you track your learning progress and suggest areas to improve.",
-            "quiz": "Ready for a quiz? I can test your knowledge of geometric shapes and formulas.",
-            "practice": "Let's practice some geometry problems together!"
-        }
-    
-    def get_response(self, message, user_id):
-        msg_lower = message.lower()
-        
-        # Check matches 
-        for key in self.responses:
-            if key == msg_lower:
-                return self.responses[key]
-        
-        # Check for partial matches
-        for key in self.responses:
-            if key in msg_lower:
-                return self.responses[key]
-        
-        # Default response
-        return f"I'm {self.name}, your geometry tutor. I can help with shapes, formulas, quizzes, and practice exercises. What would you like to know?"
+                with registry.use(tenant.id):
+                    removed += _collect_guests()
+            except tenants.UnknownTenant:
+                pass
+    return removed
+
+def _collect_guests():
+    auth = get_auth_manager()
+    if not hasattr(auth, "collect_guests"):
+        return 0
+    progress = get_progress_manager()
+    idle_before = (datetime.now() - timedelta(days=guest_idle_days)).isoformat()
+    # Every worker runs a collector: the store's cross-process lock keeps a save in another
+    # worker from landing between reading a guest's last activity and removing them
+    with progress.store.locked() if progress.store else contextlib.nullcontext():
+        records = progress.store.load_progress() if progress.store else {}
+        def last_activity(user_id):
+            return (records.get(user_id) or {}).get("learning_patterns", {}).get("last_activity")
+        removed = auth.collect_guests(idle_before, last_activity)
+        if removed:
+            progress.remove_users(removed)
+    if removed:
+        from backend.guests import GUESTS_COLLECTED
+        GUESTS_COLLECTED.inc(amount=len(removed))
+    return len(removed)
 
-# Initialize managers
-progress_manager = ProgressManager()
-ai_tutor = AITutor()
+def start_guest_collector():
+    """Start removing idle guests in the background (once; ITS_GUEST_GC_INTERVAL=0 disables it)"""
+    global _guest_collector
+    if _guest_collector is not None or guest_gc_interval <= 0:
+        return
+    with _init_lock:
+        if _guest_collector is None:
+            from backend.guests import GuestCollector
+            _guest_collector = GuestCollector(collect_idle_guests, guest_gc_interval)
+            _guest_collector.start()
+
+# Callables run by shutdown(), e.g. to flush buffered storage writes
+shutdown_hooks = []
+
+def preload(timeout=None):
+    """Do the heavy startup work up front (used before forking server workers)"""
+    start_ontology_loading()
+    get_auth_manager()
+    get_progress_manager()
+    get_static_assets()
+    ready = ontology_ready.wait(timeout)
+    get_ai_tutor()
+    return ready
+
+def shutdown():
+    """Run the shutdown hooks; called by the production server on graceful stop"""
+    if _progress_manager is not None:
+        _progress_manager.flush()
+    if _chat_pool is not None:
+        _chat_pool.shutdown()
+    if _guest_collector is not None:
+        _guest_collector.stop()
+    if _tenant_registry is not None:
+        _tenant_registry.close()
+    if _cache_backend is not None:
+        _cache_backend.close()
+    for hook in shutdown_hooks:
+        try:
+            hook()
+        except Exception as e:
+            logger.error("Error in shutdown hook %s: %s", getattr(hook, '__name__', hook), e)
+
+# ==================== APPLICATION FACTORY ====================
+
+api = Blueprint('its', __name__)
+
+def create_app():
+    """Build the Flask app; cheap, the heavy subsystems start lazily"""
+    configure_logging()
+    app = Flask(__name__, 
+                static_folder='../frontend',
+                template_folder='../frontend')
+    CORS(app)
+    metrics.install_flask_metrics(app)
+    install_json_compression(
+        app,
+        min_bytes=int(os.environ.get("ITS_GZIP_MIN_BYTES", "1024")),
+        level=int(os.environ.get("ITS_GZIP_LEVEL", "5")),
+    )
+    if profiling_enabled:
+        if not os.environ.get("ITS_PROFILE_TOKEN"):
+            logger.warning("ITS_PROFILING=1 without ITS_PROFILE_TOKEN: profiling requests will be refused")
+        profiling.install_flask_profiling(
+            app,
+            os.environ.get("ITS_PROFILE_DIR", os.path.join(project_root, "profiles")),
+            token=os.environ.get("ITS_PROFILE_TOKEN"),
+        )
+    
+    @app.before_request
+    def ensure_ontology_loading():
+        # First request starts the background load if preload() was not called
+        start_ontology_loading()
+        start_guest_collector()
+    
+    @app.before_request
+    def select_tenant():
+        # Multi-tenant mode: /api/* requests use the data of the tenant they name
+        registry = get_tenant_registry()
+        if registry is None or not request.path.startswith("/api/"):
+            return None
+        try:
+            tenant_id = tenants.tenant_id_from(request.headers.get(tenants.TENANT_HEADER), request.host, tenant_domain)
+            if tenant_id is not None:
+                g.tenant = registry.acquire(tenant_id)
+                g.tenant_token = tenants.activate(g.tenant)
+        except tenants.UnknownTenant:
+            return jsonify({"error": "Unknown tenant"}), 404
+        return None
+    
+    @app.teardown_request
+    def release_tenant(exc):
+        tenant = g.pop("tenant", None)
+        if tenant is not None:
+            tenants.deactivate(g.pop("tenant_token"))
+            get_tenant_registry().release(tenant)
+    
+    app.register_blueprint(api)
+    return app
 
 # Ensure required directories exist
 def ensure_directories():
-    data_dir = Path("../data")
-    data_dir.mkdir(exist_ok=True)
+    data_path = Path(data_dir)
+    data_path.mkdir(exist_ok=True)
     
-    frontend_dir = Path("../frontend")
+    frontend_dir = Path(project_root) / "frontend"
     frontend_dir.mkdir(exist_ok=True)
     
-    images_dir = Path("../frontend/images")
+    images_dir = frontend_dir / "images"
     images_dir.mkdir(exist_ok=True)
     
     # Create default files if they don't exist
-    users_file = data_dir / "users.json"
+    users_file = data_path / "users.json"
     if not users_file.exists():
         with open(users_file, 'w') as f:
             json.dump({"students": [], "guests": []}, f)
     
-    progress_file = data_dir / "progress.json"
+    progress_file = data_path / "progress.json"
     if not progress_file.exists():
         with open(progress_file, 'w') as f:
             json.dump({}, f)
 
+# ==================== HEALTH CHECKS ====================
+
+@api.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({"status": "ok"})
+
+def readiness():
+    """Readiness: the ontology load has finished (loaded, or failed over to fallback data)"""
+    body = {
+        "ready": ontology_ready.is_set(),
+        "ontology": ontology_status["state"],
+        "error": ontology_status["error"],
+        "started_at": ontology_status["started_at"],
+        "finished_at": ontology_status["finished_at"]
+    }
+    return body, (200 if ontology_ready.is_set() else 503)
+
+@api.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness probe for the orchestrator"""
+    body, status = readiness()
+    return jsonify(body), status
+
 # ==================== API ROUTES ====================
 
-@app.route('/')
+@api.route('/')
 def index():
     """Serve the main page"""
-    return send_from_directory('../frontend', 'index.html')
+    return serve_static('index.html')
 
-@app.route('/<path:path>')
+@api.route('/<path:path>')
 def serve_static(path):
-    """Serve static files"""
-    return send_from_directory('../frontend', path)
+    """Serve static files (precompressed and cache-friendly when prepared at startup)"""
+    static_assets = get_static_assets()
+    if static_assets is not None:
+        response = static_assets.response(path, request)
+        if response is not None:
+            return response
+    return send_from_directory(frontend_dir, path)
 
-@app.route('/api/login', methods=['POST'])
-def login():
-    """Handle user login with ontology support"""
-    data = request.json
+def handle_login(data, client=None):
+    """Log in a guest, an ontology student or a JSON student; returns (body, status)
+
+    Rate limited per client and per route ("guest" or "login") before users.json is touched."""
+    return limited("guest" if data.get('guest', False) else "login", client, _login, data)
+
+def _login(data):
+    loader = current_ontology_loader()
     username = data.get('username', '').strip()
     is_guest = data.get('guest', False)
     
     if is_guest:
-        user = auth_manager.create_guest_user()
+        user = get_auth_manager().create_guest_user()
         user["from_ontology"] = False
     else:
         if not username:
-            return jsonify({"error": "Username required"}), 400
+            return {"error": "Username required"}, 400
         
         #  check if user exists in ontology
         ontology_user = None
-        if ontology_loader and hasattr(ontology_loader, 'get_all_students'):
-            students = ontology_loader.get_all_students()
+        if loader and hasattr(loader, 'get_all_students'):
+            students = loader.get_all_students()
             for student in students:
                 student_name = student.get('name', '').lower()
                 if username.lower() in student_name:
@@ -234,18 +901,68 @@ def login():
                 "details": ontology_user.get('details', {}),
                 "properties": ontology_user.get('properties', {})
             }
-            print(f"User {username} authenticated from ontology")
+            logger.debug("User %s authenticated from ontology", username)
         else:
             # if User not in ontology, use default auth
-            user = auth_manager.login_user(username)
+            user = get_auth_manager().login_user(username)
             user["from_ontology"] = False
     
-    return jsonify(user)
+    return user, 200
 
-@app.route('/api/shapes', methods=['GET'])
-def get_shapes():
+@api.route('/api/login', methods=['POST'])
+def login():
+    """Handle user login with ontology support"""
+    return _retry_response(*handle_login(request.json or {}, request_client()))
+
+def build_session_response(session_id):
+    """An active login session, whichever node created it; returns (body, status)"""
+    session = get_auth_manager().get_session(session_id)
+    if session is None:
+        return {"error": "Unknown or expired session"}, 404
+    return session, 200
+
+@api.route('/api/session/<session_id>', methods=['GET'])
+def get_session(session_id):
+    """Look up a login session"""
+    body, status = build_session_response(session_id)
+    return jsonify(body), status
+
+def handle_guest_conversion(data, client=None):
+    """Register a guest as a student, keeping their progress: {"session_id": "<guest session>", "username": "..."}"""
+    if not isinstance(data, dict) or not str(data.get("username", "")).strip():
+        return {"error": "Username required"}, 400
+    return limited("login", client, _convert_guest, data)
+
+def _convert_guest(data):
+    from backend.guests import GUESTS_CONVERTED, conversion_type
+    auth = get_auth_manager()
+    session = auth.get_session(str(data.get("session_id", "")))
+    if session is None or session.get("user_type") != "guest":
+        return {"error": "A valid guest session_id is required"}, 403
+    if auth.is_converted(session["user_id"]):
+        return {"error": "This guest has already been converted"}, 409
+    # The ontology's convertsToStudent relationship says what a guest may become
+    user_type = conversion_type(current_ontology_loader())
+    if user_type != "student":
+        return {"error": "The ontology defines no guest conversion"}, 409
+    guest_id = session["user_id"]
+    user = auth.convert_guest(guest_id, str(data["username"]).strip(), user_type)
+    if user is None:
+        return {"error": "This guest has already been converted"}, 409
+    progress = get_progress_manager().transfer(guest_id, user["user_id"])
+    GUESTS_CONVERTED.inc()
+    logger.info("Guest %s converted to %s", guest_id, user["user_id"])
+    return dict(user, from_ontology=False, progress_transferred=progress is not None), 200
+
+@api.route('/api/guest/convert', methods=['POST'])
+def convert_guest():
+    """Turn a guest into a registered student"""
+    return _retry_response(*handle_guest_conversion(request.get_json(silent=True), request_client()))
+
+def build_shapes_response():
     """Get geometric shapes with ontology enhancement"""
-    print("\n🔍 Getting shapes with ontology data...")
+    loader = current_ontology_loader()
+    logger.debug("Getting shapes with ontology data", extra=sample(100))
     
     # Base hardcoded shapes
     base_shapes = [
@@ -260,15 +977,15 @@ def get_shapes():
     enhanced_shapes = []
     ontology_used = False
     
-    if ontology_loader:
+    if loader:
         try:
             # Get shapes from ontology
-            if hasattr(ontology_loader, 'get_all_shapes_with_formulas'):
-                ontology_shapes = ontology_loader.get_all_shapes_with_formulas()
+            if hasattr(loader, 'get_all_shapes_with_formulas'):
+                ontology_shapes = loader.get_all_shapes_with_formulas()
                 
                 if ontology_shapes:
                     ontology_used = True
-                    print(f"Found {len(ontology_shapes)} shapes in ontology")
+                    logger.debug("Found %d shapes in ontology", len(ontology_shapes), extra=sample(100))
                     
                     # Use ontology shapes
                     for shape in ontology_shapes:
@@ -303,15 +1020,15 @@ def get_shapes():
                     enhanced_shape["source"] = "hardcoded"
                     
                     # Check shape class exists in ontology
-                    if shape["type"] in ontology_loader.classes:
-                        enhanced_shape["uri"] = ontology_loader.classes[shape["type"]].get('uri', '')
+                    if shape["type"] in loader.classes:
+                        enhanced_shape["uri"] = loader.classes[shape["type"]].get('uri', '')
                         enhanced_shape["from_ontology"] = True
                         ontology_used = True
                     
                     enhanced_shapes.append(enhanced_shape)
                     
         except Exception as e:
-            print(f" Error getting shapes from ontology: {e}")
+            logger.error("Error getting shapes from ontology: %s", e)
             enhanced_shapes = base_shapes
             for shape in enhanced_shapes:
                 shape["source"] = "hardcoded"
@@ -322,34 +1039,39 @@ def get_shapes():
             shape["source"] = "hardcoded"
             shape["from_ontology"] = False
     
-    return jsonify({
+    return {
         "shapes": enhanced_shapes,
         "count": len(enhanced_shapes),
         "ontology_used": ontology_used,
-        "ai_tutor": ai_tutor.name,
-        "ai_tutor_from_ontology": ai_tutor.from_ontology
-    })
+        "ai_tutor": get_ai_tutor().name,
+        "ai_tutor_from_ontology": get_ai_tutor().from_ontology
+    }
 
-@app.route('/api/users', methods=['GET'])
-def get_users():
+@api.route('/api/shapes', methods=['GET'])
+def get_shapes():
+    """Get geometric shapes with ontology enhancement"""
+    return jsonify(build_shapes_response())
+
+def build_users_response():
     """Get all users from ontology and system"""
+    loader = current_ontology_loader()
     try:
         # Get users from ontology
         ontology_students = []
-        if ontology_loader and hasattr(ontology_loader, 'get_all_students'):
-            ontology_students = ontology_loader.get_all_students()
-            print(f"✅ Found {len(ontology_students)} students in ontology")
+        if loader and hasattr(loader, 'get_all_students'):
+            ontology_students = loader.get_all_students()
+            logger.debug("Found %d students in ontology", len(ontology_students), extra=sample(100))
         
         # get users from JSON file
         try:
-            users_file = Path("../data/users.json")
+            users_file = Path(current_data_dir()) / "users.json"
             if users_file.exists():
                 with open(users_file, 'r') as f:
                     json_users = json.load(f)
             else:
                 json_users = {"students": [], "guests": []}
         except Exception as e:
-            print(f"Error loading JSON users: {e}")
+            logger.error("Error loading JSON users: %s", e)
             json_users = {"students": [], "guests": []}
         
         # Prepare ontology students for response
@@ -372,59 +1094,435 @@ def get_users():
             "json_student_count": len(json_users.get("students", [])),
             "json_guest_count": len(json_users.get("guests", [])),
             "total_users": len(ontology_students_formatted) + len(json_users.get("students", [])) + len(json_users.get("guests", [])),
-            "ai_tutor": ai_tutor.name,
-            "ai_tutor_from_ontology": ai_tutor.from_ontology
+            "ai_tutor": get_ai_tutor().name,
+            "ai_tutor_from_ontology": get_ai_tutor().from_ontology
         }
         
-        return jsonify(response)
+        return response
         
     except Exception as e:
-        print(f"Error in get_users: {e}")
-        return jsonify({
+        logger.exception("Error in get_users: %s", e)
+        return {
             "error": str(e),
             "users": [],
             "total_users": 0
-        })
+        }
+
+def handle_save_progress(user_id, data, client=None, session_id=None):
+    """Apply a quiz and/or practice update for a user; returns (body, status)
+    
+    A guest saves only with their own session (X-Session-ID): their guest token, or a stored guest session."""
+    from backend.progress_bulk import validate_update
+    if not isinstance(data, dict) or not ("quiz" in data or "practice" in data or "topic" in data):
+        return {"error": "Expected a 'quiz', 'practice' or 'topic' update"}, 400
+    error = validate_update(data)
+    if error:
+        return {"error": error}, 400
+    materialize = False
+    if user_id.startswith("guest_"):
+        auth = get_auth_manager()
+        session = auth.get_session(session_id) if session_id else None
+        if session is None or session["user_id"] != user_id:
+            return {"error": "A guest can only save progress with their own session (X-Session-ID)"}, 403
+        if auth.is_converted(user_id):
+            return {"error": "This guest has been converted; save progress as the student"}, 403
+        tokens = getattr(auth, "guest_tokens", None)
+        materialize = tokens is not None and tokens.verify(session_id) is not None
+    # Not limited unless ITS_RATE_LIMITS / ITS_ADMISSION_LIMITS name the "progress" route
+    return limited("progress", client, _save_progress, user_id, data, materialize)
+
+def _save_progress(user_id, data, materialize=False):
+    # A token guest is stored on their first save; until then they exist only in their token
+    if materialize and get_auth_manager().materialize_guest(user_id):
+        from backend.guests import GUESTS_MATERIALIZED
+        GUESTS_MATERIALIZED.inc()
+    get_progress_manager().save_progress(user_id, data)
+    body = {"status": "saved", "user_id": user_id, "progress": get_progress_manager().get_progress(user_id)}
+    feedback = build_feedback(user_id, data)
+    if feedback:
+        body["feedback"] = feedback
+    return body, 200
+
+def build_feedback(user_id, data):
+    """Tutor feedback on a saved quiz/practice result; practice feedback names the weakest mastery topics"""
+    tutor = get_ai_tutor()
+    feedback = {}
+    quiz = data.get("quiz")
+    if quiz:
+        feedback["quiz"] = tutor.get_quiz_feedback(quiz["score"], quiz["total"])
+    practice = data.get("practice")
+    if practice:
+        completed = practice.get("completed", 0)
+        exercises = [exercise for exercise in practice.get("exercises", []) if isinstance(exercise, dict)]
+        total = len(completed) if isinstance(completed, list) else completed
+        if total:
+            mastery = get_progress_manager().mastery
+            weakest = mastery.weakest_topics(user_id) if mastery is not None else None
+            feedback["practice"] = tutor.get_practice_feedback(practice.get("correct", 0), total, exercises, weakest)
+    return feedback
+
+def build_progress_response(user_id):
+    """Get saved (or ontology) progress for a user"""
+    return {"user_id": user_id, "progress": get_progress_manager().get_progress(user_id)}
+
+def build_history_response(user_id, full=False):
+    """Learning history aggregates for a user; returns (body, status)"""
+    history = get_progress_manager().get_history(user_id, full)
+    if history is None:
+        return {"error": "Event log unavailable"}, 503
+    return dict(history, user_id=user_id), 200
+
+def build_mastery_response(user_id, k=3):
+    """Per-topic mastery of a user and their k weakest topics; returns (body, status)"""
+    mastery = get_progress_manager().mastery
+    if mastery is None:
+        return {"error": "Mastery tracking unavailable"}, 503
+    strong, weak = mastery.classify(user_id)
+    return {
+        "user_id": user_id,
+        "topics": mastery.user_topics(user_id),
+        "weakest": mastery.weakest_topics(user_id, k),
+        "strong_areas": strong,
+        "weak_areas": weak,
+    }, 200
+
+def build_weak_students_response(topic, threshold=None, limit=50):
+    """Students weak in a topic, weakest first; returns (body, status)"""
+    from backend.mastery import WEAK_BELOW
+    mastery = get_progress_manager().mastery
+    if mastery is None:
+        return {"error": "Mastery tracking unavailable"}, 503
+    threshold = WEAK_BELOW if threshold is None else threshold
+    students = mastery.weak_students(topic, threshold, min(max(limit, 1), 500))
+    return {"topic": topic, "threshold": threshold, "students": students}, 200
+
+def build_recommendation_response(user_id, count=1):
+    """Next practice items for a user, weakest topics first"""
+    items = get_recommender().recommend(user_id, min(max(count, 1), 20))
+    return {"user_id": user_id, "items": items}
+
+@api.route('/api/progress/<user_id>', methods=['GET'])
+def get_progress(user_id):
+    """Get progress for a user"""
+    return jsonify(build_progress_response(user_id))
+
+@api.route('/api/progress/<user_id>', methods=['POST'])
+def save_progress(user_id):
+    """Save a quiz/practice result, e.g. {"quiz": {"score": 2, "total": 3}}"""
+    return _retry_response(*handle_save_progress(user_id, request.get_json(silent=True), request_client(),
+                                                 request.headers.get("X-Session-ID")))
+
+def admin_authorized(supplied):
+    """True if supplied is ITS_ADMIN_TOKEN; with no token configured nobody is"""
+    return bool(admin_token) and supplied is not None and hmac.compare_digest(supplied, admin_token)
+
+def handle_bulk_import(stream, fmt, client=None, token=None):
+    """Import NDJSON/CSV progress records from a text stream (admins only); returns (body, status)"""
+    if not admin_authorized(token):
+        return {"error": "Bulk import needs a valid X-Admin-Token (set ITS_ADMIN_TOKEN)"}, 403
+    if fmt not in ("ndjson", "csv"):
+        return {"error": "format must be ndjson or csv"}, 400
+    # Not limited unless ITS_RATE_LIMITS / ITS_ADMISSION_LIMITS name the "progress" route
+    return limited("progress", client, _bulk_import, stream, fmt)
+
+def _bulk_import(stream, fmt):
+    from backend import progress_bulk
+    manager = get_progress_manager()
+    if manager.store is None:
+        return {"error": "Progress storage unavailable"}, 503
+    summary = progress_bulk.import_stream(manager, stream, fmt)
+    return summary, 200 if summary["applied"] or not summary["rejected"] else 400
+
+def progress_export_stream(fmt):
+    """Generator of NDJSON lines or CSV rows for every saved progress record"""
+    from backend import progress_bulk
+    manager = get_progress_manager()
+    manager.flush()
+    if manager.store is None:
+        return iter(())
+    return progress_bulk.export_stream(str(manager.store.progress_file), fmt)
+
+EXPORT_MIMETYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+@api.route('/api/progress/bulk', methods=['POST'])
+def bulk_import_progress():
+    """Bulk import progress, body is NDJSON (default) or CSV with ?format=csv"""
+    import io
+    stream = io.TextIOWrapper(request.stream, encoding="utf-8", newline="")
+    return _retry_response(*handle_bulk_import(stream, request.args.get("format", "ndjson"), request_client(),
+                                               request.headers.get("X-Admin-Token")))
+
+@api.route('/api/progress/export', methods=['GET'])
+def export_progress():
+    """Stream all saved progress as NDJSON (default) or CSV with ?format=csv"""
+    if not admin_authorized(request.headers.get("X-Admin-Token")):
+        return jsonify({"error": "Export needs a valid X-Admin-Token (set ITS_ADMIN_TOKEN)"}), 403
+    fmt = request.args.get("format", "ndjson")
+    if fmt not in EXPORT_MIMETYPES:
+        return jsonify({"error": "format must be ndjson or csv"}), 400
+    headers = {"Content-Disposition": f"attachment; filename=progress.{fmt}"}
+    return Response(stream_with_context(progress_export_stream(fmt)), mimetype=EXPORT_MIMETYPES[fmt], headers=headers)
+
+@api.route('/api/history/<user_id>', methods=['GET'])
+def get_history(user_id):
+    """Quiz/practice/topic/activity aggregates from the event log; ?events=all adds every event"""
+    body, status = build_history_response(user_id, request.args.get("events") == "all")
+    return jsonify(body), status
+
+@api.route('/api/mastery/<user_id>', methods=['GET'])
+def get_mastery(user_id):
+    """Topic mastery for a user, with the ?k= weakest topics (default 3)"""
+    body, status = build_mastery_response(user_id, request.args.get("k", 3, type=int))
+    return jsonify(body), status
+
+@api.route('/api/mastery/topic/<topic>/weak', methods=['GET'])
+def get_weak_students(topic):
+    """Students below ?threshold= mastery (default 0.6) in a topic"""
+    body, status = build_weak_students_response(
+        topic, request.args.get("threshold", type=float), request.args.get("limit", 50, type=int))
+    return jsonify(body), status
+
+@api.route('/api/recommend/<user_id>', methods=['GET'])
+def recommend(user_id):
+    """Next practice exercise(s) for a user (?count=, default 1)"""
+    return jsonify(build_recommendation_response(user_id, request.args.get("count", 1, type=int)))
+
+# ============== TUTOR CHAT ENDPOINTS ==============
+
+MAX_CHAT_MESSAGE_LENGTH = 2000
+
+def _run_chat(messages, single):
+    """Answer (message, user_id) pairs on the chat pool; returns (replies or error body, status)"""
+    from backend.chat import ChatOverloaded, ChatTimeout
+    pool = get_chat_pool()
+    try:
+        if single:
+            return [pool.answer(*messages[0])], 200
+        return pool.answer_batch(messages), 200
+    except ChatOverloaded as e:
+        return {"error": "Tutor is busy, try again shortly", "retry_after": e.retry_after}, 429
+    except ChatTimeout as e:
+        return {"error": str(e)}, 503
+    except ValueError as e:
+        return {"error": str(e)}, 413
+
+def handle_chat(data):
+    """Answer one tutor message: {"message": "...", "user_id": "..."}; returns (body, status)"""
+    if not isinstance(data, dict) or not isinstance(data.get("message"), str) or not data["message"].strip():
+        return {"error": "Expected a non-empty 'message'"}, 400
+    message = data["message"][:MAX_CHAT_MESSAGE_LENGTH]
+    result, status = _run_chat([(message, data.get("user_id"))], single=True)
+    if status != 200:
+        return result, status
+    tutor = get_ai_tutor()
+    return {"reply": result[0], "tutor": tutor.name, "from_ontology": tutor.from_ontology}, 200
+
+def handle_chat_batch(data):
+    """Answer many messages in order: {"user_id": "...", "messages": ["...", {"message": "...", "user_id": "..."}]}"""
+    messages = data.get("messages") if isinstance(data, dict) else None
+    if not isinstance(messages, list) or not messages:
+        return {"error": "Expected a non-empty 'messages' list"}, 400
+    default_user = data.get("user_id")
+    pairs = []
+    for index, entry in enumerate(messages):
+        if isinstance(entry, dict):
+            message, user_id = entry.get("message"), entry.get("user_id", default_user)
+        else:
+            message, user_id = entry, default_user
+        if not isinstance(message, str):
+            return {"error": f"messages[{index}] has no text"}, 400
+        pairs.append((message[:MAX_CHAT_MESSAGE_LENGTH], user_id))
+    started = datetime.now()
+    result, status = _run_chat(pairs, single=False)
+    if status != 200:
+        return result, status
+    elapsed_ms = (datetime.now() - started).total_seconds() * 1000
+    return {"replies": result, "count": len(result), "elapsed_ms": round(elapsed_ms, 2)}, 200
+
+@api.route('/api/tutor/chat', methods=['POST'])
+def tutor_chat():
+    """Ask the AI tutor one question"""
+    return _retry_response(*handle_chat(request.get_json(silent=True)))
+
+@api.route('/api/tutor/chat/batch', methods=['POST'])
+def tutor_chat_batch():
+    """Ask the AI tutor many questions (transcript replay, classroom broadcast); replies in order"""
+    return _retry_response(*handle_chat_batch(request.get_json(silent=True)))
+
+# ============== LIVE UPDATES (SERVER-SENT EVENTS) ==============
+
+STREAM_MAX_CLIENTS = int(os.environ.get("ITS_STREAM_MAX_CLIENTS", "100"))
+# Streams end after this long; EventSource reconnects and resumes from Last-Event-ID
+STREAM_MAX_SECONDS = float(os.environ.get("ITS_STREAM_MAX_SECONDS", "300"))
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+# A Flask stream holds a server thread for its whole life (gunicorn gthread: ITS_THREADS per worker),
+# so only a few may run per worker; the ASGI app serves any number without tying up threads
+STREAM_MAX_BLOCKING = int(os.environ.get("ITS_STREAM_MAX_BLOCKING",
+                                         str(max(1, int(os.environ.get("ITS_THREADS", "4")) // 4))))
+_blocking_streams = threading.BoundedSemaphore(max(1, STREAM_MAX_BLOCKING))
+
+def open_progress_stream(user_id=None, last_event_id=None, loop=None):
+    """Subscribe to progress deltas (optionally one user's); None when at the client limit"""
+    if pubsub.bus.subscriber_count() >= STREAM_MAX_CLIENTS:
+        return None
+    last_id = pubsub.bus.parse_event_id(last_event_id)
+    accept = (lambda data: data.get("user_id") == user_id or user_id in data.get("user_ids", ())) if user_id else None
+    return pubsub.bus.subscribe(progress_channel(), accept=accept, last_id=last_id, loop=loop)
+
+def stream_frames(subscription, messages, dropped):
+    """SSE frames for a batch of messages, plus a resync notice if some were dropped"""
+    frames = []
+    if subscription.dropped > dropped:
+        frames.append(f"event: resync\ndata: {json.dumps({'dropped': subscription.dropped - dropped})}\n\n")
+    frames.extend(pubsub.format_sse(message) for message in messages)
+    return frames
+
+@api.route('/api/stream/progress', methods=['GET'])
+def stream_progress():
+    """Live progress deltas as server-sent events (?user_id= for one student)"""
+    if STREAM_MAX_BLOCKING <= 0 or not _blocking_streams.acquire(blocking=False):
+        return jsonify({"error": "Too many live streams on this worker; serve dashboards from the ASGI app "
+                                 "(uvicorn asgi:application)"}), 503
+    subscription = open_progress_stream(request.args.get("user_id"), request.headers.get("Last-Event-ID"))
+    if subscription is None:
+        _blocking_streams.release()
+        return jsonify({"error": "Too many live streams, try again later"}), 503
+    
+    def frames():
+        with subscription:
+            yield "retry: 3000\n: connected\n\n"
+            deadline = datetime.now().timestamp() + STREAM_MAX_SECONDS
+            dropped = 0
+            while datetime.now().timestamp() < deadline:
+                messages = subscription.wait(STREAM_HEARTBEAT_SECONDS)
+                if messages or subscription.dropped > dropped:
+                    yield "".join(stream_frames(subscription, messages, dropped))
+                    dropped = subscription.dropped
+                else:
+                    yield ": keep-alive\n\n"
+    
+    response = Response(frames(), mimetype="text/event-stream", headers=STREAM_HEADERS)
+    # Runs even if the client goes away before the first frame
+    response.call_on_close(subscription.close)
+    response.call_on_close(_blocking_streams.release)
+    return response
+
+@api.route('/api/users', methods=['GET'])
+def get_users():
+    """Get all users from ontology and system"""
+    return jsonify(build_users_response())
 
 # ============== ONTOLOGY POWERED ENDPOINTS ==============
 
-@app.route('/api/ontology/classes', methods=['GET'])
-def get_ontology_classes():
+def build_ontology_classes_response():
     """Get all classes from ontology"""
-    if not ontology_loader:
-        return jsonify({"error": "Ontology not loaded"})
+    loader = current_ontology_loader()
+    if not loader:
+        return {"error": "Ontology not loaded"}
     
     classes_by_category = {}
-    if hasattr(ontology_loader, 'get_classes_by_category'):
+    if hasattr(loader, 'get_classes_by_category'):
         classes_by_category = {
-            'user': ontology_loader.get_classes_by_category('user'),
-            'authentication': ontology_loader.get_classes_by_category('authentication'),
-            'learning': ontology_loader.get_classes_by_category('learning'),
-            'geometry': ontology_loader.get_classes_by_category('geometry'),
-            'progress': ontology_loader.get_classes_by_category('progress')
+            'user': loader.get_classes_by_category('user'),
+            'authentication': loader.get_classes_by_category('authentication'),
+            'learning': loader.get_classes_by_category('learning'),
+            'geometry': loader.get_classes_by_category('geometry'),
+            'progress': loader.get_classes_by_category('progress')
         }
     
-    return jsonify({
+    return {
         'status': 'success',
         'classes_by_category': classes_by_category,
-        'total_classes': len(ontology_loader.classes) if hasattr(ontology_loader, 'classes') else 0
-    })
+        'total_classes': len(loader.classes) if hasattr(loader, 'classes') else 0
+    }
 
-@app.route('/api/ontology/students', methods=['GET'])
-def get_ontology_students():
-    """Get all students from ontology"""
-    if not ontology_loader:
-        return jsonify({"error": "Ontology not loaded"}), 400
+@api.route('/api/ontology/classes', methods=['GET'])
+def get_ontology_classes():
+    """Get all classes from ontology"""
+    return jsonify(build_ontology_classes_response())
+
+def build_ontology_students_response():
+    """Get all students from ontology; returns (body, status)"""
+    loader = current_ontology_loader()
+    if not loader:
+        return {"error": "Ontology not loaded"}, 400
     
     try:
-        students = ontology_loader.get_all_students() if hasattr(ontology_loader, 'get_all_students') else []
-        return jsonify({
+        students = loader.get_all_students() if hasattr(loader, 'get_all_students') else []
+        return {
             'status': 'success',
             'students': students,
             'total_students': len(students)
-        })
+        }, 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return {"error": str(e)}, 500
+
+@api.route('/api/ontology/students', methods=['GET'])
+def get_ontology_students():
+    """Get all students from ontology"""
+    body, status = build_ontology_students_response()
+    return jsonify(body), status
+
+# ============== CLASS ANALYTICS ENDPOINTS ==============
+
+def _analytics_columns():
+    get_progress_manager().flush()
+    return get_analytics().columns()
+
+def build_analytics_summary_response():
+    """Class-wide stats for every progress column"""
+    columns = _analytics_columns()
+    return {"students": len(columns), "as_of": columns.built_at, "columns": columns.summary()}
+
+def build_analytics_distribution_response(column, bins):
+    """Histogram of one column; returns (body, status)"""
+    from backend.analytics import COLUMNS
+    if column not in COLUMNS:
+        return {"error": f"column must be one of {', '.join(COLUMNS)}"}, 400
+    if not 1 <= bins <= 100:
+        return {"error": "bins must be between 1 and 100"}, 400
+    columns = _analytics_columns()
+    high = 100.0
+    if column in ("quiz_count", "practice_completed"):
+        high = max(float(columns.column_stats(column)["max"]), 1.0)
+    return dict(columns.histogram(column, bins, 0.0, high), students=len(columns), as_of=columns.built_at), 200
+
+def build_analytics_areas_response():
+    """How many students have each area marked weak or strong"""
+    columns = _analytics_columns()
+    return {"students": len(columns), "as_of": columns.built_at, "areas": columns.area_counts()}
+
+def build_analytics_struggling_response(threshold, limit):
+    """Students with overall progress under a threshold, lowest first"""
+    columns = _analytics_columns()
+    students = columns.below("overall_progress", threshold, min(max(limit, 1), 500))
+    return {"threshold": threshold, "as_of": columns.built_at, "students": students}
+
+@api.route('/api/analytics/summary', methods=['GET'])
+def analytics_summary():
+    """Class averages, spread and percentiles of quiz/practice/overall progress"""
+    return jsonify(build_analytics_summary_response())
+
+@api.route('/api/analytics/distribution', methods=['GET'])
+def analytics_distribution():
+    """Histogram, e.g. ?column=overall_progress&bins=10"""
+    body, status = build_analytics_distribution_response(
+        request.args.get("column", "overall_progress"), request.args.get("bins", 10, type=int))
+    return jsonify(body), status
+
+@api.route('/api/analytics/areas', methods=['GET'])
+def analytics_areas():
+    """Weak/strong counts per learning area"""
+    return jsonify(build_analytics_areas_response())
+
+@api.route('/api/analytics/struggling', methods=['GET'])
+def analytics_struggling():
+    """Students below ?threshold= overall progress (default 50)"""
+    return jsonify(build_analytics_struggling_response(
+        request.args.get("threshold", 50.0, type=float), request.args.get("limit", 50, type=int)))
+
+app = create_app()
 
 # ==============THE MAIN EXECUTION ==============
 
@@ -0,0 +1,381 @@
+"""ASGI variant of the /api/* surface, served by uvicorn
+
+The handlers are async and share the route logic, managers and ontology of
+backend/app.py. Blocking work (JSON file storage, ontology queries) is sent to
+a bounded thread pool, so idle connections cost a coroutine, not a thread.
+
+    uvicorn asgi:application --workers 4
+"""
+import asyncio
+import contextlib
+import io
+import os
+import time
+
+import anyio
+from starlette.applications import Starlette
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.concurrency import iterate_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+
+from backend import app as core
+from backend import metrics, tenants
+
+frontend_dir = core.frontend_dir
+
+# Upper bound on threads doing blocking storage / ontology work at once
+io_limiter = anyio.CapacityLimiter(int(os.environ.get("ITS_ASGI_IO_THREADS", "32")))
+
+
+async def run_blocking(func, *args):
+    """Run a blocking call in the bounded storage thread pool"""
+    return await anyio.to_thread.run_sync(func, *args, limiter=io_limiter)
+
+
+async def healthz(request):
+    return JSONResponse({"status": "ok"})
+
+
+async def readyz(request):
+    body, status = core.readiness()
+    return JSONResponse(body, status_code=status)
+
+
+async def metrics_endpoint(request):
+    """Prometheus text exposition format"""
+    text = await run_blocking(metrics.REGISTRY.render)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
+async def index(request):
+    return FileResponse(os.path.join(frontend_dir, "index.html"))
+
+
+async def _client(request):
+    """Rate limit key of a request (see core.client_key)"""
+    args = (request.client.host if request.client else None,
+            request.headers.get("x-forwarded-for"), request.headers.get("x-session-id"))
+    if core.rate_limit_key == "session":
+        # Checking the session may ask the shared cache: keep that off the event loop
+        return await run_blocking(core.client_key, *args)
+    return core.client_key(*args)
+
+
+async def login(request):
+    """Handle user login with ontology support"""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+    return _retry_response(*await run_blocking(core.handle_login, data or {}, await _client(request)))
+
+
+async def get_session(request):
+    """Look up a login session"""
+    body, status = await run_blocking(core.build_session_response, request.path_params["session_id"])
+    return JSONResponse(body, status_code=status)
+
+
+async def convert_guest(request):
+    """Turn a guest into a registered student"""
+    return _retry_response(*await run_blocking(core.handle_guest_conversion, await _json_body(request), await _client(request)))
+
+
+async def get_shapes(request):
+    """Get geometric shapes with ontology enhancement"""
+    return JSONResponse(await run_blocking(core.build_shapes_response))
+
+
+async def get_progress(request):
+    """Get progress for a user"""
+    user_id = request.path_params["user_id"]
+    return JSONResponse(await run_blocking(core.build_progress_response, user_id))
+
+
+async def save_progress(request):
+    """Save a quiz/practice result"""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    return _retry_response(*await run_blocking(core.handle_save_progress, request.path_params["user_id"], data,
+                                               await _client(request), request.headers.get("x-session-id")))
+
+
+async def get_history(request):
+    """Quiz/practice/topic/activity aggregates from the event log; ?events=all adds every event"""
+    full = request.query_params.get("events") == "all"
+    body, status = await run_blocking(core.build_history_response, request.path_params["user_id"], full)
+    return JSONResponse(body, status_code=status)
+
+
+async def get_mastery(request):
+    """Topic mastery for a user, with the ?k= weakest topics (default 3)"""
+    try:
+        k = int(request.query_params.get("k", 3))
+    except ValueError:
+        k = 3
+    body, status = await run_blocking(core.build_mastery_response, request.path_params["user_id"], k)
+    return JSONResponse(body, status_code=status)
+
+
+async def get_weak_students(request):
+    """Students below ?threshold= mastery (default 0.6) in a topic"""
+    try:
+        threshold = request.query_params.get("threshold")
+        threshold = float(threshold) if threshold is not None else None
+        limit = int(request.query_params.get("limit", 50))
+    except ValueError:
+        threshold, limit = None, 50
+    body, status = await run_blocking(core.build_weak_students_response, request.path_params["topic"], threshold, limit)
+    return JSONResponse(body, status_code=status)
+
+
+async def recommend(request):
+    """Next practice exercise(s) for a user (?count=, default 1)"""
+    try:
+        count = int(request.query_params.get("count", 1))
+    except ValueError:
+        count = 1
+    return JSONResponse(await run_blocking(core.build_recommendation_response, request.path_params["user_id"], count))
+
+
+async def _json_body(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def _retry_response(body, status):
+    headers = {"Retry-After": str(body.get("retry_after", 1))} if status == 429 else None
+    return JSONResponse(body, status_code=status, headers=headers)
+
+
+async def tutor_chat(request):
+    """Ask the AI tutor one question"""
+    return _retry_response(*await run_blocking(core.handle_chat, await _json_body(request)))
+
+
+async def tutor_chat_batch(request):
+    """Ask the AI tutor many questions; replies in order"""
+    return _retry_response(*await run_blocking(core.handle_chat_batch, await _json_body(request)))
+
+
+async def stream_progress(request):
+    """Live progress deltas as server-sent events (?user_id= for one student)"""
+    subscription = core.open_progress_stream(
+        request.query_params.get("user_id"), request.headers.get("last-event-id"), loop=asyncio.get_running_loop())
+    if subscription is None:
+        return JSONResponse({"error": "Too many live streams, try again later"}, status_code=503)
+
+    async def frames():
+        with subscription:
+            yield "retry: 3000\n: connected\n\n"
+            deadline = time.monotonic() + core.STREAM_MAX_SECONDS
+            dropped = 0
+            while time.monotonic() < deadline:
+                if await request.is_disconnected():
+                    break
+                messages = await subscription.wait_async(core.STREAM_HEARTBEAT_SECONDS)
+                if messages or subscription.dropped > dropped:
+                    yield "".join(core.stream_frames(subscription, messages, dropped))
+                    dropped = subscription.dropped
+                else:
+                    yield ": keep-alive\n\n"
+
+    return StreamingResponse(frames(), media_type="text/event-stream", headers=core.STREAM_HEADERS)
+
+
+class _RequestBody(io.RawIOBase):
+    """A request body as a blocking stream for a worker thread: each read awaits the next chunk on the event loop"""
+
+    def __init__(self, request):
+        self._chunks = request.stream()
+        self._pending = b""
+        self._done = False
+
+    def readable(self):
+        return True
+
+    async def _next_chunk(self):
+        try:
+            return await self._chunks.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    def readinto(self, buffer):
+        while not self._pending and not self._done:
+            chunk = anyio.from_thread.run(self._next_chunk)
+            if chunk is None:
+                self._done = True
+            else:
+                self._pending = chunk
+        count = min(len(buffer), len(self._pending))
+        buffer[:count] = self._pending[:count]
+        self._pending = self._pending[count:]
+        return count
+
+
+async def bulk_import_progress(request):
+    """Bulk import NDJSON (default) or CSV progress records, read as the body streams in"""
+    fmt = request.query_params.get("format", "ndjson")
+    stream = io.TextIOWrapper(io.BufferedReader(_RequestBody(request)), encoding="utf-8", newline="")
+    return _retry_response(*await run_blocking(core.handle_bulk_import, stream, fmt, await _client(request),
+                                               request.headers.get("x-admin-token")))
+
+
+async def export_progress(request):
+    """Stream all saved progress as NDJSON (default) or CSV"""
+    if not core.admin_authorized(request.headers.get("x-admin-token")):
+        return JSONResponse({"error": "Export needs a valid X-Admin-Token (set ITS_ADMIN_TOKEN)"}, status_code=403)
+    fmt = request.query_params.get("format", "ndjson")
+    if fmt not in core.EXPORT_MIMETYPES:
+        return JSONResponse({"error": "format must be ndjson or csv"}, status_code=400)
+    rows = await run_blocking(core.progress_export_stream, fmt)
+    headers = {"Content-Disposition": f"attachment; filename=progress.{fmt}"}
+    return StreamingResponse(iterate_in_threadpool(rows), media_type=core.EXPORT_MIMETYPES[fmt], headers=headers)
+
+
+async def get_users(request):
+    """Get all users from ontology and system"""
+    return JSONResponse(await run_blocking(core.build_users_response))
+
+
+async def get_ontology_classes(request):
+    """Get all classes from ontology"""
+    return JSONResponse(await run_blocking(core.build_ontology_classes_response))
+
+
+async def get_ontology_students(request):
+    """Get all students from ontology"""
+    body, status = await run_blocking(core.build_ontology_students_response)
+    return JSONResponse(body, status_code=status)
+
+
+async def analytics_summary(request):
+    """Class averages, spread and percentiles of quiz/practice/overall progress"""
+    return JSONResponse(await run_blocking(core.build_analytics_summary_response))
+
+
+async def analytics_distribution(request):
+    """Histogram, e.g. ?column=overall_progress&bins=10"""
+    try:
+        bins = int(request.query_params.get("bins", 10))
+    except ValueError:
+        bins = 10
+    column = request.query_params.get("column", "overall_progress")
+    body, status = await run_blocking(core.build_analytics_distribution_response, column, bins)
+    return JSONResponse(body, status_code=status)
+
+
+async def analytics_areas(request):
+    """Weak/strong counts per learning area"""
+    return JSONResponse(await run_blocking(core.build_analytics_areas_response))
+
+
+async def analytics_struggling(request):
+    """Students below ?threshold= overall progress (default 50)"""
+    try:
+        threshold = float(request.query_params.get("threshold", 50))
+        limit = int(request.query_params.get("limit", 50))
+    except ValueError:
+        threshold, limit = 50.0, 50
+    return JSONResponse(await run_blocking(core.build_analytics_struggling_response, threshold, limit))
+
+
+class StreamAwareGZip:
+    """GZipMiddleware for every response but the server-sent event streams
+
+    Some Starlette versions buffer text/event-stream bodies in GZipMiddleware,
+    which would stall live updates, so /api/stream/* bypasses it."""
+
+    def __init__(self, app, minimum_size=500):
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith("/api/stream/"):
+            await self.app(scope, receive, send)
+        else:
+            await self.gzip(scope, receive, send)
+
+
+class TenantMiddleware:
+    """Run /api/* requests with the data of the tenant they name (backend/tenants.py)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        registry = core.get_tenant_registry()
+        if registry is None or scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        try:
+            tenant_id = tenants.tenant_id_from(headers.get(tenants.TENANT_HEADER), headers.get("host"), core.tenant_domain)
+            # Opening a tenant may flush an evicted one: keep it off the event loop
+            tenant = await run_blocking(registry.acquire, tenant_id) if tenant_id is not None else None
+        except tenants.UnknownTenant:
+            await JSONResponse({"error": "Unknown tenant"}, status_code=404)(scope, receive, send)
+            return
+        if tenant is None:
+            await self.app(scope, receive, send)
+            return
+        token = tenants.activate(tenant)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            tenants.deactivate(token)
+            registry.release(tenant)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    """Start the ontology load on startup, flush storage on shutdown"""
+    core.start_ontology_loading()
+    core.start_guest_collector()
+    yield
+    await run_blocking(core.shutdown)
+
+
+routes = [
+    Route("/healthz", healthz),
+    Route("/readyz", readyz),
+    Route("/metrics", metrics_endpoint),
+    Route("/api/login", login, methods=["POST"]),
+    Route("/api/session/{session_id}", get_session),
+    Route("/api/guest/convert", convert_guest, methods=["POST"]),
+    Route("/api/shapes", get_shapes),
+    Route("/api/progress/bulk", bulk_import_progress, methods=["POST"]),
+    Route("/api/progress/export", export_progress),
+    Route("/api/progress/{user_id}", get_progress, methods=["GET"]),
+    Route("/api/progress/{user_id}", save_progress, methods=["POST"]),
+    Route("/api/history/{user_id}", get_history),
+    Route("/api/mastery/topic/{topic}/weak", get_weak_students),
+    Route("/api/mastery/{user_id}", get_mastery),
+    Route("/api/recommend/{user_id}", recommend),
+    Route("/api/tutor/chat", tutor_chat, methods=["POST"]),
+    Route("/api/tutor/chat/batch", tutor_chat_batch, methods=["POST"]),
+    Route("/api/stream/progress", stream_progress),
+    Route("/api/users", get_users),
+    Route("/api/ontology/classes", get_ontology_classes),
+    Route("/api/ontology/students", get_ontology_students),
+    Route("/api/analytics/summary", analytics_summary),
+    Route("/api/analytics/distribution", analytics_distribution),
+    Route("/api/analytics/areas", analytics_areas),
+    Route("/api/analytics/struggling", analytics_struggling),
+    Route("/", index),
+    Mount("/", app=StaticFiles(directory=frontend_dir), name="frontend"),
+]
+
+app = Starlette(routes=routes, lifespan=lifespan)
+app.add_middleware(TenantMiddleware)
+app.add_middleware(StreamAwareGZip, minimum_size=int(os.environ.get("ITS_GZIP_MIN_BYTES", "1024")))
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+app.add_middleware(metrics.ASGIMetrics, routes=routes)
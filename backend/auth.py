@@ -1,15 +1,78 @@
+import contextlib
 import json
+import logging
+import os
+import threading
 import uuid
 from datetime import datetime
 from pathlib import Path
 
+from backend.cache_backend import CacheError
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+logger = logging.getLogger("its.auth")
+
 class AuthManager:
-    def __init__(self):
-        self.users_file = Path("../data/users.json")
+    def __init__(self, users_file=None, cache=None, session_ttl=None, guest_tokens=None):
+        self.users_file = Path(users_file) if users_file else Path("../data/users.json")
         self.users_file.parent.mkdir(exist_ok=True)
+        # Shared cache (backend/cache_backend.py) so every node knows every user and session;
+        # None keeps everything in users.json
+        self.cache = cache
+        self.session_ttl = session_ttl or int(os.environ.get("ITS_SESSION_TTL", str(12 * 3600)))
+        # Signed guest tokens (backend/guests.py): guests are stored only once they save progress
+        self.guest_tokens = guest_tokens
+        # Guest ids known to be in users.json, so progress saves do not re-read the file; valid only
+        # while the file is unchanged, since another worker's collector may have removed them
+        self._stored_guests = set()
+        self._stored_guests_stamp = None
+        # Guest ids already converted to students (from their converted_from links): their tokens
+        # are revoked. Re-read only when users.json changes
+        self._converted_guests = (None, frozenset())
+        # Serializes read-modify-write cycles of users.json between request threads (and the guest
+        # collector)...
+        self._lock = threading.RLock()
+        # ...and, through an flock on a sidecar file, between server worker processes
+        self.lock_file = self.users_file.with_name(self.users_file.name + ".lock")
+        self._lock_fd = None
+        self._lock_depth = 0
         
-        if not self.users_file.exists():
-            self._initialize_users_file()
+        with self._locked():
+            if not self.users_file.exists():
+                self._initialize_users_file()
+    
+    @contextlib.contextmanager
+    def _locked(self):
+        """Hold users.json for a read-modify-write cycle (re-entrant within a thread)"""
+        with self._lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                self._lock_fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self._lock_fd is not None:
+                    os.close(self._lock_fd)  # releases the flock
+                    self._lock_fd = None
+    
+    def _cached(self, method, *args):
+        """Call a cache method; None (and a log line) if the cache is down"""
+        try:
+            return getattr(self.cache, method)(*args)
+        except CacheError as e:
+            logger.warning("Cache %s failed, using %s: %s", method, self.users_file, e)
+            return None
+    
+    def _share_student(self, student):
+        """Make a student findable by username and by name on every node"""
+        for key in {student["username"].lower(), student["name"].lower()}:
+            self._cached("set_json", f"student:{key}", student)
     
     def _initialize_users_file(self):
         """Initialize the users JSON file with sample data"""
@@ -36,27 +99,38 @@ class AuthManager:
             "sessions": []
         }
         
-        with open(self.users_file, 'w') as f:
-            json.dump(sample_users, f, indent=2)
+        self.save_users(sample_users)
     
     def load_users(self):
-        """Load users from JSON file"""
+        """Load users from JSON file
+        
+        A missing file has no users; an unreadable one raises instead of being
+        treated as empty, so the next save cannot drop every user."""
         try:
             with open(self.users_file, 'r') as f:
                 return json.load(f)
-        except:
+        except FileNotFoundError:
             return {"students": [], "guests": [], "sessions": []}
     
     def save_users(self, users_data):
-        """Save users to JSON file"""
-        with open(self.users_file, 'w') as f:
+        """Save users to JSON file (atomically: readers see the old or the new file, never half of one)"""
+        tmp_file = self.users_file.with_name(f"{self.users_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_file, 'w') as f:
             json.dump(users_data, f, indent=2)
+        os.replace(tmp_file, self.users_file)
     
     def create_guest_user(self):
-        """Create a new guest user"""
-        users_data = self.load_users()
-        
+        """Create a new guest user (with guest tokens: nothing is stored, the token is the session)"""
         guest_id = f"guest_{uuid.uuid4().hex[:8]}"
+        
+        if self.guest_tokens is not None:
+            return {
+                "user_id": guest_id,
+                "name": "Guest",
+                "type": "guest",
+                "session_id": self.guest_tokens.issue(guest_id)
+            }
+        
         guest_user = {
             "id": guest_id,
             "name": "Guest",
@@ -64,8 +138,12 @@ class AuthManager:
             "created_at": datetime.now().isoformat()
         }
         
-        users_data["guests"].append(guest_user)
-        self.save_users(users_data)
+        with self._locked():
+            users_data = self.load_users()
+            users_data["guests"].append(guest_user)
+            self.save_users(users_data)
+        if self.cache is not None:
+            self._cached("set_json", f"user:{guest_id}", guest_user)
         
         # Create session
         session = self.create_session(guest_id, "guest")
@@ -77,13 +155,133 @@ class AuthManager:
             "session_id": session["session_id"]
         }
     
+    def _users_stamp(self):
+        try:
+            stat = self.users_file.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+    
+    @staticmethod
+    def _converted_in(users_data):
+        return {guest_id for student in users_data["students"] for guest_id in student.get("converted_from", [])}
+    
+    def is_converted(self, guest_id):
+        """True once a guest has been converted to a student: their token no longer works"""
+        if self.cache is not None and self._cached("get", f"converted:{guest_id}"):
+            return True
+        stamp, converted = self._converted_guests
+        if stamp is None or stamp != self._users_stamp():
+            # Taken before reading, so a write in between makes the next call read again
+            stamp = self._users_stamp()
+            converted = frozenset(self._converted_in(self.load_users()))
+            self._converted_guests = (stamp, converted)
+        return guest_id in converted
+    
+    def materialize_guest(self, guest_id):
+        """Store a token-only guest on their first progress save; no-op once stored (or converted)"""
+        stamp = self._users_stamp()
+        if stamp == self._stored_guests_stamp and guest_id in self._stored_guests:
+            return False
+        with self._locked():
+            # Taken before reading, so any later write (ours included) invalidates what we learn
+            stamp = self._users_stamp()
+            if stamp != self._stored_guests_stamp:
+                self._stored_guests = set()
+                self._stored_guests_stamp = stamp
+            users_data = self.load_users()
+            if guest_id in self._converted_in(users_data):
+                return False
+            if any(guest["id"] == guest_id for guest in users_data["guests"]):
+                self._stored_guests.add(guest_id)
+                return False
+            now = datetime.now().isoformat()
+            guest_user = {
+                "id": guest_id,
+                "name": "Guest",
+                "type": "guest",
+                "created_at": now,
+                "materialized_at": now
+            }
+            users_data["guests"].append(guest_user)
+            self.save_users(users_data)
+            self._stored_guests.add(guest_id)
+        if self.cache is not None:
+            self._cached("set_json", f"user:{guest_id}", guest_user)
+        return True
+    
+    def convert_guest(self, guest_id, username, user_type="student"):
+        """Register a guest as username (a new or existing student) and drop the guest record
+        
+        Returns None if the guest was already converted; the converted_from link revokes their token."""
+        if user_type != "student":
+            raise ValueError(f"guests cannot convert to {user_type}")
+        with self._locked():
+            if self.is_converted(guest_id):
+                return None
+            if self.cache is not None and self._cached("add", f"converted:{guest_id}", "1") is False:
+                return None  # converted on another node at the same time
+            user = self.login_user(username)
+            users_data = self.load_users()
+            users_data["guests"] = [guest for guest in users_data["guests"] if guest["id"] != guest_id]
+            for student in users_data["students"]:
+                if student["id"] == user["user_id"]:
+                    student.setdefault("converted_from", []).append(guest_id)
+            self.save_users(users_data)
+            self._stored_guests.discard(guest_id)
+        if self.cache is not None:
+            self._cached("delete", f"user:{guest_id}")
+        return dict(user, converted_from=guest_id)
+    
+    def collect_guests(self, idle_before, last_activity=None):
+        """Remove guests idle since idle_before (an ISO time) and sessions started before it
+        
+        last_activity(guest_id) gives a guest's latest progress save, if any. Returns the removed guest ids."""
+        with self._locked():
+            users_data = self.load_users()
+            idle = set()
+            for guest in users_data["guests"]:
+                seen = (last_activity(guest["id"]) if last_activity else None) or guest.get("materialized_at") or guest.get("created_at") or ""
+                if seen < idle_before:
+                    idle.add(guest["id"])
+            sessions = [session for session in users_data["sessions"]
+                        if session["user_id"] not in idle and session.get("start_time", "") >= idle_before]
+            if not idle and len(sessions) == len(users_data["sessions"]):
+                return []
+            users_data["guests"] = [guest for guest in users_data["guests"] if guest["id"] not in idle]
+            users_data["sessions"] = sessions
+            self.save_users(users_data)
+            self._stored_guests.difference_update(idle)
+        if self.cache is not None:
+            for guest_id in idle:
+                self._cached("delete", f"user:{guest_id}")
+        return sorted(idle)
+    
     def login_user(self, username):
         """Login a registered user"""
+        # A student registered on another node
+        student = self._cached("get_json", f"student:{username.lower()}") if self.cache is not None else None
+        if student:
+            session = self.create_session(student["id"], "student")
+            return {
+                "user_id": student["id"],
+                "name": student["name"],
+                "username": student["username"],
+                "type": "student",
+                "session_id": session["session_id"]
+            }
+        
+        with self._locked():
+            return self._login_stored_user(username)
+    
+    def _login_stored_user(self, username):
         users_data = self.load_users()
         
         # Check if user exists
         for student in users_data["students"]:
             if student["username"] == username or student["name"].lower() == username.lower():
+                if self.cache is not None:
+                    self._share_student(student)
                 # Create session
                 session = self.create_session(student["id"], "student")
                 
@@ -105,6 +303,14 @@ class AuthManager:
             "type": "student"
         }
         
+        if self.cache is not None:
+            # Two nodes registering the same name at once: the first one wins
+            if self._cached("add_json", f"student:{username.lower()}", new_student) is False:
+                winner = self._cached("get_json", f"student:{username.lower()}")
+                if winner:
+                    return self.login_user(username)
+            self._share_student(new_student)
+        
         users_data["students"].append(new_student)
         self.save_users(users_data)
         
@@ -121,8 +327,6 @@ class AuthManager:
     
     def create_session(self, user_id, user_type):
         """Create a new login session"""
-        users_data = self.load_users()
-        
         session_id = f"session_{uuid.uuid4().hex[:8]}"
         session = {
             "session_id": session_id,
@@ -132,20 +336,67 @@ class AuthManager:
             "is_active": True
         }
         
-        users_data["sessions"].append(session)
-        self.save_users(users_data)
+        # Sessions live in the shared cache (with an expiry) when there is one
+        if self.cache is not None:
+            try:
+                self.cache.set_json(f"session:{session_id}", session, self.session_ttl)
+                return session
+            except CacheError as e:
+                logger.warning("Cache set_json failed, storing session in %s: %s", self.users_file, e)
+        
+        with self._locked():
+            users_data = self.load_users()
+            users_data["sessions"].append(session)
+            self.save_users(users_data)
         
         return session
     
+    def get_session(self, session_id):
+        """An active session by id, from any node; None if unknown, ended or expired"""
+        guest = self.guest_tokens.verify(session_id) if self.guest_tokens is not None else None
+        if guest:
+            if self.is_converted(guest["id"]):
+                return None
+            return {
+                "session_id": session_id,
+                "user_id": guest["id"],
+                "user_type": "guest",
+                "start_time": guest["created_at"],
+                "is_active": True
+            }
+        
+        if self.cache is not None:
+            session = self._cached("get_json", f"session:{session_id}")
+            if session:
+                return session
+        
+        for session in self.load_users()["sessions"]:
+            if session["session_id"] == session_id and session.get("is_active"):
+                return session
+        return None
+    
+    def known_session(self, session_id):
+        """True for a valid guest token or a session in the shared cache
+
+        Reads users.json only to refresh the converted guests after the file changed."""
+        guest = self.guest_tokens.verify(session_id) if self.guest_tokens is not None else None
+        if guest:
+            return not self.is_converted(guest["id"])
+        return self.cache is not None and bool(self._cached("get", f"session:{session_id}"))
+    
     def end_session(self, session_id):
         """End a login session"""
-        users_data = self.load_users()
+        if self.cache is not None:
+            self._cached("delete", f"session:{session_id}")
         
-        for session in users_data["sessions"]:
-            if session["session_id"] == session_id:
-                session["is_active"] = False
-                session["end_time"] = datetime.now().isoformat()
-                break
-        
-        self.save_users(users_data)
+        with self._locked():
+            users_data = self.load_users()
+            
+            for session in users_data["sessions"]:
+                if session["session_id"] == session_id:
+                    session["is_active"] = False
+                    session["end_time"] = datetime.now().isoformat()
+                    break
+            
+            self.save_users(users_data)
         return True
\ No newline at end of file
@@ -0,0 +1,444 @@
+"""Shared cache and session backend for running several nodes behind a load balancer
+
+Users, login sessions and progress are mirrored into a key-value backend
+that every node can reach, so a student who logged in on one node is known
+on all of them. lock() serializes read-modify-write cycles across nodes. ITS_CACHE_URL selects it:
+
+    local://                                  in-process dict (one process only; tests and development)
+    redis://host:6379/0                       a Redis server (or anything that speaks its protocol)
+    redis://a:6379,redis://b:6379             keys spread over several servers by consistent hashing
+
+Values are strings (JSON for records). Every call can raise CacheError;
+callers treat the backend as a cache and fall back to their local files.
+
+    cache = from_url("redis://10.0.0.5:6379,redis://10.0.0.6:6379").namespace("its:default:")
+    cache.set_json("session:abc", {"user_id": "student_001"}, ttl=3600)
+"""
+import bisect
+import hashlib
+import json
+import queue
+import socket
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+from backend import metrics
+
+CACHE_REQUESTS = metrics.REGISTRY.register(metrics.Counter(
+    "its_cache_requests_total", "Shared cache lookups", ("result",)))
+CACHE_ERRORS = metrics.REGISTRY.register(metrics.Counter(
+    "its_cache_errors_total", "Shared cache calls that failed", ("backend",)))
+
+# Virtual nodes per server on the hash ring
+RING_REPLICAS = 160
+# After a server fails to answer, calls fail fast for this long instead of each waiting for the timeout
+RETRY_AFTER_SECONDS = 2.0
+# A lock outlives a crashed holder by at most LOCK_TTL_SECONDS; waiters give up after LOCK_WAIT_SECONDS
+LOCK_TTL_SECONDS = 10
+LOCK_WAIT_SECONDS = 5.0
+# Compare-and-delete, so a lock is released only by the holder that took it
+DELETE_IF_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+
+class CacheError(Exception):
+    """The backend could not be reached or refused the command"""
+
+
+class CacheBackend:
+    """Interface: string values by key, with optional expiry in seconds"""
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def add(self, key, value, ttl=None):
+        """Set key only if it does not exist; True if this call set it"""
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def delete_if(self, key, value):
+        """Delete key only if it still holds value, in one step; True if this call deleted it"""
+        raise NotImplementedError
+
+    def get_many(self, keys):
+        """{key: value} for the keys that exist"""
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def get_json(self, key):
+        value = self.get(key)
+        CACHE_REQUESTS.inc("miss" if value is None else "hit")
+        return json.loads(value) if value is not None else None
+
+    def set_json(self, key, value, ttl=None):
+        self.set(key, json.dumps(value, separators=(",", ":")), ttl)
+
+    def add_json(self, key, value, ttl=None):
+        return self.add(key, json.dumps(value, separators=(",", ":")), ttl)
+
+    def namespace(self, prefix):
+        """This backend with every key prefixed (one namespace per tenant)"""
+        return Namespace(self, prefix)
+
+    def lock(self, name, ttl=LOCK_TTL_SECONDS, wait=LOCK_WAIT_SECONDS):
+        """A context manager holding name exclusively across every node sharing the backend"""
+        return CacheLock(self, f"lock:{name}", ttl, wait)
+
+    def close(self):
+        pass
+
+
+class CacheLock:
+    """add() with an expiry as a lock; raises CacheError if it cannot be taken within wait seconds"""
+
+    def __init__(self, cache, key, ttl, wait):
+        self.cache = cache
+        self.key = key
+        self.ttl = ttl
+        self.wait = wait
+        self.token = uuid.uuid4().hex
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.wait
+        delay = 0.005
+        while not self.cache.add(self.key, self.token, self.ttl):
+            if time.monotonic() >= deadline:
+                raise CacheError(f"timed out waiting for {self.key}")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+        return self
+
+    def __exit__(self, *exc_info):
+        # Only release our own lock: after ttl another holder may have taken it
+        try:
+            self.cache.delete_if(self.key, self.token)
+        except CacheError:
+            pass  # it expires by itself
+
+
+class Namespace(CacheBackend):
+    """Prefixes keys of an underlying backend"""
+
+    def __init__(self, backend, prefix):
+        self.backend = backend
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.backend.get(self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(self.prefix + key, value, ttl)
+
+    def add(self, key, value, ttl=None):
+        return self.backend.add(self.prefix + key, value, ttl)
+
+    def delete(self, key):
+        self.backend.delete(self.prefix + key)
+
+    def delete_if(self, key, value):
+        return self.backend.delete_if(self.prefix + key, value)
+
+    def get_many(self, keys):
+        found = self.backend.get_many([self.prefix + key for key in keys])
+        return {key[len(self.prefix):]: value for key, value in found.items()}
+
+    def namespace(self, prefix):
+        return Namespace(self.backend, self.prefix + prefix)
+
+
+class LocalBackend(CacheBackend):
+    """In-process stand-in with the same behaviour (expiry included), for tests and single-node use"""
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return self._data.get(key)
+
+    def get(self, key):
+        with self._lock:
+            return self._live(key)
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = str(value)
+            if ttl:
+                self._expires[key] = time.monotonic() + ttl
+            else:
+                self._expires.pop(key, None)
+
+    def add(self, key, value, ttl=None):
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._data[key] = str(value)
+            if ttl:
+                self._expires[key] = time.monotonic() + ttl
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+
+    def delete_if(self, key, value):
+        with self._lock:
+            if self._live(key) != str(value):
+                return False
+            del self._data[key]
+            self._expires.pop(key, None)
+            return True
+
+    def get_many(self, keys):
+        with self._lock:
+            return {key: value for key in keys for value in [self._live(key)] if value is not None}
+
+
+class _Connection:
+    """One socket speaking RESP2"""
+
+    def __init__(self, host, port, timeout):
+        self.sock = socket.create_connection((host, port), timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+
+    def send(self, *args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self.sock.sendall(b"".join(parts))
+
+    def read(self):
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("connection closed by the server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            raise CacheError(rest.decode("utf-8", "replace"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2].decode("utf-8")
+        if kind == b"*":
+            count = int(rest)
+            return None if count < 0 else [self.read() for _ in range(count)]
+        raise CacheError(f"unexpected reply {line[:20]!r}")
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RedisBackend(CacheBackend):
+    """Minimal Redis-protocol client (GET/SET/DEL/MGET) with a small connection pool"""
+
+    def __init__(self, host="localhost", port=6379, db=0, password=None, timeout=2.0, pool_size=8):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._down_until = 0.0
+
+    def __repr__(self):
+        return f"redis://{self.host}:{self.port}/{self.db}"
+
+    def _connect(self):
+        connection = _Connection(self.host, self.port, self.timeout)
+        if self.password:
+            connection.send("AUTH", self.password)
+            connection.read()
+        if self.db:
+            connection.send("SELECT", self.db)
+            connection.read()
+        return connection
+
+    def execute(self, *args):
+        """Send one command and return its reply; retries once on a stale pooled connection"""
+        if self._down_until > time.monotonic():
+            raise CacheError(f"{self!r} is down")
+        for attempt in (1, 2):
+            try:
+                connection = self._pool.get_nowait()
+                reused = True
+            except queue.Empty:
+                connection, reused = None, False
+            try:
+                if connection is None:
+                    connection = self._connect()
+                connection.send(*args)
+                reply = connection.read()
+            except CacheError:
+                # An error reply leaves the connection usable
+                self._release(connection)
+                raise
+            except (OSError, ValueError) as e:
+                if connection is not None:
+                    connection.close()
+                if reused and attempt == 1:
+                    continue
+                CACHE_ERRORS.inc(repr(self))
+                self._down_until = time.monotonic() + RETRY_AFTER_SECONDS
+                raise CacheError(f"{self!r}: {e}") from e
+            self._release(connection)
+            return reply
+
+    def _release(self, connection):
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def get(self, key):
+        return self.execute("GET", key)
+
+    def set(self, key, value, ttl=None):
+        if ttl:
+            self.execute("SET", key, value, "EX", int(ttl))
+        else:
+            self.execute("SET", key, value)
+
+    def add(self, key, value, ttl=None):
+        args = ("SET", key, value, "NX") + (("EX", int(ttl)) if ttl else ())
+        return self.execute(*args) == "OK"
+
+    def delete(self, key):
+        self.execute("DEL", key)
+
+    def delete_if(self, key, value):
+        return self.execute("EVAL", DELETE_IF_SCRIPT, 1, key, value) == 1
+
+    def get_many(self, keys):
+        if not keys:
+            return {}
+        values = self.execute("MGET", *keys)
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def ping(self):
+        return self.execute("PING") == "PONG"
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class HashRing:
+    """Consistent hashing: adding or removing a node moves only about 1/n of the keys"""
+
+    def __init__(self, nodes, replicas=RING_REPLICAS):
+        self.replicas = replicas
+        self._points = []
+        self._nodes = []
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(text):
+        return int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:8], "big")
+
+    def add(self, node):
+        for replica in range(self.replicas):
+            point = self._hash(f"{node}#{replica}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._nodes.insert(index, node)
+
+    def remove(self, node):
+        keep = [(point, owner) for point, owner in zip(self._points, self._nodes) if owner != node]
+        self._points = [point for point, _ in keep]
+        self._nodes = [owner for _, owner in keep]
+
+    def node_for(self, key):
+        if not self._points:
+            raise CacheError("no cache nodes")
+        index = bisect.bisect(self._points, self._hash(key)) % len(self._points)
+        return self._nodes[index]
+
+
+class ShardedBackend(CacheBackend):
+    """Spreads keys over several backends with a HashRing"""
+
+    def __init__(self, backends, replicas=RING_REPLICAS):
+        # name -> backend; the names (URLs) are what gets hashed, so every node builds the same ring
+        self.backends = dict(backends)
+        self.ring = HashRing(self.backends, replicas)
+
+    def backend_for(self, key):
+        return self.backends[self.ring.node_for(key)]
+
+    def get(self, key):
+        return self.backend_for(key).get(key)
+
+    def set(self, key, value, ttl=None):
+        self.backend_for(key).set(key, value, ttl)
+
+    def add(self, key, value, ttl=None):
+        return self.backend_for(key).add(key, value, ttl)
+
+    def delete(self, key):
+        self.backend_for(key).delete(key)
+
+    def delete_if(self, key, value):
+        return self.backend_for(key).delete_if(key, value)
+
+    def get_many(self, keys):
+        by_backend = {}
+        for key in keys:
+            by_backend.setdefault(self.ring.node_for(key), []).append(key)
+        found = {}
+        for name, group in by_backend.items():
+            found.update(self.backends[name].get_many(group))
+        return found
+
+    def close(self):
+        for backend in self.backends.values():
+            backend.close()
+
+
+def _redis_from_url(url):
+    parsed = urlparse(url)
+    db = parsed.path.strip("/")
+    return RedisBackend(parsed.hostname or "localhost", parsed.port or 6379, int(db) if db else 0, parsed.password)
+
+
+def from_url(spec):
+    """Backend for an ITS_CACHE_URL value (comma-separated redis:// URLs are sharded)"""
+    urls = [url.strip() for url in spec.split(",") if url.strip()]
+    if not urls or urls == ["local://"]:
+        return LocalBackend()
+    for url in urls:
+        if not url.startswith("redis://"):
+            raise ValueError(f"unsupported cache URL {url!r} (expected local:// or redis://)")
+    if len(urls) == 1:
+        return _redis_from_url(urls[0])
+    return ShardedBackend({url: _redis_from_url(url) for url in urls})
@@ -0,0 +1,123 @@
+"""Tutor chat worker pool with bounded queueing and backpressure
+
+Chat requests, single messages or whole batches (replayed transcripts,
+classroom broadcasts), are answered on a fixed pool of worker threads.
+At most ITS_CHAT_QUEUE messages may be admitted (queued or running) at
+once; a request that does not fit is rejected straight away with
+ChatOverloaded (HTTP 429) instead of piling up behind the others. A batch
+is split into one contiguous chunk per worker and the chunk results are
+joined back in message order.
+
+    pool = ChatPool(get_ai_tutor)
+    pool.answer_batch([("hello", "student_001"), ("cube volume?", "student_001")])
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from backend import metrics
+
+CHAT_BATCH_LATENCY = metrics.REGISTRY.register(metrics.Histogram(
+    "its_chat_batch_duration_seconds", "Tutor chat latency per request (single message or batch)", ("kind",)))
+CHAT_BATCH_SIZE = metrics.REGISTRY.register(metrics.Histogram(
+    "its_chat_batch_messages", "Messages per tutor chat request", ("kind",),
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500)))
+CHAT_REJECTED = metrics.REGISTRY.register(metrics.Counter(
+    "its_chat_rejected_total", "Tutor chat requests turned away", ("reason",)))
+CHAT_ADMITTED = metrics.REGISTRY.register(metrics.Gauge(
+    "its_chat_messages_admitted", "Tutor chat messages queued or being answered"))
+
+
+class ChatOverloaded(Exception):
+    """The pool has no room for the request; retry after retry_after seconds"""
+
+    def __init__(self, retry_after=1):
+        super().__init__("tutor chat is busy")
+        self.retry_after = retry_after
+
+
+class ChatTimeout(Exception):
+    """The request was admitted but not answered in time"""
+
+
+class ChatPool:
+    """Answers tutor messages on a bounded thread pool"""
+
+    def __init__(self, tutor_getter, workers=None, max_queue=None, timeout=None):
+        self.tutor_getter = tutor_getter
+        self.workers = workers or int(os.environ.get("ITS_CHAT_WORKERS", "4"))
+        self.max_queue = max_queue or int(os.environ.get("ITS_CHAT_QUEUE", "256"))
+        self.timeout = timeout or float(os.environ.get("ITS_CHAT_TIMEOUT", "10"))
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tutor-chat")
+        self._admitted = 0
+        self._lock = threading.Lock()
+
+    def _admit(self, count):
+        """Reserve room for count messages, all or nothing"""
+        with self._lock:
+            if self._admitted + count > self.max_queue:
+                return False
+            self._admitted += count
+        CHAT_ADMITTED.inc(amount=count)
+        return True
+
+    def _release(self, count):
+        with self._lock:
+            self._admitted -= count
+        CHAT_ADMITTED.dec(amount=count)
+
+    @staticmethod
+    def _answer_chunk(tutor, chunk):
+        return [tutor.get_response(message, user_id) for message, user_id in chunk]
+
+    def answer_batch(self, messages, kind="batch"):
+        """Replies to [(message, user_id), ...], in order"""
+        count = len(messages)
+        if not count:
+            return []
+        if count > self.max_queue:
+            CHAT_REJECTED.inc("too_large")
+            raise ValueError(f"at most {self.max_queue} messages per request")
+        # Resolved in the caller's thread: the getter may depend on the request context (its tenant)
+        tutor = self.tutor_getter()
+        if not self._admit(count):
+            CHAT_REJECTED.inc("queue_full")
+            raise ChatOverloaded()
+
+        started = time.perf_counter()
+        chunk_size = -(-count // self.workers)
+        futures = []
+        submitted = 0
+        try:
+            for start in range(0, count, chunk_size):
+                chunk = messages[start:start + chunk_size]
+                future = self._executor.submit(self._answer_chunk, tutor, chunk)
+                submitted += len(chunk)
+                # Runs when the chunk is answered, fails or is cancelled by shutdown()
+                future.add_done_callback(lambda _, size=len(chunk): self._release(size))
+                futures.append(future)
+        except RuntimeError:
+            # Executor shut down: give back the room of the chunks never submitted
+            self._release(count - submitted)
+            raise ChatOverloaded()
+
+        replies = []
+        deadline = started + self.timeout
+        try:
+            for future in futures:
+                replies.extend(future.result(timeout=max(deadline - time.perf_counter(), 0)))
+        except FutureTimeout:
+            CHAT_REJECTED.inc("timeout")
+            raise ChatTimeout(f"no reply within {self.timeout:g}s")
+        finally:
+            CHAT_BATCH_LATENCY.observe(time.perf_counter() - started, kind)
+            CHAT_BATCH_SIZE.observe(count, kind)
+        return replies
+
+    def answer(self, message, user_id):
+        """Reply to one message"""
+        return self.answer_batch([(message, user_id)], kind="single")[0]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,440 @@
+"""Append-only learning history with incrementally maintained aggregates
+
+Every quiz answer, practice attempt and topic interaction is appended as
+one NDJSON line to data/events.ndjson; nothing in the log is ever rewritten.
+Aggregates (quiz totals, practice accuracy, topic counts, daily activity,
+recent events) are folded in as events arrive, so reading them never means
+rescanning the log.
+
+    {"ts": "2025-01-15T10:45:00", "type": "quiz", "user_id": "student_001", "score": 2, "total": 3}
+
+Every ITS_EVENT_SNAPSHOT_EVERY events the aggregate state is written to a
+snapshot together with the log offset it covers; on start-up the snapshot
+is loaded and only the tail of the log after that offset is replayed. An
+aggregate added later (not in the snapshot) is rebuilt from the start of
+the log once, on its own.
+
+Several server processes may append to the same log: each one appends its
+event and then catches up from its last offset, so every process folds in
+the same events in the same order.
+"""
+import json
+import logging
+import math
+import os
+import threading
+from datetime import datetime
+
+logger = logging.getLogger("its.events")
+
+EVENT_TYPES = ("quiz", "practice", "topic")
+RECENT_EVENTS = 20
+
+# ==================== AGGREGATES ====================
+
+# name -> aggregate class, filled in by @aggregate
+AGGREGATES = {}
+
+
+def aggregate(name):
+    """Register an aggregate class under a name"""
+    def register(cls):
+        cls.name = name
+        AGGREGATES[name] = cls
+        return cls
+    return register
+
+
+class Aggregate:
+    """Per-user state folded from events; subclasses define new_state() and apply()"""
+    event_types = EVENT_TYPES
+
+    def __init__(self, users=None):
+        # user_id -> JSON-serializable state
+        self.users = users or {}
+
+    def new_state(self):
+        return {}
+
+    def apply(self, state, event):
+        raise NotImplementedError
+
+    def fold(self, event):
+        if event["type"] in self.event_types:
+            state = self.users.get(event["user_id"])
+            if state is None:
+                state = self.users[event["user_id"]] = self.new_state()
+            self.apply(state, event)
+
+
+@aggregate("quiz")
+class QuizTotals(Aggregate):
+    """Quizzes taken, points scored and average percentage"""
+    event_types = ("quiz",)
+
+    def new_state(self):
+        return {"quizzes": 0, "total_score": 0, "total_possible": 0, "average_percent": 0, "best_percent": 0, "last_quiz": None}
+
+    def apply(self, state, event):
+        total = event.get("total") or 0
+        state["quizzes"] += 1
+        state["total_score"] += event.get("score", 0)
+        state["total_possible"] += total
+        if state["total_possible"]:
+            state["average_percent"] = state["total_score"] * 100 / state["total_possible"]
+        if total:
+            state["best_percent"] = max(state["best_percent"], event.get("score", 0) * 100 / total)
+        state["last_quiz"] = event["ts"]
+
+
+@aggregate("practice")
+class PracticeTotals(Aggregate):
+    """Practice sessions, exercises completed/correct and accuracy"""
+    event_types = ("practice",)
+
+    def new_state(self):
+        return {"sessions": 0, "completed": 0, "correct": 0, "accuracy": 0, "last_practice": None}
+
+    def apply(self, state, event):
+        state["sessions"] += 1
+        state["completed"] += event.get("completed", 0)
+        state["correct"] += event.get("correct", 0)
+        if state["completed"]:
+            state["accuracy"] = state["correct"] * 100 / state["completed"]
+        state["last_practice"] = event["ts"]
+
+
+@aggregate("topics")
+class TopicCounts(Aggregate):
+    """Interactions per topic, across quizzes, practice and tutor questions"""
+
+    def apply(self, state, event):
+        topic = event.get("topic")
+        if topic:
+            state[topic] = state.get(topic, 0) + 1
+
+
+@aggregate("activity")
+class DailyActivity(Aggregate):
+    """Events per day and the current run of consecutive active days"""
+
+    def new_state(self):
+        return {"days": {}, "streak": 0, "last_day": None}
+
+    def apply(self, state, event):
+        day = event["ts"][:10]
+        state["days"][day] = state["days"].get(day, 0) + 1
+        if day != state["last_day"]:
+            previous = state["last_day"]
+            consecutive = previous and (datetime.fromisoformat(day) - datetime.fromisoformat(previous)).days == 1
+            state["streak"] = state["streak"] + 1 if consecutive else 1
+            state["last_day"] = day
+
+
+@aggregate("recent")
+class RecentEvents(Aggregate):
+    """The last few events of each user, newest last"""
+
+    def new_state(self):
+        return {"events": []}
+
+    def apply(self, state, event):
+        state["events"].append(event)
+        del state["events"][:-RECENT_EVENTS]
+
+
+# ==================== EVENT STORE ====================
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def check_event(event):
+    """Return why an event cannot be folded in, or None"""
+    if not isinstance(event, dict) or not isinstance(event.get("user_id"), str) or not isinstance(event.get("ts"), str):
+        return "not an event"
+    if event.get("type") not in EVENT_TYPES:
+        return f"unknown type {event.get('type')!r}"
+    if not isinstance(event.get("topic", ""), str):
+        return "topic must be a string"
+    if event["type"] == "quiz" and not (_is_number(event.get("score", 0)) and _is_number(event.get("total", 0))):
+        return "quiz score and total must be numbers"
+    if event["type"] == "practice" and not (_is_number(event.get("completed", 0)) and _is_number(event.get("correct", 0))):
+        return "practice completed and correct must be numbers"
+    by_topic = event.get("by_topic")
+    if by_topic is not None and not (isinstance(by_topic, dict) and all(
+            isinstance(cell, list) and len(cell) == 2 and all(map(_is_number, cell)) for cell in by_topic.values())):
+        return "by_topic must map topics to [correct, attempts]"
+    return None
+
+
+def _by_topic(answers):
+    """{topic: [correct, attempts]} from [{"topic": ..., "correct": bool}, ...]"""
+    by_topic = {}
+    for answer in answers or ():
+        if isinstance(answer, dict) and answer.get("topic"):
+            cell = by_topic.setdefault(answer["topic"], [0, 0])
+            cell[0] += 1 if answer.get("correct") else 0
+            cell[1] += 1
+    return by_topic or None
+
+
+def events_from_update(progress_update):
+    """Translate a save_progress payload into (type, fields) events"""
+    topic = progress_update.get("topic")
+    events = []
+    quiz = progress_update.get("quiz")
+    if isinstance(quiz, dict) and "score" in quiz and "total" in quiz:
+        events.append(("quiz", {
+            "score": quiz["score"],
+            "total": quiz["total"],
+            "topic": quiz.get("topic", topic),
+            "by_topic": _by_topic(quiz.get("questions")),
+        }))
+    practice = progress_update.get("practice")
+    if isinstance(practice, dict):
+        completed = practice.get("completed", 0)
+        events.append(("practice", {
+            "completed": completed if isinstance(completed, int) else len(completed),
+            "correct": practice.get("correct", 0),
+            "topic": practice.get("topic", topic),
+            "by_topic": _by_topic(practice.get("exercises")),
+        }))
+    if topic and not events:
+        events.append(("topic", {"topic": topic}))
+    return events
+
+
+class EventStore:
+    """Append-only event log plus the registered aggregates over it
+
+    projections are extra views fed lists of events, e.g. the mastery
+    matrix: objects with fold_events(events), to_state() and load_state(state).
+    """
+
+    def __init__(self, log_file, snapshot_file=None, snapshot_every=None, projections=None):
+        self.log_file = str(log_file)
+        self.snapshot_file = str(snapshot_file or os.path.splitext(self.log_file)[0] + ".snapshot.json")
+        if snapshot_every is None:
+            snapshot_every = int(os.environ.get("ITS_EVENT_SNAPSHOT_EVERY", "5000"))
+        self.snapshot_every = snapshot_every
+        self.fsync = os.environ.get("ITS_EVENT_FSYNC", "0") == "1"
+        self._lock = threading.RLock()
+        # Byte offset of the log up to which events have been folded in
+        self.offset = 0
+        self.events_seen = 0
+        self._since_snapshot = 0
+        self.aggregates = {}
+        self.projections = dict(projections or {})
+        os.makedirs(os.path.dirname(os.path.abspath(self.log_file)), exist_ok=True)
+        self._load()
+
+    # ---------- start-up ----------
+
+    def _load(self):
+        """Restore from the snapshot, then replay the tail of the log"""
+        snapshot = self._read_snapshot()
+        saved = snapshot.get("aggregates", {})
+        missing = [name for name in AGGREGATES if name not in saved]
+        self.aggregates = {name: cls(saved.get(name)) for name, cls in AGGREGATES.items()}
+        self.offset = snapshot.get("offset", 0)
+        self.events_seen = snapshot.get("events", 0)
+
+        saved_projections = snapshot.get("projections", {})
+        for name, projection in self.projections.items():
+            if name in saved_projections:
+                projection.load_state(saved_projections[name])
+        missing_projections = [name for name in self.projections if name not in saved_projections]
+
+        if (missing or missing_projections) and self.offset:
+            # New aggregates/projections: fold in the history the snapshot already covers
+            logger.info("Building %s from the event log", ", ".join(missing + missing_projections))
+            batch = []
+            for event, _ in self._read_from(0, self.offset):
+                if check_event(event):
+                    continue  # skipped (and logged) when it was first caught up
+                for name in missing:
+                    self.aggregates[name].fold(event)
+                batch.append(event)
+                if len(batch) >= 10000:
+                    self._project(batch, missing_projections)
+                    batch = []
+            self._project(batch, missing_projections)
+        self.catch_up()
+
+    def _read_snapshot(self):
+        try:
+            with open(self.snapshot_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable event snapshot %s: %s", self.snapshot_file, e)
+        return {}
+
+    def _project(self, events, names):
+        if events:
+            for name in names:
+                self.projections[name].fold_events(events)
+
+    def _read_from(self, offset, end=None):
+        """Yield (event, offset after it) for complete lines from a byte offset"""
+        try:
+            f = open(self.log_file, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # another process is mid-append
+                offset += len(line)
+                if end is not None and offset > end:
+                    break
+                try:
+                    yield json.loads(line), offset
+                except ValueError:
+                    logger.warning("Skipping corrupt event at byte %d of %s", offset - len(line), self.log_file)
+
+    # ---------- writing ----------
+
+    def _new_event(self, user_id, event_type, fields):
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"unknown event type: {event_type}")
+        event = {"ts": datetime.now().isoformat(), "type": event_type, "user_id": user_id}
+        event.update((key, value) for key, value in fields.items() if value is not None)
+        error = check_event(event)
+        if error:
+            raise ValueError(f"bad {event_type} event: {error}")
+        return event
+
+    def _write(self, events):
+        """Append events in one write, then fold them (and any others' events) in"""
+        data = b"".join((json.dumps(event, separators=(",", ":")) + "\n").encode("utf-8") for event in events)
+        if not data:
+            return
+        with self._lock:
+            # O_APPEND keeps each write whole when several processes append
+            fd = os.open(self.log_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+            self.catch_up()
+
+    def append(self, user_id, event_type, **fields):
+        """Append one event to the log"""
+        event = self._new_event(user_id, event_type, fields)
+        self._write([event])
+        return event
+
+    def record_progress_update(self, user_id, progress_update):
+        """Log the events behind a save_progress payload"""
+        events = [self._new_event(user_id, event_type, fields) for event_type, fields in events_from_update(progress_update)]
+        self._write(events)
+        return events
+
+    def record_updates(self, updates):
+        """Log the events behind many (user_id, progress_update) pairs with one write"""
+        events = [
+            self._new_event(user_id, event_type, fields)
+            for user_id, progress_update in updates
+            for event_type, fields in events_from_update(progress_update)
+        ]
+        self._write(events)
+        return len(events)
+
+    def catch_up(self):
+        """Fold in everything appended to the log since the last call
+
+        An event that cannot be folded in is logged and skipped: one bad line
+        must not stop the log from moving past it. Projections take the
+        accepted events as one batch."""
+        with self._lock:
+            accepted = []
+            for event, offset in self._read_from(self.offset):
+                self.offset = offset
+                error = check_event(event)
+                if error:
+                    logger.error("Skipping event at byte %d of %s (%s): %r", offset, self.log_file, error, event)
+                    continue
+                try:
+                    for agg in self.aggregates.values():
+                        agg.fold(event)
+                except Exception as e:
+                    logger.exception("Skipping event at byte %d of %s that failed to fold: %s", offset, self.log_file, e)
+                    continue
+                accepted.append(event)
+                self.events_seen += 1
+                self._since_snapshot += 1
+            for name in self.projections:
+                try:
+                    self._project(accepted, [name])
+                except Exception as e:
+                    # A half-applied batch cannot be undone: rebuild the projection instead
+                    logger.exception("Projection %s failed to fold %d events, rebuilding it: %s", name, len(accepted), e)
+                    self._rebuild_projection(name)
+            if self.snapshot_every and self._since_snapshot >= self.snapshot_every:
+                self.snapshot()
+
+    def _rebuild_projection(self, name):
+        """Reload a projection from the snapshot and replay the log up to the current offset"""
+        snapshot = self._read_snapshot()
+        saved = snapshot.get("projections", {}).get(name)
+        start = snapshot.get("offset", 0)
+        if saved is None or start > self.offset:
+            saved, start = {}, 0
+        try:
+            self.projections[name].load_state(saved)
+            batch = []
+            for event, _ in self._read_from(start, self.offset):
+                if check_event(event):
+                    continue
+                batch.append(event)
+                if len(batch) >= 10000:
+                    self._project(batch, [name])
+                    batch = []
+            self._project(batch, [name])
+        except Exception as e:
+            logger.exception("Could not rebuild projection %s: %s", name, e)
+
+    def snapshot(self):
+        """Write the aggregate state and the log offset it covers"""
+        with self._lock:
+            data = {
+                "offset": self.offset,
+                "events": self.events_seen,
+                "taken_at": datetime.now().isoformat(),
+                "aggregates": {name: agg.users for name, agg in self.aggregates.items()},
+                "projections": {name: projection.to_state() for name, projection in self.projections.items()},
+            }
+            tmp_file = f"{self.snapshot_file}.{os.getpid()}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp_file, self.snapshot_file)
+            self._since_snapshot = 0
+        logger.debug("Event snapshot at offset %d (%d events)", self.offset, self.events_seen)
+
+    def flush(self):
+        """Snapshot if anything changed since the last one (called on shutdown)"""
+        with self._lock:
+            if self._since_snapshot:
+                self.snapshot()
+        return True
+
+    # ---------- reading ----------
+
+    def user_aggregates(self, user_id):
+        """Every aggregate's state for one user"""
+        self.catch_up()
+        with self._lock:
+            return {
+                name: json.loads(json.dumps(agg.users[user_id])) if user_id in agg.users else agg.new_state()
+                for name, agg in self.aggregates.items()
+            }
+
+    def user_events(self, user_id):
+        """Full history of one user, read back from the log"""
+        return [event for event, _ in self._read_from(0) if event.get("user_id") == user_id]
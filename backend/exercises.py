@@ -0,0 +1,238 @@
+"""Parameterized exercise generator with a memory-mapped item bank
+
+Every topic (cube_volume, cone_volume, ...) is a question template with up
+to two integer parameters and an answer formula. generate() draws the
+parameters for a whole (topic, difficulty) block at once with NumPy and
+evaluates the formula over the arrays, so a million answer keys cost a
+few array operations rather than a million function calls.
+
+The bank is saved as one fixed-width record per item (topic, difficulty,
+parameters, answer) in <path>.npy, plus <path>.json with the topic list and
+the [start, count) slice of each (topic, difficulty) block. It is opened
+with mmap_mode="r": server workers share the pages and serving an item is
+one row read and a string format.
+
+    python -m backend.exercises generate --per-level 100000
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+try:
+    import numpy as np
+except ImportError:  # the recommender falls back to its small in-memory bank
+    np = None
+
+logger = logging.getLogger("its.exercises")
+
+DIFFICULTIES = (1, 2, 3)
+MAX_PARAMS = 2
+BANK_VERSION = 2
+DEFAULT_PER_LEVEL = 1000
+
+# topic -> (shape type, formula kind, question, hint, answer(params), param ranges per difficulty)
+# answer() takes {name: value} and works the same on scalars and NumPy arrays.
+TEMPLATES = {
+    "cube_volume": ("Cube", "volume", "Calculate the volume of a cube with side length {a} units.",
+                    "Volume of cube = side³", lambda p: p["a"] ** 3,
+                    {1: {"a": (2, 5)}, 2: {"a": (6, 12)}, 3: {"a": (13, 25)}}),
+    "cube_surface": ("Cube", "surface", "Find the surface area of a cube with side length {a} units.",
+                     "Surface area of cube = 6a²", lambda p: 6 * p["a"] ** 2,
+                     {1: {"a": (2, 5)}, 2: {"a": (6, 12)}, 3: {"a": (13, 25)}}),
+    "sphere_volume": ("Sphere", "volume", "Find the volume of a sphere with radius {r} units. (Use π = 3.14)",
+                      "Volume of sphere = 4/3 π r³", lambda p: 4 / 3 * 3.14 * p["r"] ** 3,
+                      {1: {"r": (1, 3)}, 2: {"r": (4, 8)}, 3: {"r": (9, 15)}}),
+    "sphere_surface": ("Sphere", "surface", "Find the surface area of a sphere with radius {r} units. (Use π = 3.14)",
+                       "Surface area of sphere = 4πr²", lambda p: 4 * 3.14 * p["r"] ** 2,
+                       {1: {"r": (1, 3)}, 2: {"r": (4, 8)}, 3: {"r": (9, 15)}}),
+    "cone_volume": ("Cone", "volume", "Find the volume of a cone with radius {r} units and height {h} units. (Use π = 3.14)",
+                    "Volume of cone = (1/3) π r² h", lambda p: 3.14 * p["r"] ** 2 * p["h"] / 3,
+                    {1: {"r": (1, 3), "h": (3, 6)}, 2: {"r": (4, 7), "h": (6, 12)}, 3: {"r": (8, 14), "h": (12, 30)}}),
+    "cylinder_volume": ("Cylinder", "volume", "Find the volume of a cylinder with radius {r} units and height {h} units. (Use π = 3.14)",
+                        "Volume of cylinder = πr²h", lambda p: 3.14 * p["r"] ** 2 * p["h"],
+                        {1: {"r": (1, 3), "h": (2, 6)}, 2: {"r": (3, 7), "h": (6, 12)}, 3: {"r": (8, 14), "h": (12, 30)}}),
+    "cylinder_surface": ("Cylinder", "surface", "Find the surface area of a cylinder with radius {r} units and height {h} units. (Use π = 3.14)",
+                         "Surface area of cylinder = 2πr(h + r)", lambda p: 2 * 3.14 * p["r"] * (p["h"] + p["r"]),
+                         {1: {"r": (1, 3), "h": (2, 6)}, 2: {"r": (3, 7), "h": (6, 12)}, 3: {"r": (8, 14), "h": (12, 30)}}),
+    "triangle_area": ("Triangle", "area", "Calculate the area of a triangle with base {b} units and height {h} units.",
+                      "Area of triangle = ½ × base × height", lambda p: p["b"] * p["h"] / 2,
+                      {1: {"b": (2, 10), "h": (2, 10)}, 2: {"b": (10, 30), "h": (10, 30)}, 3: {"b": (30, 90), "h": (30, 90)}}),
+    "rectangle_area": ("Rectangle", "area", "Calculate the area of a rectangle with length {l} units and width {w} units.",
+                       "Area of rectangle = length × width", lambda p: p["l"] * p["w"],
+                       {1: {"l": (2, 10), "w": (2, 10)}, 2: {"l": (10, 30), "w": (10, 30)}, 3: {"l": (30, 90), "w": (30, 90)}}),
+    "rectangle_perimeter": ("Rectangle", "perimeter", "Calculate the perimeter of a rectangle with length {l} units and width {w} units.",
+                            "Perimeter of rectangle = 2(length + width)", lambda p: 2 * (p["l"] + p["w"]),
+                            {1: {"l": (2, 10), "w": (2, 10)}, 2: {"l": (10, 30), "w": (10, 30)}, 3: {"l": (30, 90), "w": (30, 90)}}),
+}
+
+
+def ontology_hints(shapes):
+    """{topic: ontology formula or None} for the topics of the given shapes; None if no shapes"""
+    if not shapes:
+        return None
+    formulas = {}
+    for shape in shapes:
+        formulas[shape.get("type")] = {f.get("type", "").lower(): f.get("expression") for f in shape.get("formulas", [])}
+    hints = {}
+    for topic, (shape, kind, *_rest) in TEMPLATES.items():
+        if shape in formulas:
+            # Prefer the ontology's own wording of the formula as the hint
+            hints[topic] = next((expr for key, expr in formulas[shape].items() if expr and kind in key), None)
+    return hints
+
+
+def _record_dtype():
+    return np.dtype([
+        ("topic", np.uint8),
+        ("difficulty", np.uint8),
+        ("params", np.float32, (MAX_PARAMS,)),
+        ("answer", np.float64),
+    ])
+
+
+def generate(topics=None, per_level=DEFAULT_PER_LEVEL, seed=0):
+    """Records for every (topic, difficulty) block, plus the block slices"""
+    if np is None:
+        raise RuntimeError("NumPy is required to generate the item bank")
+    topics = [topic for topic in (topics or TEMPLATES) if topic in TEMPLATES]
+    rng = np.random.default_rng(seed)
+    chunks = []
+    blocks = {}
+    start = 0
+    for topic_id, topic in enumerate(topics):
+        _shape, _kind, _question, _hint, answer, ranges = TEMPLATES[topic]
+        for difficulty in DIFFICULTIES:
+            block = np.zeros(per_level, dtype=_record_dtype())
+            params = {}
+            for slot, (name, (low, high)) in enumerate(ranges[difficulty].items()):
+                params[name] = rng.integers(low, high + 1, size=per_level).astype(np.float64)
+                block["params"][:, slot] = params[name]
+            block["topic"] = topic_id
+            block["difficulty"] = difficulty
+            block["answer"] = np.round(answer(params), 2)
+            # Narrow parameter ranges draw the same exercise many times: keep the first of each
+            _, first = np.unique(block["params"], axis=0, return_index=True)
+            block = block[np.sort(first)]
+            chunks.append(block)
+            blocks[f"{topic}:{difficulty}"] = [start, len(block)]
+            start += len(block)
+    records = np.concatenate(chunks) if chunks else np.zeros(0, dtype=_record_dtype())
+    return records, {"version": BANK_VERSION, "topics": topics, "per_level": per_level, "seed": seed, "blocks": blocks}
+
+
+def save_bank(path, records, meta):
+    """Write <path>.npy and <path>.json (atomically, workers may race at start-up)"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp + ".npy", "wb") as f:
+        np.save(f, records)
+    with open(tmp + ".json", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp + ".npy", path + ".npy")
+    os.replace(tmp + ".json", path + ".json")
+
+
+class MemmapItemBank:
+    """Item bank backed by a memory-mapped record array; same interface as recommender.ItemBank"""
+
+    def __init__(self, records, meta, hints=None):
+        self.records = records
+        self.meta = meta
+        self.topic_names = meta["topics"]
+        self.hints = hints or {}
+        # (topic, difficulty) -> range of record ids: len() and indexing are O(1)
+        self.index = {}
+        for key, (start, count) in meta["blocks"].items():
+            topic, difficulty = key.rsplit(":", 1)
+            self.index[(topic, int(difficulty))] = range(start, start + count)
+        self.topics = sorted({topic for topic, _ in self.index})
+
+    def __len__(self):
+        return len(self.records)
+
+    def candidates(self, topic, difficulty):
+        """Record ids for a topic at a difficulty, nearest level if that one is empty"""
+        for level in sorted(DIFFICULTIES, key=lambda level: abs(level - difficulty)):
+            ids = self.index.get((topic, level))
+            if ids:
+                return ids
+        return ()
+
+    def item(self, item_id):
+        """Render one record as an exercise"""
+        record = self.records[item_id]
+        topic = self.topic_names[record["topic"]]
+        shape, _kind, question, hint, _answer, ranges = TEMPLATES[topic]
+        difficulty = int(record["difficulty"])
+        params = {name: int(value) for name, value in zip(ranges[difficulty], record["params"])}
+        return {
+            "id": f"{topic}-{difficulty}-{item_id}",
+            "topic": topic,
+            "shape": shape,
+            "difficulty": difficulty,
+            "question": question.format(**params),
+            "answer": float(record["answer"]),
+            "hint": self.hints.get(topic) or hint,
+        }
+
+    @classmethod
+    def open(cls, path, hints=None):
+        with open(path + ".json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        records = np.load(path + ".npy", mmap_mode="r")
+        return cls(records, meta, hints)
+
+
+def load_or_generate(path, shapes=None, per_level=DEFAULT_PER_LEVEL, seed=0):
+    """Open the bank at path, (re)generating it if missing or built for other topics"""
+    hints = ontology_hints(shapes)
+    topics = [topic for topic in TEMPLATES if hints is None or topic in hints] or list(TEMPLATES)
+    try:
+        bank = MemmapItemBank.open(path, hints)
+        meta = bank.meta
+        if (meta.get("version") == BANK_VERSION and meta.get("topics") == topics
+                and meta.get("per_level") == per_level and meta.get("seed") == seed):
+            return bank
+    except (OSError, ValueError, KeyError):
+        pass
+    records, meta = generate(topics, per_level, seed)
+    save_bank(path, records, meta)
+    logger.info("Generated item bank of %d exercises at %s", len(records), path)
+    return MemmapItemBank.open(path, hints)
+
+
+def main(argv=None):
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    default_path = os.path.join(os.environ.get("ITS_DATA_DIR", os.path.join(project_root, "data")), "item_bank")
+
+    parser = argparse.ArgumentParser(description="Generate the practice item bank")
+    commands = parser.add_subparsers(dest="command", required=True)
+    gen = commands.add_parser("generate", help="generate and save a bank")
+    gen.add_argument("--out", default=default_path, help="path without extension (writes .npy and .json)")
+    gen.add_argument("--per-level", type=int, default=DEFAULT_PER_LEVEL, help="exercises per topic and difficulty")
+    gen.add_argument("--seed", type=int, default=0)
+    gen.add_argument("--topics", nargs="*", help="subset of: " + ", ".join(TEMPLATES))
+    show = commands.add_parser("show", help="print a few exercises from a bank")
+    show.add_argument("--bank", default=default_path)
+    show.add_argument("-n", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if np is None:
+        print("NumPy is required: pip install numpy", file=sys.stderr)
+        return 1
+    if args.command == "generate":
+        records, meta = generate(args.topics, args.per_level, args.seed)
+        save_bank(args.out, records, meta)
+        print(f"Wrote {len(records)} exercises ({records.nbytes / 1e6:.1f} MB) to {args.out}.npy")
+        return 0
+    bank = MemmapItemBank.open(args.bank)
+    step = max(len(bank) // max(args.n, 1), 1)
+    for item_id in range(0, len(bank), step)[:args.n]:
+        print(json.dumps(bank.item(item_id), ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""Typo-tolerant word lookup with a SymSpell-style deletion index
+
+Every vocabulary word is stored under all the strings obtained by deleting
+up to max_distance of its characters. A query generates its own deletes
+and looks them up, so finding the words within edit distance d costs a
+handful of dict lookups that depend on the length of the query, not on the
+size of the vocabulary. Candidates are then checked with the real
+(Damerau-Levenshtein) distance.
+
+    index = DeletionIndex(["sphere", "cylinder", "volume"])
+    index.lookup("sphear")     # ("sphere", 2)
+    correct_text("cylinders volume", index)   # ("cylinder volume", [...])
+"""
+import re
+
+# Common words a keyword is one edit away from ("done" -> "cone"); known
+# words are matched exactly and never "corrected" into keywords.
+COMMON_WORDS = (
+    "a an and are as at be but by can do does done for from gone good had has have he her here how i if in "
+    "into is it its me mine more my no none not now of on one or our she so some sure than that the them then "
+    "there they this those to too tone two up us was we were what when where which who why will with would "
+    "you your fine kind mind find bone zone cute tube cone tell well help"
+).split()
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[^a-z0-9]+")
+
+
+def max_distance_for(word):
+    """Allowed edits for a word of this length (short words must match exactly)"""
+    if len(word) <= 3:
+        return 0
+    if len(word) <= 5:
+        return 1
+    return 2
+
+
+def damerau_levenshtein(a, b, limit):
+    """Optimal string alignment distance, or limit + 1 once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]
+                    and previous_previous is not None):
+                value = min(value, previous_previous[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+
+def _deletes(word, distance):
+    """All strings reachable from word by deleting up to distance characters"""
+    results = {word}
+    frontier = {word}
+    for _ in range(distance):
+        next_frontier = set()
+        for item in frontier:
+            for i in range(len(item)):
+                next_frontier.add(item[:i] + item[i + 1:])
+        results |= next_frontier
+        frontier = next_frontier
+    return results
+
+
+class DeletionIndex:
+    """Words indexed by their deletes for edit-distance lookups"""
+
+    def __init__(self, words=(), max_distance=2, known=COMMON_WORDS):
+        self.max_distance = max_distance
+        # delete string -> words it came from
+        self.deletes = {}
+        self.words = {}
+        for word in known:
+            self.words[word] = False
+        for word in words:
+            self.add(word)
+
+    def add(self, word, keyword=True):
+        """Add a vocabulary word; keyword=False marks words that are never suggested"""
+        word = word.lower()
+        if self.words.get(word):
+            return
+        self.words[word] = keyword
+        if keyword:
+            for delete in _deletes(word, self.max_distance):
+                self.deletes.setdefault(delete, []).append(word)
+
+    def __contains__(self, word):
+        return word in self.words
+
+    def lookup(self, term, max_distance=None):
+        """(closest keyword, distance) within max_distance of term, or None"""
+        term = term.lower()
+        if term in self.words:
+            return (term, 0) if self.words[term] else None
+        if max_distance is None:
+            max_distance = max_distance_for(term)
+        max_distance = min(max_distance, self.max_distance)
+        if max_distance == 0:
+            return None
+        best = None
+        seen = set()
+        for delete in _deletes(term, max_distance):
+            for word in self.deletes.get(delete, ()):
+                if word in seen:
+                    continue
+                seen.add(word)
+                distance = damerau_levenshtein(term, word, max_distance)
+                # Closest first, then the longer (more specific) word, then alphabetical
+                if distance <= max_distance and (best is None or (distance, -len(word), word) < (best[1], -len(best[0]), best[0])):
+                    best = (word, distance)
+        return best
+
+
+def correct_text(text, index):
+    """Replace misspelled words of text with their closest keywords; returns (text, corrections)"""
+    corrections = []
+    parts = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token[0].isalpha() and token not in index:
+            match = index.lookup(token)
+            if match:
+                corrections.append((token, match[0]))
+                token = match[0]
+        parts.append(token)
+    return "".join(parts), corrections
@@ -0,0 +1,91 @@
+"""Guest account lifecycle: signed tokens, materialization, conversion and cleanup
+
+A guest login no longer writes users.json. The guest id and start time are
+carried in a signed token (itsdangerous), returned as the session id, so
+any node sharing ITS_SECRET_KEY can check it without storage. A guest is
+stored only when they first save progress (AuthManager.materialize_guest).
+A guest who registers is converted to the user type that the ontology's
+convertsToStudent relationship names, and their progress moves with them.
+A background collector removes guests, their progress and stale sessions
+once they have been idle for ITS_GUEST_IDLE_DAYS.
+
+    tokens = GuestTokens(secret, "its-guest:default")
+    token = tokens.issue("guest_1a2b3c4d")
+    tokens.verify(token)        # {"id": "guest_1a2b3c4d", "created_at": "..."} or None
+"""
+import logging
+import threading
+from datetime import datetime
+
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+from backend import metrics
+
+logger = logging.getLogger("its.guests")
+
+GUESTS_COLLECTED = metrics.REGISTRY.register(metrics.Counter(
+    "its_guests_collected_total", "Idle guests removed by the guest collector"))
+GUESTS_MATERIALIZED = metrics.REGISTRY.register(metrics.Counter(
+    "its_guests_materialized_total", "Guests stored on their first progress save"))
+GUESTS_CONVERTED = metrics.REGISTRY.register(metrics.Counter(
+    "its_guests_converted_total", "Guests converted to registered users"))
+
+# The relationship that says what a guest can become, and what to assume before the ontology is loaded
+CONVERSION_PROPERTY = "convertsToStudent"
+DEFAULT_CONVERSION = {"domain": "GuestUser", "range": "Student"}
+
+
+class GuestTokens:
+    """Signs and checks guest tokens; salt keeps one tenant's tokens out of another's"""
+
+    def __init__(self, secret, salt="its-guest", max_age=None):
+        self.serializer = URLSafeTimedSerializer(secret, salt=salt)
+        self.max_age = max_age
+
+    def issue(self, guest_id, created_at=None):
+        return self.serializer.dumps({"id": guest_id, "created_at": created_at or datetime.now().isoformat()})
+
+    def verify(self, token):
+        """The token's {"id", "created_at"}, or None if forged, expired or not a guest token"""
+        if not token:
+            return None
+        try:
+            payload = self.serializer.loads(token, max_age=self.max_age)
+        except BadSignature:
+            return None
+        return payload if isinstance(payload, dict) and str(payload.get("id", "")).startswith("guest_") else None
+
+
+def conversion_type(loader):
+    """User type a guest converts to ("student"), per the ontology; None if it defines no conversion"""
+    relationship = DEFAULT_CONVERSION
+    if loader is not None and hasattr(loader, "get_object_property") and getattr(loader, "loaded", False):
+        relationship = loader.get_object_property(CONVERSION_PROPERTY)
+    if not relationship or relationship.get("domain") != "GuestUser" or not relationship.get("range"):
+        return None
+    return relationship["range"].lower()
+
+
+class GuestCollector:
+    """Calls collect() every interval seconds on a daemon thread"""
+
+    def __init__(self, collect, interval):
+        self.collect = collect
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="guest-collector", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                removed = self.collect()
+                if removed:
+                    logger.info("Removed %d idle guests", removed)
+            except Exception as e:
+                logger.exception("Guest collection failed: %s", e)
@@ -0,0 +1,137 @@
+"""Logging setup for the Intelligent Tutoring System
+
+Log records are put on an in-memory queue by the request threads and written
+out by a single background listener thread, so a request never waits on
+stdout. Levels come from the environment:
+
+    ITS_LOG_LEVEL=WARNING                             default level for everything
+    ITS_LOG_LEVELS=its.ontology=DEBUG,its.app=INFO    per-logger overrides
+    ITS_LOG_FORMAT=json                               one JSON object per line
+
+Loggers are named its.<module> (its.app, its.auth, its.ontology, ...).
+Messages use %-style arguments, so a suppressed message is never formatted.
+
+High-frequency events can be sampled by passing extra=sample(N); only one
+record in N for that call site is emitted:
+
+    logger.debug("Found %d shapes in ontology", count, extra=sample(100))
+"""
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+_listener = None
+
+
+def sample(every):
+    """extra= mapping asking the SamplingFilter to keep 1 record in `every`"""
+    return {"sample_every": every}
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one record in N for call sites that ask for sampling"""
+
+    def __init__(self):
+        super().__init__()
+        self._counters = {}
+
+    def filter(self, record):
+        every = getattr(record, "sample_every", None)
+        if not every or every <= 1:
+            return True
+        key = (record.name, record.msg)
+        counter = self._counters.get(key)
+        if counter is None:
+            # itertools.count is incremented atomically under the GIL
+            counter = self._counters.setdefault(key, itertools.count())
+        return next(counter) % every == 0
+
+
+class KeyValueFormatter(logging.Formatter):
+    """time level logger: message"""
+
+    def format(self, record):
+        line = f"{self.formatTime(record)} {record.levelname:<7} {record.name}: {record.getMessage()}"
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def _parse_levels(spec):
+    """'its.ontology=DEBUG,its.app=INFO' -> {'its.ontology': 'DEBUG', ...}"""
+    levels = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(level=None, levels=None, fmt=None, stream=None):
+    """Install the queue handler on the 'its' logger (safe to call more than once)"""
+    global _listener
+    root = logging.getLogger("its")
+    if _listener is not None or any(isinstance(h, logging.handlers.QueueHandler) for h in root.handlers):
+        return
+
+    level = (level or os.environ.get("ITS_LOG_LEVEL", "INFO")).upper()
+    if levels is None:
+        levels = _parse_levels(os.environ.get("ITS_LOG_LEVELS"))
+    fmt = fmt or os.environ.get("ITS_LOG_FORMAT", "text")
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else KeyValueFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter())
+
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+    root.propagate = False
+    for name, name_level in levels.items():
+        logging.getLogger(name).setLevel(name_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def _restart_after_fork():
+    """The listener thread does not survive fork (gunicorn preload); start a new one"""
+    if _listener is not None:
+        _listener._thread = None
+        _listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def stop_logging():
+    """Drain the queue and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,256 @@
+"""Sparse user-by-topic mastery matrix
+
+Each (user, topic) cell holds how many answers on that topic were correct
+out of how many attempts; only cells a student has touched exist. Cells are
+stored column-wise (one set of parallel arrays per topic: row ids, correct,
+attempts) with a per-user {column: position} map for row access, so:
+
+- batch updates are one np.add.at per touched topic,
+- "students weak in topic X" is a vectorized filter over one column,
+- "top-k weakest topics for a user" only looks at that user's few cells.
+
+Mastery is a smoothed accuracy, (correct + 1) / (attempts + 2): an untried
+topic sits at 0.5, one wrong answer drops it to 0.33, three right answers
+lift it to 0.8. NumPy is used when installed, the array module otherwise.
+
+The matrix is a projection of the event log (backend/events.py): it is fed
+batches of events as they are folded in and saved in the event snapshot.
+"""
+import heapq
+import threading
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python fallback over array.array
+    np = None
+
+PRIOR_CORRECT = 1.0
+PRIOR_ATTEMPTS = 2.0
+WEAK_BELOW = 0.6
+STRONG_FROM = 0.8
+
+
+def mastery_score(correct, attempts):
+    """Smoothed accuracy of one cell"""
+    return (correct + PRIOR_CORRECT) / (attempts + PRIOR_ATTEMPTS)
+
+
+class _TopicColumn:
+    """Growable parallel arrays of the cells in one topic"""
+
+    def __init__(self, capacity=16):
+        self.size = 0
+        if np is not None:
+            self.rows = np.empty(capacity, dtype=np.int64)
+            self.correct = np.zeros(capacity, dtype=np.float64)
+            self.attempts = np.zeros(capacity, dtype=np.float64)
+        else:
+            self.rows, self.correct, self.attempts = array("q"), array("d"), array("d")
+
+    def add_cell(self, row):
+        """Append an empty cell for a user row; returns its position"""
+        position = self.size
+        if np is not None:
+            if position == len(self.rows):
+                capacity = 2 * len(self.rows)
+                self.rows = np.resize(self.rows, capacity)
+                self.correct = np.concatenate([self.correct, np.zeros(capacity - position)])
+                self.attempts = np.concatenate([self.attempts, np.zeros(capacity - position)])
+            self.rows[position] = row
+        else:
+            self.rows.append(row)
+            self.correct.append(0.0)
+            self.attempts.append(0.0)
+        self.size += 1
+        return position
+
+    def add(self, positions, correct, attempts):
+        """Accumulate outcomes into cells; positions may repeat"""
+        if np is not None:
+            positions = np.asarray(positions, dtype=np.int64)
+            np.add.at(self.correct, positions, np.asarray(correct, dtype=np.float64))
+            np.add.at(self.attempts, positions, np.asarray(attempts, dtype=np.float64))
+        else:
+            for position, c, a in zip(positions, correct, attempts):
+                self.correct[position] += c
+                self.attempts[position] += a
+
+    def scores(self):
+        if np is not None:
+            return (self.correct[:self.size] + PRIOR_CORRECT) / (self.attempts[:self.size] + PRIOR_ATTEMPTS)
+        return [mastery_score(c, a) for c, a in zip(self.correct, self.attempts)]
+
+
+class MasteryMatrix:
+    """Users x topics sparse matrix of (correct, attempts) cells"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.topic_names = []
+        self.topic_index = {}
+        self.user_ids = []
+        self.user_index = {}
+        self.columns = []
+        # Per user row: {column: position in that topic's arrays}
+        self.cells = []
+        # Per user row: bumped on every update, so caches know when to refresh
+        self.versions = []
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def _cell(self, user_id, topic):
+        row = self.user_index.get(user_id)
+        if row is None:
+            row = self.user_index[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+            self.cells.append({})
+            self.versions.append(0)
+        column = self.topic_index.get(topic)
+        if column is None:
+            column = self.topic_index[topic] = len(self.topic_names)
+            self.topic_names.append(topic)
+            self.columns.append(_TopicColumn())
+        position = self.cells[row].get(column)
+        if position is None:
+            position = self.cells[row][column] = self.columns[column].add_cell(row)
+        return column, position
+
+    # ---------- updates ----------
+
+    def update_batch(self, outcomes):
+        """Apply (user_id, topic, correct, attempts) tuples, grouped per topic"""
+        grouped = {}
+        with self._lock:
+            for user_id, topic, correct, attempts in outcomes:
+                column, position = self._cell(user_id, topic)
+                self.versions[self.user_index[user_id]] += 1
+                positions, corrects, tries = grouped.setdefault(column, ([], [], []))
+                positions.append(position)
+                corrects.append(correct)
+                tries.append(attempts)
+            for column, (positions, corrects, tries) in grouped.items():
+                self.columns[column].add(positions, corrects, tries)
+        return len(grouped)
+
+    def fold_events(self, events):
+        """Event-log projection hook: turn topic-tagged answers into outcomes"""
+        self.update_batch(outcomes_from_events(events))
+
+    # ---------- queries ----------
+
+    def row_version(self, user_id):
+        """Update counter of a user's row (0 if the user has no cells)"""
+        row = self.user_index.get(user_id)
+        return self.versions[row] if row is not None else 0
+
+    def user_topics(self, user_id):
+        """{topic: {"mastery", "correct", "attempts"}} for every topic a user has tried"""
+        with self._lock:
+            row = self.user_index.get(user_id)
+            if row is None:
+                return {}
+            result = {}
+            for column, position in self.cells[row].items():
+                col = self.columns[column]
+                correct, attempts = float(col.correct[position]), float(col.attempts[position])
+                result[self.topic_names[column]] = {
+                    "mastery": round(mastery_score(correct, attempts), 4), "correct": correct, "attempts": attempts,
+                }
+            return result
+
+    def weakest_topics(self, user_id, k=3):
+        """The k attempted topics with the lowest mastery, weakest first"""
+        topics = self.user_topics(user_id)
+        return [
+            {"topic": name, **cell}
+            for name, cell in heapq.nsmallest(k, topics.items(), key=lambda item: (item[1]["mastery"], item[0]))
+        ]
+
+    def classify(self, user_id):
+        """(strong, weak) topic lists for one user"""
+        strong, weak = [], []
+        for name, cell in sorted(self.user_topics(user_id).items()):
+            if cell["attempts"] and cell["mastery"] < WEAK_BELOW:
+                weak.append(name)
+            elif cell["mastery"] >= STRONG_FROM:
+                strong.append(name)
+        return strong, weak
+
+    def weak_students(self, topic, threshold=WEAK_BELOW, limit=50):
+        """Students below a mastery threshold in a topic, weakest first"""
+        with self._lock:
+            column = self.topic_index.get(topic)
+            if column is None:
+                return []
+            col = self.columns[column]
+            scores = col.scores()
+            if np is not None:
+                index = np.flatnonzero((scores < threshold) & (col.attempts[:col.size] > 0))
+                index = index[np.argsort(scores[index], kind="stable")][:limit]
+            else:
+                index = sorted(
+                    (i for i, score in enumerate(scores) if score < threshold and col.attempts[i] > 0),
+                    key=scores.__getitem__,
+                )[:limit]
+            return [
+                {"user_id": self.user_ids[int(col.rows[i])], "mastery": round(float(scores[i]), 4),
+                 "attempts": float(col.attempts[i])}
+                for i in index
+            ]
+
+    # ---------- persistence (event snapshot) ----------
+
+    def to_state(self):
+        with self._lock:
+            return {
+                "topics": list(self.topic_names),
+                "users": list(self.user_ids),
+                "columns": [
+                    {
+                        "rows": [int(r) for r in col.rows[:col.size]],
+                        "correct": [float(c) for c in col.correct[:col.size]],
+                        "attempts": [float(a) for a in col.attempts[:col.size]],
+                    }
+                    for col in self.columns
+                ],
+            }
+
+    def load_state(self, state):
+        with self._lock:
+            self._reset()
+            for user_id in state.get("users", []):
+                self.user_index[user_id] = len(self.user_ids)
+                self.user_ids.append(user_id)
+                self.cells.append({})
+                self.versions.append(0)
+            for topic, saved in zip(state.get("topics", []), state.get("columns", [])):
+                outcomes = [
+                    (self.user_ids[row], topic, correct, attempts)
+                    for row, correct, attempts in zip(saved["rows"], saved["correct"], saved["attempts"])
+                ]
+                self.update_batch(outcomes)
+
+
+def outcomes_from_events(events):
+    """(user_id, topic, correct, attempts) for each topic-tagged answer in a batch of events"""
+    outcomes = []
+    for event in events:
+        user_id = event.get("user_id")
+        if event.get("type") == "quiz":
+            by_topic = event.get("by_topic")
+            if by_topic:
+                outcomes.extend((user_id, topic, c, a) for topic, (c, a) in by_topic.items())
+            elif event.get("topic") and event.get("total"):
+                outcomes.append((user_id, event["topic"], event.get("score", 0), event["total"]))
+        elif event.get("type") == "practice":
+            by_topic = event.get("by_topic")
+            if by_topic:
+                outcomes.extend((user_id, topic, c, a) for topic, (c, a) in by_topic.items())
+            elif event.get("topic") and event.get("completed"):
+                outcomes.append((user_id, event["topic"], event.get("correct", 0), event["completed"]))
+    return outcomes
@@ -0,0 +1,299 @@
+"""In-process metrics with a Prometheus text-format exporter
+
+Every thread records into its own shard (a plain dict only that thread
+writes), so the request path takes no locks. /metrics sums the shards when
+it is scraped. Shards of threads that have exited are folded into one
+retired shard whenever a new thread starts recording or /metrics is
+scraped, so thread-per-request servers do not pile them up.
+
+    REQUEST_LATENCY.observe(0.012, "/api/shapes", "GET")
+    with timed("auth.save_users"):
+        ...
+"""
+import bisect
+import copy
+import functools
+import threading
+import time
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    """Escape a label value for the text exposition format"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Metric:
+    """Base class: per-thread shards of {label_values: value}"""
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._local = threading.local()
+        # [(thread, shard)] of live threads, plus what exited threads recorded
+        self._shards = []
+        self._retired = {}
+        self._shards_lock = threading.Lock()  # only taken once per thread (and per scrape)
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._retire_dead()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _retire_dead(self):
+        """Fold the shards of exited threads into the retired shard (caller holds the lock)"""
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                self._merge(self._retired, shard)
+        self._shards = live
+
+    def _merge(self, into, shard):
+        raise NotImplementedError
+
+    def _snapshots(self):
+        # dict.copy() is atomic under the GIL, so a concurrent write cannot break it
+        with self._shards_lock:
+            self._retire_dead()
+            shards = [shard for _, shard in self._shards]
+            retired = copy.deepcopy(self._retired)
+        return [retired] + [shard.copy() for shard in shards]
+
+    def _label_text(self, values, extra=()):
+        pairs = list(zip(self.labels, values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._render_samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount=1):
+        shard = self._shard()
+        shard[label_values] = shard.get(label_values, 0) + amount
+
+    def _merge(self, into, shard):
+        for key, value in shard.items():
+            into[key] = into.get(key, 0) + value
+
+    def values(self):
+        totals = {}
+        for shard in self._snapshots():
+            self._merge(totals, shard)
+        return totals
+
+    def _render_samples(self):
+        return [f"{self.name}{self._label_text(key)} {value}" for key, value in sorted(self.values().items())]
+
+
+class Gauge(Counter):
+    """Up/down value; in-flight gauges inc and dec on the same thread"""
+    kind = "gauge"
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        shard = self._shard()
+        entry = shard.get(label_values)
+        if entry is None:
+            # [per-bucket counts (+Inf last), sum, count]
+            entry = shard[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def _merge(self, into, shard):
+        for key, (counts, total, count) in shard.items():
+            merged = into.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            for i, bucket_count in enumerate(counts):
+                merged[0][i] += bucket_count
+            merged[1] += total
+            merged[2] += count
+
+    def values(self):
+        totals = {}
+        for shard in self._snapshots():
+            self._merge(totals, shard)
+        return totals
+
+    def _render_samples(self):
+        lines = []
+        for key, (counts, total, count) in sorted(self.values().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{self._label_text(key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {total}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "its_http_request_duration_seconds", "HTTP request latency by route", ("route", "method")))
+REQUEST_COUNT = REGISTRY.register(Counter(
+    "its_http_requests_total", "HTTP requests by route and status", ("route", "method", "status")))
+REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    "its_http_requests_in_flight", "HTTP requests currently being served", ("route",)))
+OPERATION_LATENCY = REGISTRY.register(Histogram(
+    "its_operation_duration_seconds", "Internal operation latency (ontology load, storage I/O)", ("operation",)))
+OPERATION_ERRORS = REGISTRY.register(Counter(
+    "its_operation_errors_total", "Internal operations that raised", ("operation",)))
+
+
+class timed:
+    """Context manager recording an internal operation's duration"""
+
+    def __init__(self, operation):
+        self.operation = operation
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        OPERATION_LATENCY.observe(time.perf_counter() - self.start, self.operation)
+        if exc_type is not None:
+            OPERATION_ERRORS.inc(self.operation)
+        return False
+
+
+def instrument(obj, method_names, prefix):
+    """Wrap bound methods of obj so each call is timed as '<prefix>.<method>'"""
+    for method_name in method_names:
+        method = getattr(obj, method_name, None)
+        if method is None:
+            continue
+
+        def make_wrapper(method, operation):
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                with timed(operation):
+                    return method(*args, **kwargs)
+            return wrapper
+
+        setattr(obj, method_name, make_wrapper(method, f"{prefix}.{method_name}"))
+    return obj
+
+
+def install_flask_metrics(app):
+    """Add request-timing hooks and a /metrics route to a Flask app"""
+    from flask import Response, g, request
+
+    def route_label():
+        return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_route = route_label()
+        REQUESTS_IN_FLIGHT.inc(g.metrics_route)
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            route = g.metrics_route
+            REQUEST_LATENCY.observe(time.perf_counter() - start, route, request.method)
+            REQUEST_COUNT.inc(route, request.method, str(response.status_code))
+            REQUESTS_IN_FLIGHT.dec(route)
+        return response
+
+    @app.teardown_request
+    def record_failed_request(exc):
+        # after_request is skipped when a view raises; count it as a 500
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            route = g.metrics_route
+            REQUEST_LATENCY.observe(time.perf_counter() - start, route, request.method)
+            REQUEST_COUNT.inc(route, request.method, "500")
+            REQUESTS_IN_FLIGHT.dec(route)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        """Prometheus text exposition format"""
+        return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+    return app
+
+
+class ASGIMetrics:
+    """ASGI middleware recording the same request metrics as install_flask_metrics
+
+    Requests are labelled with the path of the route that matches them
+    ("/api/progress/{user_id}"), found in routes the way the router does."""
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = routes
+
+    def route_label(self, scope):
+        from starlette.routing import Match
+        for route in self.routes:
+            if route.matches(scope)[0] == Match.FULL:
+                return getattr(route, "path", "") or "static"
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route, method = self.route_label(scope), scope["method"]
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        start = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc(route)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_LATENCY.observe(time.perf_counter() - start, route, method)
+            REQUEST_COUNT.inc(route, method, status)
+            REQUESTS_IN_FLIGHT.dec(route)
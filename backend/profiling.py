@@ -0,0 +1,229 @@
+"""Opt-in request profiling for a live server
+
+Enabled with ITS_PROFILING=1 (nothing is installed otherwise) and usable only
+with ITS_PROFILE_TOKEN set: every request below must carry it. A request is
+profiled when it carries an X-Profile header, or when profiling has been
+armed for the next N requests through the admin endpoint:
+
+    curl -H "X-Profile: cprofile" -H "X-Profile-Token: $TOKEN" localhost:5000/api/shapes
+    curl -X POST -H "X-Profile-Token: $TOKEN" -d '{"mode": "sampling", "requests": 20}' \\
+         -H "Content-Type: application/json" localhost:5000/admin/profiling
+
+Modes:
+    cprofile  deterministic cProfile, dumped as .pstats (snakeviz, pstats)
+    sampling  stack sampler, dumped as collapsed stacks (.folded) for flamegraph.pl / speedscope
+
+Each dump also gets a .sections.json with wall time spent in the wrapped
+ontology and storage calls. Dumps are written to ITS_PROFILE_DIR (default
+<project>/profiles) and listed at GET /admin/profiles.
+"""
+import cProfile
+import functools
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+MODES = ("cprofile", "sampling")
+
+_active = threading.local()
+
+
+class _State:
+    """Admin-armed profiling: profile the next `remaining` requests"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.mode = "cprofile"
+        self.remaining = 0
+
+    def take(self):
+        if not self.remaining:  # unlocked fast path for the common case
+            return None
+        with self.lock:
+            if self.remaining <= 0:
+                return None
+            self.remaining -= 1
+            return self.mode
+
+
+state = _State()
+
+
+class StackSampler:
+    """Sample one thread's stack every `interval` seconds into collapsed-stack counts"""
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if frames:
+                self.stacks[";".join(reversed(frames))] += 1
+
+    def folded(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+class RequestProfile:
+    """Profiler for one request, plus wall time per wrapped section"""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.sections = {}
+        self.profiler = None
+        self.sampler = None
+
+    def start(self):
+        if self.mode == "sampling":
+            self.sampler = StackSampler(threading.get_ident())
+            self.sampler.start()
+        else:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    def stop(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    def add_section(self, name, elapsed):
+        calls, total = self.sections.get(name, (0, 0.0))
+        self.sections[name] = (calls + 1, total + elapsed)
+
+    def dump(self, directory, label):
+        os.makedirs(directory, exist_ok=True)
+        safe_label = "".join(c if c.isalnum() else "_" for c in label).strip("_") or "root"
+        base = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}_{safe_label}"
+        if self.profiler is not None:
+            filename = base + ".pstats"
+            self.profiler.dump_stats(os.path.join(directory, filename))
+        else:
+            filename = base + ".folded"
+            with open(os.path.join(directory, filename), "w") as f:
+                f.write(self.sampler.folded())
+        with open(os.path.join(directory, base + ".sections.json"), "w") as f:
+            json.dump({name: {"calls": calls, "seconds": total} for name, (calls, total) in self.sections.items()}, f, indent=2)
+        return filename
+
+
+def section(name, func):
+    """Wrap func so its wall time is recorded when the current request is profiled"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = getattr(_active, "profile", None)
+        if profile is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.add_section(name, time.perf_counter() - start)
+    return wrapper
+
+
+def wrap_sections(obj, method_names, prefix):
+    """Wrap bound methods of obj with section() as '<prefix>.<method>'"""
+    for method_name in method_names:
+        method = getattr(obj, method_name, None)
+        if method is not None:
+            setattr(obj, method_name, section(f"{prefix}.{method_name}", method))
+    return obj
+
+
+def install_flask_profiling(app, profile_dir, token=None):
+    """Add the profiling hooks and /admin/profiling endpoints to a Flask app"""
+    from flask import abort, g, jsonify, request, send_from_directory
+
+    def authorized():
+        # No token configured: nobody may profile (the dumps expose code paths and timings)
+        supplied = request.headers.get("X-Profile-Token")
+        return bool(token) and supplied is not None and hmac.compare_digest(supplied, token)
+
+    @app.before_request
+    def start_profile():
+        mode = request.headers.get("X-Profile")
+        if mode is not None:
+            if not authorized() or mode not in MODES:
+                return None
+        else:
+            mode = state.take()
+            if mode is None:
+                return None
+        profile = RequestProfile(mode)
+        g.request_profile = profile
+        _active.profile = profile
+        profile.start()
+        return None
+
+    @app.after_request
+    def stop_profile(response):
+        profile = g.pop("request_profile", None)
+        if profile is not None:
+            profile.stop()
+            _active.profile = None
+            label = request.url_rule.rule if request.url_rule is not None else request.path
+            response.headers["X-Profile-File"] = profile.dump(profile_dir, f"{request.method}_{label}")
+        return response
+
+    @app.teardown_request
+    def clear_profile(exc):
+        _active.profile = None
+
+    @app.route('/admin/profiling', methods=['GET', 'POST'])
+    def admin_profiling():
+        """Arm profiling for the next N requests (POST) or show the current state"""
+        if not authorized():
+            abort(403)
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            mode = data.get("mode", "cprofile")
+            if mode not in MODES:
+                return jsonify({"error": f"mode must be one of {', '.join(MODES)}"}), 400
+            try:
+                remaining = max(0, int(data.get("requests", 1)))
+            except (TypeError, ValueError):
+                return jsonify({"error": "requests must be an integer"}), 400
+            with state.lock:
+                state.mode = mode
+                state.remaining = remaining
+        return jsonify({"mode": state.mode, "remaining": state.remaining})
+
+    @app.route('/admin/profiles', methods=['GET'])
+    def admin_profiles():
+        """List profile dumps, newest first"""
+        if not authorized():
+            abort(403)
+        files = sorted(os.listdir(profile_dir), reverse=True) if os.path.isdir(profile_dir) else []
+        return jsonify({"profiles": files})
+
+    @app.route('/admin/profiles/<path:filename>', methods=['GET'])
+    def admin_profile_file(filename):
+        """Download one profile dump"""
+        if not authorized():
+            abort(403)
+        return send_from_directory(profile_dir, filename, as_attachment=True)
+
+    return app
@@ -1,14 +1,49 @@
+import contextlib
 import json
+import os
+import threading
 from datetime import datetime
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
 class ProgressManager:
-    def __init__(self):
-        self.progress_file = Path("../data/progress.json")
+    def __init__(self, progress_file=None):
+        self.progress_file = Path(progress_file) if progress_file else Path("../data/progress.json")
         self.progress_file.parent.mkdir(exist_ok=True)
+        # Serializes read-modify-write cycles between request threads...
+        self._lock = threading.RLock()
+        # ...and, through an flock on a sidecar file, between server worker processes
+        self.lock_file = self.progress_file.with_name(self.progress_file.name + ".lock")
+        self._lock_fd = None
+        self._lock_depth = 0
         
-        if not self.progress_file.exists():
-            self._initialize_progress_file()
+        with self._locked():
+            if not self.progress_file.exists():
+                self._initialize_progress_file()
+    
+    @contextlib.contextmanager
+    def _locked(self):
+        """Hold the store for a read-modify-write cycle (re-entrant within a thread)"""
+        with self._lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                self._lock_fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self._lock_fd is not None:
+                    os.close(self._lock_fd)  # releases the flock
+                    self._lock_fd = None
+    
+    def locked(self):
+        """Hold the store across several calls, e.g. the guest collector's read and removal"""
+        return self._locked()
     
     def _initialize_progress_file(self):
         """Initialize the progress JSON file"""
@@ -37,21 +72,25 @@ class ProgressManager:
             }
         }
         
-        with open(self.progress_file, 'w') as f:
-            json.dump(sample_progress, f, indent=2)
+        self.save_progress_data(sample_progress)
     
     def load_progress(self):
-        """Load progress data from JSON file"""
+        """Load progress data from JSON file
+        
+        A missing file is an empty store; an unreadable one raises instead of being
+        treated as empty, so the next save cannot overwrite every student with {}."""
         try:
             with open(self.progress_file, 'r') as f:
                 return json.load(f)
-        except:
+        except FileNotFoundError:
             return {}
     
     def save_progress_data(self, progress_data):
-        """Save progress data to JSON file"""
-        with open(self.progress_file, 'w') as f:
+        """Save progress data to JSON file (atomically: readers see the old or the new file, never half of one)"""
+        tmp_file = self.progress_file.with_name(f"{self.progress_file.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_file, 'w') as f:
             json.dump(progress_data, f, indent=2)
+        os.replace(tmp_file, self.progress_file)
     
     def get_progress(self, user_id):
         """Get progress for a specific user"""
@@ -82,10 +121,29 @@ class ProgressManager:
             }
         }
     
-    def save_progress(self, user_id, progress_update):
-        """Save progress update for a user"""
-        progress_data = self.load_progress()
+    def save_progress(self, user_id, progress_update, current=None):
+        """Save progress update for a user; returns the updated record
         
+        current ({user_id: record}) replaces the stored records first: the shared copy, when several nodes write."""
+        with self._locked():
+            progress_data = self.load_progress()
+            progress_data.update(current or {})
+            self._apply_update(progress_data, user_id, progress_update)
+            self.save_progress_data(progress_data)
+        return progress_data[user_id]
+    
+    def apply_updates(self, updates, current=None):
+        """Apply many (user_id, progress_update) pairs with a single file write"""
+        with self._locked():
+            progress_data = self.load_progress()
+            progress_data.update(current or {})
+            for user_id, progress_update in updates:
+                self._apply_update(progress_data, user_id, progress_update)
+            self.save_progress_data(progress_data)
+        return len(updates)
+    
+    def _apply_update(self, progress_data, user_id, progress_update):
+        """Apply one quiz/practice update to the in-memory progress data"""
         if user_id not in progress_data:
             progress_data[user_id] = self._create_default_progress(user_id)
         
@@ -106,7 +164,9 @@ class ProgressManager:
             current_practice = progress_data[user_id]["practice"]
             
             if "completed" in practice_data:
-                current_practice["completed_exercises"] += len(practice_data["completed"])
+                # A list of completed exercises, or just how many (bulk imports)
+                completed = practice_data["completed"]
+                current_practice["completed_exercises"] += completed if isinstance(completed, int) else len(completed)
             
             if "correct" in practice_data:
                 current_practice["correct_answers"] += practice_data["correct"]
@@ -117,21 +177,67 @@ class ProgressManager:
             current_practice["last_practice"] = datetime.now().isoformat()
         
         # Update overall progress
-        quiz_avg = progress_data[user_id]["quiz"]["average_score"]
-        practice_acc = progress_data[user_id]["practice"]["accuracy"]
+        self._update_overall(progress_data[user_id])
         
-        if quiz_avg > 0 and practice_acc > 0:
-            progress_data[user_id]["overall_progress"] = (quiz_avg + practice_acc) / 2
-        elif quiz_avg > 0:
-            progress_data[user_id]["overall_progress"] = quiz_avg
-        elif practice_acc > 0:
-            progress_data[user_id]["overall_progress"] = practice_acc
+        # Strong/weak topics, derived from the mastery matrix (backend/mastery.py)
+        patterns = progress_data[user_id]["learning_patterns"]
+        if "areas" in progress_update:
+            patterns["strong_areas"] = list(progress_update["areas"].get("strong", []))
+            patterns["weak_areas"] = list(progress_update["areas"].get("weak", []))
         
         # Update last activity
-        progress_data[user_id]["learning_patterns"]["last_activity"] = datetime.now().isoformat()
+        patterns["last_activity"] = datetime.now().isoformat()
+    
+    def _update_overall(self, record):
+        """Overall progress from the quiz average and practice accuracy"""
+        quiz_avg = record["quiz"]["average_score"]
+        practice_acc = record["practice"]["accuracy"]
         
-        self.save_progress_data(progress_data)
-        return True
+        if quiz_avg > 0 and practice_acc > 0:
+            record["overall_progress"] = (quiz_avg + practice_acc) / 2
+        elif quiz_avg > 0:
+            record["overall_progress"] = quiz_avg
+        elif practice_acc > 0:
+            record["overall_progress"] = practice_acc
+    
+    def transfer(self, from_id, to_id, current=None):
+        """Merge from_id's progress into to_id's (a guest becoming a student); returns to_id's record or None"""
+        with self._locked():
+            progress_data = self.load_progress()
+            progress_data.update(current or {})
+            source = progress_data.pop(from_id, None)
+            if source is None:
+                return None
+            target = progress_data.get(to_id)
+            if target is None:
+                target = progress_data[to_id] = dict(source, user_id=to_id)
+            else:
+                quiz, other = target["quiz"], source["quiz"]
+                quiz["total_score"] += other["total_score"]
+                quiz["total_quizzes"] += other["total_quizzes"]
+                if quiz["total_quizzes"]:
+                    quiz["average_score"] = quiz["total_score"] / quiz["total_quizzes"]
+                quiz["last_quiz"] = max(filter(None, [quiz["last_quiz"], other["last_quiz"]]), default=None)
+                practice, other = target["practice"], source["practice"]
+                practice["completed_exercises"] += other["completed_exercises"]
+                practice["correct_answers"] += other["correct_answers"]
+                if practice["completed_exercises"]:
+                    practice["accuracy"] = (practice["correct_answers"] / practice["completed_exercises"]) * 100
+                practice["last_practice"] = max(filter(None, [practice["last_practice"], other["last_practice"]]), default=None)
+                patterns, other = target["learning_patterns"], source["learning_patterns"]
+                patterns["last_activity"] = max(filter(None, [patterns["last_activity"], other["last_activity"]]), default=None)
+                self._update_overall(target)
+            self.save_progress_data(progress_data)
+        return target
+    
+    def remove_users(self, user_ids):
+        """Delete the progress of user_ids (expired guests); returns how many were removed"""
+        with self._locked():
+            progress_data = self.load_progress()
+            removed = [user_id for user_id in user_ids if progress_data.pop(user_id, None) is not None]
+            if removed:
+                self.save_progress_data(progress_data)
+        return len(removed)
     
     def save_quiz_result(self, user_id, quiz_result):
         """Save quiz result for a user"""
@@ -154,25 +260,5 @@ class ProgressManager:
         return self.save_progress(user_id, progress_update)
     
     def update_learning_pattern(self, user_id, topic):
-        """Update learning patterns based on user interactions"""
-        progress_data = self.load_progress()
-        
-        if user_id not in progress_data:
-            progress_data[user_id] = self._create_default_progress(user_id)
-        
-        # Simple pattern tracking - in a real system this would be more sophisticated
-        patterns = progress_data[user_id]["learning_patterns"]
-        
-        # Extract shape from topic
-        shapes = ["cube", "sphere", "cone", "cylinder", "triangle", "rectangle"]
-        for shape in shapes:
-            if shape in topic.lower():
-                if shape not in patterns["strong_areas"] and shape not in patterns["weak_areas"]:
-                    # Add to weak areas initially (needs more practice)
-                    patterns["weak_areas"].append(shape)
-                break
-        
-        patterns["last_activity"] = datetime.now().isoformat()
-        
-        self.save_progress_data(progress_data)
-        return True
\ No newline at end of file
+        """Record a topic interaction (strong/weak areas come from the mastery matrix)"""
+        return self.save_progress(user_id, {"topic": topic})
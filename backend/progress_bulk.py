@@ -0,0 +1,329 @@
+"""Bulk progress import and streaming export
+
+Import reads NDJSON or CSV records one at a time, validates them and applies
+them in batches through ProgressManager.apply_updates, so a batch of N
+records costs one storage write instead of N.
+
+    NDJSON: {"user_id": "student_001", "quiz": {"score": 2, "total": 3}, "practice": {"completed": 5, "correct": 4}}
+    CSV:    user_id,quiz_score,quiz_total,practice_completed,practice_correct
+
+Export walks progress.json incrementally and yields one NDJSON line or CSV
+row per user, without loading the whole file. It reads without the store's
+lock: ProgressManager replaces the file atomically (temp file + os.replace),
+so an open export keeps reading the complete version it started on.
+
+Command line:
+    python -m backend.progress_bulk import results.csv [--batch-size 1000]
+    python -m backend.progress_bulk export --format csv -o progress.csv
+"""
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import sys
+
+DEFAULT_BATCH_SIZE = 1000
+CSV_FIELDS = ["user_id", "quiz_score", "quiz_total", "practice_completed", "practice_correct"]
+EXPORT_CSV_FIELDS = [
+    "user_id", "name", "total_score", "total_quizzes", "average_score", "completed_exercises",
+    "correct_answers", "accuracy", "overall_progress", "strong_areas", "weak_areas", "last_activity",
+]
+MAX_REPORTED_ERRORS = 100
+
+
+# ==================== READING ====================
+
+def iter_ndjson(stream):
+    """Yield (line_number, record) for each non-empty NDJSON line"""
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            record = {"_error": f"invalid JSON: {e}"}
+        if not isinstance(record, dict):
+            record = {"_error": "record must be a JSON object"}
+        yield line_number, record
+
+
+def _number(value):
+    value = (value or "").strip()
+    if value == "":
+        return None
+    return float(value) if "." in value else int(value)
+
+
+def iter_csv(stream):
+    """Yield (line_number, record) for each CSV row, converted to the update format"""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        line_number = reader.line_num
+        try:
+            record = {"user_id": (row.get("user_id") or "").strip()}
+            quiz_score, quiz_total = _number(row.get("quiz_score")), _number(row.get("quiz_total"))
+            if quiz_score is not None or quiz_total is not None:
+                record["quiz"] = {"score": quiz_score, "total": quiz_total}
+            completed, correct = _number(row.get("practice_completed")), _number(row.get("practice_correct"))
+            if completed is not None or correct is not None:
+                record["practice"] = {"completed": completed or 0, "correct": correct or 0}
+        except ValueError as e:
+            record = {"_error": f"invalid number: {e}"}
+        yield line_number, record
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _is_count(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def validate_update(update):
+    """Return an error message for a bad quiz/practice/topic update, or None (True/False are not numbers)"""
+    if not isinstance(update, dict):
+        return "update must be an object"
+    topic = update.get("topic")
+    if topic is not None and not isinstance(topic, str):
+        return "topic must be a string"
+    quiz = update.get("quiz")
+    if quiz is not None:
+        if not isinstance(quiz, dict):
+            return "quiz must be an object"
+        score, total = quiz.get("score"), quiz.get("total")
+        if not _is_number(score) or not _is_number(total):
+            return "quiz needs numeric score and total"
+        if total <= 0 or score < 0 or score > total:
+            return "quiz score must be between 0 and total"
+        if not isinstance(quiz.get("questions", []), list) or not isinstance(quiz.get("topic", ""), str):
+            return "quiz questions must be a list and topic a string"
+    practice = update.get("practice")
+    if practice is not None:
+        if not isinstance(practice, dict):
+            return "practice must be an object"
+        completed = practice.get("completed", 0)
+        count = completed if _is_count(completed) else len(completed) if isinstance(completed, list) else None
+        correct = practice.get("correct", 0)
+        if count is None or count < 0:
+            return "practice completed must be a count or a list"
+        if not _is_count(correct) or correct < 0 or correct > count:
+            return "practice correct must be between 0 and completed"
+        if not isinstance(practice.get("exercises", []), list) or not isinstance(practice.get("topic", ""), str):
+            return "practice exercises must be a list and topic a string"
+    return None
+
+
+def validate(record):
+    """Return an error message for a bad record, or None"""
+    if not isinstance(record, dict):
+        return "record must be a JSON object"
+    if "_error" in record:
+        return record["_error"]
+    if not isinstance(record.get("user_id"), str) or not record["user_id"].strip():
+        return "user_id is required"
+    if record["user_id"].strip().startswith("guest_"):
+        return "guest progress cannot be imported"
+    if "quiz" not in record and "practice" not in record:
+        return "expected a quiz or practice update"
+    return validate_update({key: record[key] for key in ("quiz", "practice") if key in record})
+
+
+# ==================== IMPORT ====================
+
+def import_records(manager, records, batch_size=DEFAULT_BATCH_SIZE):
+    """Validate and apply (line_number, record) pairs in batches; returns a summary"""
+    summary = {"applied": 0, "rejected": 0, "batches": 0, "errors": []}
+    batch = []
+
+    def commit():
+        if batch:
+            manager.apply_updates(batch)
+            summary["applied"] += len(batch)
+            summary["batches"] += 1
+            batch.clear()
+
+    for line_number, record in records:
+        error = validate(record)
+        if error:
+            summary["rejected"] += 1
+            if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                summary["errors"].append({"line": line_number, "error": error})
+            continue
+        update = {key: record[key] for key in ("quiz", "practice") if key in record}
+        batch.append((record["user_id"].strip(), update))
+        if len(batch) >= batch_size:
+            commit()
+    commit()
+    return summary
+
+
+def import_stream(manager, stream, fmt="ndjson", batch_size=DEFAULT_BATCH_SIZE):
+    """Import a text stream of NDJSON or CSV records"""
+    records = iter_csv(stream) if fmt == "csv" else iter_ndjson(stream)
+    return import_records(manager, records, batch_size)
+
+
+# ==================== EXPORT ====================
+
+class _ChunkedJSONReader:
+    """Walk a JSON object of {user_id: record} from a file, one entry at a time"""
+
+    def __init__(self, f, chunk_size=1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+
+    def _peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos] if self.pos < len(self.buffer) else ""
+            self._fill()
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A value ending exactly at the buffer end may be cut short (numbers)
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def items(self):
+        if self._peek() != "{":
+            raise ValueError("progress file must contain a JSON object")
+        self.pos += 1
+        if self._peek() == "}":
+            return
+        while True:
+            key = self._value()
+            if self._peek() != ":":
+                raise ValueError("expected ':' in progress file")
+            self.pos += 1
+            yield key, self._value()
+            separator = self._peek()
+            self.pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise ValueError("expected ',' or '}' in progress file")
+
+
+def iter_progress_items(path):
+    """Yield (user_id, record) from a progress.json file without loading it whole
+
+    Safe during saves: they os.replace the file, and this handle stays on the version it opened."""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        yield from _ChunkedJSONReader(f).items()
+
+
+def export_ndjson(path):
+    """Yield one NDJSON line per user"""
+    for user_id, record in iter_progress_items(path):
+        yield json.dumps(dict(record, user_id=record.get("user_id", user_id))) + "\n"
+
+
+def export_csv(path):
+    """Yield a CSV header, then one row per user"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush_row(row):
+        writer.writerow(row)
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    yield flush_row(EXPORT_CSV_FIELDS)
+    for user_id, record in iter_progress_items(path):
+        quiz = record.get("quiz", {})
+        practice = record.get("practice", {})
+        patterns = record.get("learning_patterns", {})
+        yield flush_row([
+            record.get("user_id", user_id), record.get("name", ""),
+            quiz.get("total_score", 0), quiz.get("total_quizzes", 0), quiz.get("average_score", 0),
+            practice.get("completed_exercises", 0), practice.get("correct_answers", 0), practice.get("accuracy", 0),
+            record.get("overall_progress", 0),
+            ";".join(patterns.get("strong_areas", [])), ";".join(patterns.get("weak_areas", [])),
+            patterns.get("last_activity") or "",
+        ])
+
+
+def export_stream(path, fmt="ndjson"):
+    return export_csv(path) if fmt == "csv" else export_ndjson(path)
+
+
+# ==================== COMMAND LINE ====================
+
+def _detect_format(filename, fmt):
+    if fmt:
+        return fmt
+    return "csv" if filename.lower().endswith(".csv") else "ndjson"
+
+
+def main(argv=None):
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    default_file = os.path.join(os.environ.get("ITS_DATA_DIR", os.path.join(project_root, "data")), "progress.json")
+
+    parser = argparse.ArgumentParser(description="Bulk import/export of student progress")
+    parser.add_argument("--progress-file", default=default_file)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="apply NDJSON/CSV progress records")
+    import_parser.add_argument("input", help="file to import, or - for stdin")
+    import_parser.add_argument("--format", choices=["ndjson", "csv"])
+    import_parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+
+    export_parser = commands.add_parser("export", help="stream all progress as NDJSON/CSV")
+    export_parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    export_parser.add_argument("-o", "--output", default="-")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "import":
+        from backend.progress import ProgressManager
+        manager = ProgressManager(args.progress_file)
+        fmt = _detect_format(args.input, args.format)
+        if args.input == "-":
+            summary = import_stream(manager, sys.stdin, fmt, args.batch_size)
+        else:
+            with open(args.input, "r", encoding="utf-8", newline="") as f:
+                summary = import_stream(manager, f, fmt, args.batch_size)
+        print(json.dumps(summary, indent=2))
+        return 1 if summary["rejected"] else 0
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        for chunk in export_stream(args.progress_file, args.format):
+            output.write(chunk)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""In-process publish/subscribe bus for live progress updates
+
+ProgressManager publishes a small delta on the "progress" channel after
+every committed save; /api/stream/progress relays them to dashboards as
+server-sent events. Each subscriber has its own bounded buffer: a consumer
+that falls behind loses its oldest messages (and is told so) rather than
+slowing down publishers. The last HISTORY messages per channel are kept so
+a reconnecting EventSource can resume from its Last-Event-ID.
+
+Subscribers are either threads (wait() blocks) or asyncio tasks (pass the
+running loop and await wait_async()).
+
+The bus is per process: with several server workers each one streams the
+saves it handled itself. Event ids carry the process's boot id
+("<boot>-<n>"), so an id from another worker or an earlier run is ignored
+rather than matched against this process's counter.
+"""
+import asyncio
+import itertools
+import json
+import os
+import threading
+import uuid
+from collections import deque
+
+from backend import metrics
+
+HISTORY = 1000
+SUBSCRIBER_BUFFER = 500
+
+STREAM_SUBSCRIBERS = metrics.REGISTRY.register(metrics.Gauge(
+    "its_stream_subscribers", "Open live-update subscriptions", ("channel",)))
+STREAM_DROPPED = metrics.REGISTRY.register(metrics.Counter(
+    "its_stream_dropped_total", "Live updates dropped for slow subscribers", ("channel",)))
+
+
+class Subscription:
+    """One subscriber's buffer of (id, channel, data) messages"""
+
+    def __init__(self, bus, channel, accept=None, loop=None):
+        self.bus = bus
+        self.channel = channel
+        # Optional filter: accept(data) -> bool
+        self.accept = accept
+        self.buffer = deque()
+        self.dropped = 0
+        self.closed = False
+        self._cond = threading.Condition()
+        self._loop = loop
+        self._async_event = asyncio.Event() if loop is not None else None
+
+    def _deliver(self, message):
+        if self.accept is not None and not self.accept(message[2]):
+            return
+        with self._cond:
+            if len(self.buffer) >= SUBSCRIBER_BUFFER:
+                self.buffer.popleft()
+                self.dropped += 1
+                STREAM_DROPPED.inc(self.channel)
+            self.buffer.append(message)
+            self._cond.notify()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._async_event.set)
+
+    def _drain(self):
+        with self._cond:
+            messages = list(self.buffer)
+            self.buffer.clear()
+            if self._async_event is not None:
+                self._async_event.clear()
+            return messages
+
+    def wait(self, timeout=None):
+        """Block until messages arrive (or timeout); returns them, possibly []"""
+        with self._cond:
+            if not self.buffer and not self.closed:
+                self._cond.wait(timeout)
+        return self._drain()
+
+    async def wait_async(self, timeout=None):
+        """Async version of wait() for subscriptions created with a loop"""
+        if not self.buffer and not self.closed:
+            try:
+                await asyncio.wait_for(self._async_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._drain()
+
+    def close(self):
+        self.bus.unsubscribe(self)
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._async_event.set)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Bus:
+    """Channels of subscribers plus a short replay history per channel"""
+
+    def __init__(self, history=HISTORY):
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._history = {}
+        self.history_size = history
+        self._pid = None
+        self._boot_id = None
+
+    @property
+    def boot_id(self):
+        """Names this process's message ids; renewed in a forked worker"""
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid, self._boot_id = pid, uuid.uuid4().hex[:8]
+        return self._boot_id
+
+    def event_id(self, message_id):
+        return f"{self.boot_id}-{message_id}"
+
+    def parse_event_id(self, event_id):
+        """The message id in a Last-Event-ID from this process, else None"""
+        boot_id, _, message_id = (event_id or "").rpartition("-")
+        if boot_id != self.boot_id or not message_id.isdigit():
+            return None
+        return int(message_id)
+
+    def publish(self, channel, data):
+        """Send data to every subscriber of channel; returns the message id"""
+        with self._lock:
+            message = (next(self._ids), channel, data)
+            history = self._history.get(channel)
+            if history is None:
+                history = self._history[channel] = deque(maxlen=self.history_size)
+            history.append(message)
+            # Delivered under the lock so every subscriber sees ids in order: a
+            # reconnect with Last-Event-ID must not replay a message already sent
+            for subscription in self._subscribers.get(channel, ()):
+                subscription._deliver(message)
+        return message[0]
+
+    def subscribe(self, channel, accept=None, last_id=None, loop=None):
+        """Open a subscription; with last_id, missed messages still in history are queued first"""
+        subscription = Subscription(self, channel, accept, loop)
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(subscription)
+            if last_id is not None:
+                for message in self._history.get(channel, ()):
+                    if message[0] > last_id:
+                        subscription._deliver(message)
+        STREAM_SUBSCRIBERS.inc(channel)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+                STREAM_SUBSCRIBERS.dec(subscription.channel)
+
+    def subscriber_count(self, channel=None):
+        """Subscribers of a channel, or of all channels"""
+        with self._lock:
+            if channel is None:
+                return sum(len(subscribers) for subscribers in self._subscribers.values())
+            return len(self._subscribers.get(channel, ()))
+
+
+def format_sse(message, event=None, source=None):
+    """A message as a server-sent event frame (ids named by the source bus)"""
+    message_id, channel, data = message
+    return f"id: {(source or bus).event_id(message_id)}\nevent: {event or channel}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+# The process-wide bus
+bus = Bus()
@@ -0,0 +1,169 @@
+"""Per-client rate limits and admission control for routes that write storage
+
+A guest login appends a guest and a session to users.json, so bots and
+reload loops grow the file and the disk I/O without bound. Limited routes
+are checked before any storage is touched, and a request that is over a
+limit gets RateLimited (HTTP 429 with Retry-After). A request goes through
+three checks:
+
+    client     a token bucket per client (address, or verified session): N requests per S seconds
+    route      a token bucket for the route as a whole, across all clients
+    in_flight  at most ITS_ADMISSION_MAX_IN_FLIGHT limited requests running at once
+
+Limits are "route=N/S" lists (burst N, refilled at N/S per second); a
+route not listed, or listed as 0, is not limited:
+
+    ITS_RATE_LIMITS="guest=10/60,login=60/60"       per client
+    ITS_ADMISSION_LIMITS="guest=20/1,login=50/1"    per route
+
+Buckets are kept per process: with W workers on N nodes a client can make
+up to W x N times its limit, so size the limits for that.
+
+    limits = RouteLimits.from_env()
+    with limits.admit("guest", "203.0.113.7"):
+        auth.create_guest_user()
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from backend import metrics
+
+DEFAULT_RATE_LIMITS = "guest=10/60,login=60/60"
+DEFAULT_ADMISSION_LIMITS = "guest=20/1,login=50/1"
+# Buckets kept per route; the least recently seen clients are forgotten (their buckets were full anyway)
+MAX_CLIENTS = 10000
+
+RATE_LIMITED = metrics.REGISTRY.register(metrics.Counter(
+    "its_rate_limited_total", "Requests turned away before touching storage", ("route", "reason")))
+
+
+class RateLimited(Exception):
+    """Over a limit; retry after retry_after (whole) seconds"""
+
+    def __init__(self, route, reason, retry_after):
+        super().__init__(f"{route}: {reason} limit")
+        self.route = route
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+def parse_limits(spec):
+    """{"guest": (10, 60.0), ...} from "guest=10/60,login=60/60" ("N" alone means per second)"""
+    limits = {}
+    for entry in (spec or "").split(","):
+        if not entry.strip():
+            continue
+        route, _, value = entry.partition("=")
+        count, _, seconds = value.partition("/")
+        count, seconds = int(count), float(seconds or 1)
+        if count > 0 and seconds > 0:
+            limits[route.strip()] = (count, seconds)
+    return limits
+
+
+class TokenBucket:
+    """burst tokens, refilled at rate per second; each request takes one"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self, now):
+        """0 if a token was taken, else the seconds until one is available (caller holds the lock)"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """One token bucket per client key"""
+
+    def __init__(self, count, seconds, max_clients=MAX_CLIENTS):
+        self.rate = count / seconds
+        self.burst = count
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket.take(now)
+
+
+class AdmissionController:
+    """Route-wide token buckets plus a cap on limited requests in flight"""
+
+    def __init__(self, route_limits, max_in_flight):
+        self.buckets = {route: TokenBucket(count / seconds, count) for route, (count, seconds) in route_limits.items()}
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def enter(self, route):
+        """Admit one request of route or raise RateLimited; pair with leave()"""
+        with self._lock:
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                raise RateLimited(route, "in_flight", 1)
+            bucket = self.buckets.get(route)
+            wait = bucket.take(time.monotonic()) if bucket is not None else 0
+            if wait:
+                raise RateLimited(route, "route", wait)
+            self.in_flight += 1
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+class _Admitted:
+    def __init__(self, admission):
+        self.admission = admission
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.admission.leave()
+
+
+class RouteLimits:
+    """Per-client and per-route limits of the limited routes"""
+
+    def __init__(self, client_limits, route_limits, max_in_flight):
+        self.clients = {route: RateLimiter(count, seconds) for route, (count, seconds) in client_limits.items()}
+        self.admission = AdmissionController(route_limits, max_in_flight)
+
+    @classmethod
+    def from_env(cls):
+        return cls(parse_limits(os.environ.get("ITS_RATE_LIMITS", DEFAULT_RATE_LIMITS)),
+                   parse_limits(os.environ.get("ITS_ADMISSION_LIMITS", DEFAULT_ADMISSION_LIMITS)),
+                   int(os.environ.get("ITS_ADMISSION_MAX_IN_FLIGHT", "16")))
+
+    def admit(self, route, client):
+        """A context manager holding the request's in-flight slot; raises RateLimited instead"""
+        try:
+            limiter = self.clients.get(route)
+            wait = limiter.take(client) if limiter is not None and client else 0
+            if wait:
+                raise RateLimited(route, "client", wait)
+            self.admission.enter(route)
+        except RateLimited as e:
+            RATE_LIMITED.inc(route, e.reason)
+            raise
+        return _Admitted(self.admission)
@@ -0,0 +1,176 @@
+"""Adaptive next-exercise recommender
+
+The item bank is built once from the shapes (ontology or built-in list):
+each shape contributes its topics (cube_volume, sphere_surface, ...), and
+each topic gets worked exercises at three difficulty levels: the
+memory-mapped bank of backend/exercises.py, or without NumPy the small
+ItemBank below. Items are indexed by (topic, difficulty) up front, so
+choosing an item is a lookup plus a per-user cursor, never a scan.
+
+Each user has a small heap of topics keyed by mastery (backend/mastery.py):
+the weakest topic comes first, difficulty follows its mastery, and a topic
+that was just served is pushed back by SPACING so the others get a turn.
+The heap is rebuilt only when the user's mastery row changes.
+
+    recommender = Recommender(ItemBank.build(shapes), mastery)
+    recommender.recommend("student_001")
+"""
+import heapq
+import random
+import threading
+import zlib
+from collections import OrderedDict
+
+from backend.exercises import DIFFICULTIES, TEMPLATES, ontology_hints
+from backend.mastery import mastery_score
+
+ITEMS_PER_LEVEL = 12
+# Priority added to a topic each time it is served
+SPACING = 0.15
+
+def difficulty_for(mastery):
+    """Easy while a topic is weak, hard once it is mastered"""
+    if mastery < 0.5:
+        return 1
+    if mastery < 0.75:
+        return 2
+    return 3
+
+
+class ItemBank:
+    """Practice items with a precomputed (topic, difficulty) -> item ids index
+
+    Items repeating an earlier one's question (the same parameters) are left
+    out of the index, so a student is not offered the same exercise twice."""
+
+    def __init__(self, items):
+        self.items = items
+        index = {}
+        seen = set()
+        for item_id, item in enumerate(items):
+            key = (item["topic"], item["difficulty"])
+            if (key, item["question"]) in seen:
+                continue
+            seen.add((key, item["question"]))
+            index.setdefault(key, []).append(item_id)
+        self.index = {key: tuple(ids) for key, ids in index.items()}
+        self.topics = sorted({topic for topic, _ in self.index})
+
+    def __len__(self):
+        return len(self.items)
+
+    def item(self, item_id):
+        return self.items[item_id]
+
+    def candidates(self, topic, difficulty):
+        """Item ids for a topic at a difficulty, nearest level if that one is empty"""
+        for level in sorted(DIFFICULTIES, key=lambda level: abs(level - difficulty)):
+            ids = self.index.get((topic, level))
+            if ids:
+                return ids
+        return ()
+
+    @classmethod
+    def build(cls, shapes=None, per_level=ITEMS_PER_LEVEL, seed=0):
+        """Generate items for the topics of the given shapes (all topics if None)"""
+        rng = random.Random(seed)
+        hints = ontology_hints(shapes)
+        items = []
+        for topic, (shape, kind, question, hint, answer, ranges) in TEMPLATES.items():
+            if hints is not None:
+                if topic not in hints:
+                    continue
+                hint = hints[topic] or hint
+            for difficulty in DIFFICULTIES:
+                for _ in range(per_level):
+                    params = {name: rng.randint(low, high) for name, (low, high) in ranges[difficulty].items()}
+                    items.append({
+                        "id": f"{topic}-{difficulty}-{len(items)}",
+                        "topic": topic,
+                        "shape": shape,
+                        "difficulty": difficulty,
+                        "question": question.format(**params),
+                        "answer": round(answer(params), 2),
+                        "hint": hint,
+                    })
+        if not items and hints is not None:
+            return cls.build(None, per_level, seed)
+        return cls(items)
+
+
+class _UserQueue:
+    """Topic heap and item cursors of one user"""
+    __slots__ = ("heap", "version", "cursors", "served")
+
+    def __init__(self):
+        self.heap = []
+        self.version = None
+        self.cursors = {}
+        self.served = 0
+
+
+class Recommender:
+    """Picks the next practice item per user from a precomputed ItemBank"""
+
+    def __init__(self, bank, mastery=None, max_users=100000):
+        self.bank = bank
+        # MasteryMatrix, or None to treat every topic as untried
+        self.mastery = mastery
+        self.max_users = max_users
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def set_bank(self, bank):
+        """Swap in a new item bank (e.g. once the ontology is loaded)"""
+        with self._lock:
+            self.bank = bank
+            self._users.clear()
+
+    def _rebuild(self, user_id, queue, version):
+        topics = self.mastery.user_topics(user_id) if self.mastery is not None else {}
+        untried = mastery_score(0, 0)
+        # (priority, topic, mastery): priority starts at the mastery and grows as the topic is served
+        queue.heap = []
+        for topic in self.bank.topics:
+            mastery = topics[topic]["mastery"] if topic in topics else untried
+            queue.heap.append((mastery, topic, mastery))
+        heapq.heapify(queue.heap)
+        queue.version = version
+
+    def _queue(self, user_id):
+        queue = self._users.get(user_id)
+        if queue is None:
+            if len(self._users) >= self.max_users:
+                # Forget the least recently used users; their queues are cheap to rebuild
+                for _ in range(self.max_users // 10 or 1):
+                    self._users.popitem(last=False)
+            queue = self._users[user_id] = _UserQueue()
+        else:
+            self._users.move_to_end(user_id)
+        version = self.mastery.row_version(user_id) if self.mastery is not None else 0
+        if queue.version != version:
+            self._rebuild(user_id, queue, version)
+        return queue
+
+    def recommend(self, user_id, count=1):
+        """The next count items for a user, weakest topics first"""
+        picked = []
+        with self._lock:
+            bank = self.bank
+            if not bank.topics:
+                return picked
+            queue = self._queue(user_id)
+            for _ in range(count):
+                priority, topic, mastery = queue.heap[0]
+                difficulty = difficulty_for(mastery)
+                ids = bank.candidates(topic, difficulty)
+                key = (topic, difficulty)
+                cursor = queue.cursors.get(key)
+                if cursor is None:
+                    # Spread users over the candidates instead of all starting at item 0
+                    cursor = zlib.crc32(f"{user_id}:{topic}".encode()) % len(ids)
+                queue.cursors[key] = cursor + 1
+                heapq.heapreplace(queue.heap, (priority + SPACING, topic, mastery))
+                queue.served += 1
+                picked.append(dict(bank.item(ids[cursor % len(ids)]), mastery=mastery))
+        return picked
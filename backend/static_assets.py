@@ -0,0 +1,155 @@
+"""Precompressed, content-hashed serving of the frontend files
+
+At startup every file under frontend/ is read once and gets:
+    - an ETag (sha256 of the content)
+    - a content-hashed alias, e.g. script.3f2a9c1b7d4e.js, served with a
+      one-year immutable Cache-Control
+    - gzip (and brotli, if the brotli package is installed) variants for text
+      types, picked per request from Accept-Encoding
+
+HTML pages are rewritten to reference the hashed aliases, and are themselves
+served with Cache-Control: no-cache so browsers revalidate them cheaply via
+If-None-Match. JSON API responses are gzipped on the fly when large enough.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_COMPRESS_BYTES = 256
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+# src="..." / href="..." references in HTML pages
+_REFERENCE = re.compile(r'''(\b(?:src|href)=["'])([^"'#?:]+)(["'])''')
+
+
+class Asset:
+    def __init__(self, path, data, content_type):
+        self.path = path
+        self.content_type = content_type
+        self.data = data
+        digest = hashlib.sha256(data).hexdigest()
+        self.etag = digest[:32]
+        root, ext = os.path.splitext(path)
+        self.hashed_path = f"{root}.{digest[:12]}{ext}"
+        self.variants = {}
+        if content_type.startswith(COMPRESSIBLE_TYPES) and len(data) >= MIN_COMPRESS_BYTES:
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) < len(data):
+                self.variants["gzip"] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(data, quality=11)
+                if len(compressed) < len(data):
+                    self.variants["br"] = compressed
+
+
+def _accepted_encodings(header):
+    """Encodings listed in Accept-Encoding with a non-zero q value"""
+    accepted = set()
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class StaticAssets:
+    def __init__(self, root):
+        self.root = root
+        self.by_path = {}
+        self.by_hashed_path = {}
+
+    def build(self):
+        """Read, hash and precompress every file under root"""
+        pages = []
+        for directory, _, filenames in os.walk(self.root):
+            for filename in sorted(filenames):
+                full_path = os.path.join(directory, filename)
+                path = os.path.relpath(full_path, self.root).replace(os.sep, "/")
+                content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+                if content_type == "text/html":
+                    pages.append((path, full_path))
+                    continue
+                with open(full_path, "rb") as f:
+                    self._add(Asset(path, f.read(), content_type))
+
+        # Pages last, so their references can point at the hashed aliases
+        for path, full_path in pages:
+            with open(full_path, "r", encoding="utf-8") as f:
+                html = f.read()
+            base = os.path.dirname(path)
+            self._add(Asset(path, self._rewrite_references(html, base).encode("utf-8"), "text/html; charset=utf-8"))
+        return self
+
+    def _add(self, asset):
+        self.by_path[asset.path] = asset
+        self.by_hashed_path[asset.hashed_path] = asset
+
+    def _rewrite_references(self, html, base):
+        def replace(match):
+            reference = match.group(2)
+            target = os.path.normpath(os.path.join(base, reference)).replace(os.sep, "/")
+            asset = self.by_path.get(target)
+            if asset is None:
+                return match.group(0)
+            hashed = os.path.join(os.path.dirname(reference), os.path.basename(asset.hashed_path)).replace(os.sep, "/")
+            return match.group(1) + hashed + match.group(3)
+        return _REFERENCE.sub(replace, html)
+
+    def response(self, path, request):
+        """Flask response for path, or None if it is not a known asset"""
+        from flask import Response
+
+        asset = self.by_hashed_path.get(path)
+        cache_control = IMMUTABLE_CACHE
+        if asset is None:
+            asset = self.by_path.get(path)
+            cache_control = REVALIDATE_CACHE
+        if asset is None:
+            return None
+
+        headers = {"ETag": f'"{asset.etag}"', "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if request.headers.get("If-None-Match", "").strip() in (f'"{asset.etag}"', f'W/"{asset.etag}"', "*"):
+            return Response(status=304, headers=headers)
+
+        body = asset.data
+        accepted = _accepted_encodings(request.headers.get("Accept-Encoding"))
+        for encoding in ("br", "gzip"):
+            if encoding in asset.variants and encoding in accepted:
+                body = asset.variants[encoding]
+                headers["Content-Encoding"] = encoding
+                break
+        return Response(body, status=200, headers=headers, content_type=asset.content_type)
+
+
+def install_json_compression(app, min_bytes=1024, level=5):
+    """gzip JSON responses for clients that accept it"""
+    from flask import request
+
+    @app.after_request
+    def compress_json(response):
+        if (response.mimetype != "application/json"
+                or response.is_streamed
+                or response.status_code < 200 or response.status_code >= 300
+                or "Content-Encoding" in response.headers
+                or "gzip" not in _accepted_encodings(request.headers.get("Accept-Encoding"))):
+            return response
+        data = response.get_data()
+        if len(data) < min_bytes:
+            return response
+        response.set_data(gzip.compress(data, compresslevel=level))
+        response.headers["Content-Encoding"] = "gzip"
+        response.vary.add("Accept-Encoding")
+        return response
+
+    return app
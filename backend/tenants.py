@@ -0,0 +1,268 @@
+"""Several schools (tenants) served by one process
+
+Each tenant is a directory under ITS_TENANTS_DIR holding its own users.json,
+progress.json and event log, and optionally its own ontology (ontology.owl,
+ontology.xml, a JSON manifest ontology.json or a directory ontology/);
+tenants without one share the default ontology. A request picks its tenant
+with the X-Tenant-ID header or a subdomain of ITS_TENANT_DOMAIN
+(school1.its.example.org); requests with neither use the default data
+directory as before.
+
+Tenants are opened on first use and kept in an LRU: at most
+ITS_TENANT_MAX_LOADED of them, and at most ITS_TENANT_MEMORY_MB of estimated
+memory (parsed ontology and data files). The least recently used tenant
+without requests in flight is closed (its storage flushed) when either limit
+is exceeded, so hundreds of schools can be served without loading every
+ontology. The tenant of the current request is held in a context variable
+and follows the request into worker threads.
+
+    registry = TenantRegistry("/srv/its/tenants")
+    with registry.use("school1") as tenant:
+        tenant.component("auth", create_auth_manager)
+"""
+import contextlib
+import contextvars
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from backend import metrics
+
+logger = logging.getLogger("its.tenants")
+
+TENANT_HEADER = "X-Tenant-ID"
+TENANT_ID_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+ONTOLOGY_NAMES = ("ontology.owl", "ontology.xml", "ontology.json", "ontology")
+DATA_FILES = ("users.json", "progress.json", "events.ndjson")
+# Resident memory per byte on disk: measured at 1.7-2.2x for parsed ontologies, rounded up
+MEMORY_FACTOR = 3
+# Fixed cost of an open tenant (managers, tutor, caches)
+TENANT_OVERHEAD = 256 * 1024
+
+TENANTS_LOADED = metrics.REGISTRY.register(metrics.Gauge(
+    "its_tenants_loaded", "Tenants currently open"))
+TENANT_EVICTIONS = metrics.REGISTRY.register(metrics.Counter(
+    "its_tenant_evictions_total", "Tenants closed to stay within the limits", ("reason",)))
+
+_current = contextvars.ContextVar("its_tenant", default=None)
+
+
+def current():
+    """The tenant of the current request, or None for the default data"""
+    return _current.get()
+
+
+def activate(tenant):
+    """Make tenant current for this request; returns a token for deactivate()"""
+    return _current.set(tenant)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+class UnknownTenant(Exception):
+    """No directory for this tenant id"""
+
+
+def tenant_id_from(header, host, domain=None):
+    """Tenant id from the header value or from host's subdomain under domain; None if neither
+
+    Raises UnknownTenant for ids that are not valid directory names."""
+    tenant_id = (header or "").strip().lower()
+    if not tenant_id and domain and host:
+        host = host.split(":", 1)[0].lower()
+        suffix = "." + domain.lower().lstrip(".")
+        if host.endswith(suffix):
+            tenant_id = host[: -len(suffix)]
+    if not tenant_id:
+        return None
+    if not TENANT_ID_PATTERN.match(tenant_id):
+        raise UnknownTenant(tenant_id)
+    return tenant_id
+
+
+class Tenant:
+    """One school's directory, ontology and lazily created subsystems"""
+
+    def __init__(self, tenant_id, directory, on_ontology_loaded=None):
+        self.id = tenant_id
+        self.data_dir = directory
+        self.ontology_path = next((os.path.join(directory, name) for name in ONTOLOGY_NAMES
+                                   if os.path.exists(os.path.join(directory, name))), None)
+        self.ontology_state = "pending" if self.ontology_path else "shared"
+        self.ontology_loader = None
+        self.components = {}
+        self.memory = self.memory_estimate()
+        # Requests currently using this tenant; it is not evicted while > 0
+        self.active = 0
+        self._on_ontology_loaded = on_ontology_loaded
+        self._lock = threading.RLock()
+
+    def component(self, name, create):
+        """The tenant's instance of a subsystem, created by create(tenant) on first use"""
+        value = self.components.get(name)
+        if value is None:
+            with self._lock:
+                value = self.components.get(name)
+                if value is None:
+                    value = self.components[name] = create(self)
+        return value
+
+    def ontology(self):
+        """The tenant's own loader; starts loading it in the background, None until loaded"""
+        if self.ontology_state == "pending":
+            with self._lock:
+                if self.ontology_state == "pending":
+                    self.ontology_state = "loading"
+                    threading.Thread(target=self._load_ontology, name=f"ontology-loader-{self.id}", daemon=True).start()
+        return self.ontology_loader
+
+    def _load_ontology(self):
+        try:
+            from ontology.ontology_loader import OntologyLoader
+            loader = OntologyLoader(self.ontology_path)
+            with metrics.timed("tenant.load_ontology"):
+                loaded = loader.load_ontology()
+            if not loaded:
+                logger.warning("Ontology of tenant %s failed to load, serving fallback data", self.id)
+                self.ontology_state = "failed"
+                return
+            with self._lock:
+                self.ontology_loader = loader
+                self.ontology_state = "loaded"
+                self.memory = self.memory_estimate()
+            logger.info("Loaded ontology of tenant %s", self.id)
+            if self._on_ontology_loaded:
+                self._on_ontology_loaded(self, loader)
+        except Exception as e:
+            logger.exception("Ontology error for tenant %s: %s", self.id, e)
+            self.ontology_state = "failed"
+
+    def memory_estimate(self):
+        """Rough resident size: the ontology once loaded plus the data files"""
+        paths = [os.path.join(self.data_dir, name) for name in DATA_FILES]
+        if self.ontology_loader is not None:
+            paths.append(self.ontology_path)
+        total = 0
+        for path in paths:
+            try:
+                if os.path.isdir(path):
+                    total += sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+                else:
+                    total += os.path.getsize(path)
+            except OSError:
+                pass
+        return TENANT_OVERHEAD + total * MEMORY_FACTOR
+
+    def close(self):
+        """Flush every subsystem that buffers writes"""
+        for name, component in list(self.components.items()):
+            if hasattr(component, "flush"):
+                try:
+                    component.flush()
+                except Exception as e:
+                    logger.error("Error flushing %s of tenant %s: %s", name, self.id, e)
+
+
+class TenantRegistry:
+    """LRU of open tenants, bounded by count and estimated memory"""
+
+    def __init__(self, root, max_tenants=None, max_bytes=None, on_ontology_loaded=None):
+        self.root = root
+        self.max_tenants = max_tenants or int(os.environ.get("ITS_TENANT_MAX_LOADED", "50"))
+        self.max_bytes = max_bytes or int(os.environ.get("ITS_TENANT_MEMORY_MB", "1024")) * 1024 * 1024
+        self.on_ontology_loaded = on_ontology_loaded
+        self._tenants = OrderedDict()
+        # Still over a limit after the last eviction (every tenant was busy)
+        self._over_limit = False
+        self._lock = threading.Lock()
+
+    def _open(self, tenant_id):
+        directory = os.path.join(self.root, tenant_id)
+        if not os.path.isdir(directory):
+            raise UnknownTenant(tenant_id)
+        logger.info("Opening tenant %s", tenant_id)
+        TENANTS_LOADED.inc()
+        return Tenant(tenant_id, directory, self._ontology_loaded)
+
+    def _ontology_loaded(self, tenant, loader):
+        if self.on_ontology_loaded:
+            self.on_ontology_loaded(tenant, loader)
+        # The tenant just grew by its parsed ontology
+        with self._lock:
+            evicted = self._evict()
+        for stale in evicted:
+            stale.close()
+
+    def acquire(self, tenant_id):
+        """Open (or reuse) a tenant and mark a request as using it; pair with release()"""
+        evicted = []
+        with self._lock:
+            tenant = self._tenants.get(tenant_id)
+            if tenant is None:
+                tenant = self._tenants[tenant_id] = self._open(tenant_id)
+                evicted = self._evict()
+            else:
+                self._tenants.move_to_end(tenant_id)
+            tenant.active += 1
+        for stale in evicted:
+            stale.close()
+        return tenant
+
+    def release(self, tenant):
+        evicted = []
+        with self._lock:
+            tenant.active -= 1
+            if self._over_limit:
+                evicted = self._evict()
+        for stale in evicted:
+            stale.close()
+
+    @contextlib.contextmanager
+    def use(self, tenant_id):
+        """Make tenant_id the current tenant for the duration of the block"""
+        tenant = self.acquire(tenant_id)
+        token = activate(tenant)
+        try:
+            yield tenant
+        finally:
+            deactivate(token)
+            self.release(tenant)
+
+    def _evict(self):
+        """Drop least recently used idle tenants while over a limit (caller holds the lock)"""
+        evicted = []
+        over_count = len(self._tenants) - self.max_tenants
+        memory = sum(tenant.memory for tenant in self._tenants.values())
+        # Oldest first; the newest tenant is the one being opened and is never dropped
+        for tenant_id, tenant in list(self._tenants.items())[:-1]:
+            if over_count <= 0 and memory <= self.max_bytes:
+                break
+            if tenant.active:
+                continue
+            del self._tenants[tenant_id]
+            TENANTS_LOADED.dec()
+            TENANT_EVICTIONS.inc("count" if over_count > 0 else "memory")
+            logger.info("Closing idle tenant %s", tenant_id)
+            over_count -= 1
+            memory -= tenant.memory
+            evicted.append(tenant)
+        self._over_limit = over_count > 0 or memory > self.max_bytes
+        return evicted
+
+    def tenants(self):
+        """Snapshot of the open tenants, least recently used first"""
+        with self._lock:
+            return list(self._tenants.values())
+
+    def close(self):
+        """Close every open tenant (shutdown)"""
+        with self._lock:
+            tenants = list(self._tenants.values())
+            self._tenants.clear()
+        for tenant in tenants:
+            TENANTS_LOADED.dec()
+            tenant.close()
@@ -1,7 +1,168 @@
+"""The AI tutor: keyword matching strategies and the answering rules
+
+Answering a message has two steps. A matcher finds which known keywords
+(shape names, "volume", "formula", "quiz", ...) occur in the message, and
+fixed rules turn that keyword set into an intent such as "sphere.volume",
+"formula.perimeter" or "greeting", which selects the reply. Matchers are
+interchangeable (ITS_TUTOR_MATCHER):
+
+    linear     substring test per keyword (the original behaviour; "this" contains "hi")
+    regex      one compiled alternation with word boundaries
+    automaton  Aho-Corasick automaton over all keywords, one pass over the message
+    fuzzy      corrects typos and plurals with backend/fuzzy.py, then runs the automaton
+
+benchmarks/tutor_strategies.py measures the throughput and accuracy of
+each one on the labeled questions in benchmarks/tutor_corpus.jsonl.
+"""
+import logging
+import os
 import random
+import re
+
+from backend.fuzzy import DeletionIndex, correct_text
+
+logger = logging.getLogger("its.tutor")
+
+DEFAULT_MATCHER = "fuzzy"
+
+# Topics of the five exercises in the default practice set (frontend/script.js)
+DEFAULT_PRACTICE_TOPICS = ["cube_volume", "sphere_surface", "triangle_area", "cylinder_volume", "rectangle_perimeter"]
+TOPIC_LABELS = {
+    "cube_volume": "cube volume",
+    "sphere_surface": "sphere surface area",
+    "triangle_area": "triangle area",
+    "cylinder_volume": "cylinder volume",
+    "rectangle_perimeter": "rectangle perimeter",
+}
+
+SHAPES = ["cube", "sphere", "cone", "cylinder", "triangle", "rectangle"]
+# Question word -> knowledge-base key, in the order they are tried
+SHAPE_TOPICS = [("volume", "volume"), ("surface", "surface_area"), ("area", "area"), ("perimeter", "perimeter")]
+GENERAL_TOPICS = [("2d", "2d_vs_3d"), ("3d", "2d_vs_3d"), ("pi", "pi"), ("volume", "volume"), ("area", "area")]
+FORMULA_WORDS = ["formula", "calculate", "compute", "find"]
+GREETING_WORDS = ["hello", "hi", "hey", "greetings"]
+COMMANDS = ["help", "shapes", "quiz", "practice", "progress"]
+
+KEYWORDS = sorted(set(
+    SHAPES + [word for word, _ in SHAPE_TOPICS + GENERAL_TOPICS] + FORMULA_WORDS + GREETING_WORDS + COMMANDS))
+
+
+# ==================== MATCHERS ====================
+
+class Matcher:
+    """Finds which of a fixed set of keywords occur in a message"""
+    name = None
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+
+    def find(self, text):
+        """Set of the keywords found in text (already lowercased)"""
+        raise NotImplementedError
+
+
+class LinearMatcher(Matcher):
+    """Substring test per keyword; cheap for a few keywords but matches inside words"""
+    name = "linear"
+
+    def find(self, text):
+        return {keyword for keyword in self.keywords if keyword in text}
+
+
+class RegexMatcher(Matcher):
+    """All keywords in one compiled pattern, whole words only"""
+    name = "regex"
+
+    def __init__(self, keywords):
+        super().__init__(keywords)
+        # Longest first so a keyword is not shadowed by its own prefix
+        alternatives = "|".join(re.escape(k) for k in sorted(self.keywords, key=len, reverse=True))
+        self.pattern = re.compile(rf"\b(?:{alternatives})\b")
+
+    def find(self, text):
+        return set(self.pattern.findall(text))
+
+
+class AutomatonMatcher(Matcher):
+    """Aho-Corasick automaton: every keyword found in one pass, whole words only"""
+    name = "automaton"
+
+    def __init__(self, keywords):
+        super().__init__(keywords)
+        # State 0 is the root; goto[state] maps a character to the next state
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+        for keyword in self.keywords:
+            state = 0
+            for char in keyword:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state] += (keyword,)
+        # Breadth first: a state's failure link is its longest proper suffix that is also a prefix
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] += self.output[self.fail[child]]
+
+    def find(self, text):
+        found = set()
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for keyword in output[state]:
+                start = end - len(keyword) + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (end + 1 == len(text) or not text[end + 1].isalnum()):
+                    found.add(keyword)
+        return found
+
+
+class FuzzyMatcher(AutomatonMatcher):
+    """Corrects misspelled and plural words to the nearest keyword, then runs the automaton"""
+    name = "fuzzy"
+
+    def __init__(self, keywords):
+        super().__init__(keywords)
+        self.vocabulary = DeletionIndex(self.keywords)
+
+    def find(self, text):
+        corrected, _corrections = correct_text(text, self.vocabulary)
+        return super().find(corrected)
+
+
+MATCHERS = {matcher.name: matcher for matcher in (LinearMatcher, RegexMatcher, AutomatonMatcher, FuzzyMatcher)}
+
+
+def create_matcher(name=None, keywords=KEYWORDS):
+    """A matcher by name (default ITS_TUTOR_MATCHER, then DEFAULT_MATCHER)"""
+    name = name or os.environ.get("ITS_TUTOR_MATCHER", DEFAULT_MATCHER)
+    if name not in MATCHERS:
+        logger.warning("Unknown tutor matcher %r, using %s", name, DEFAULT_MATCHER)
+        name = DEFAULT_MATCHER
+    return MATCHERS[name](keywords)
+
+
+# ==================== TUTOR ====================
 
 class AITutor:
-    def __init__(self):
+    def __init__(self, matcher=None):
+        self.name = "AI Tutor"
+        self.specialization = "Geometry"
+        self.from_ontology = False
+        # Matcher instance or name, see MATCHERS
+        self.matcher = matcher if isinstance(matcher, Matcher) else create_matcher(matcher)
         self.knowledge_base = {
             "cube": {
                 "volume": "Volume of a cube = a³ (where 'a' is the side length). Example: If side = 4 cm, volume = 4³ = 64 cm³",
@@ -38,61 +199,106 @@ class AITutor:
                 "pi": "π (pi) is a mathematical constant approximately equal to 3.14159. It represents the ratio of a circle's circumference to its diameter.",
                 "volume": "Volume measures how much space a 3D shape occupies, measured in cubic units.",
                 "area": "Area measures the space inside a 2D shape, measured in square units."
+            },
+            "formula": {
+                "volume": "For volume formulas: Cube = a³, Sphere = 4/3 π r³, Cone = (1/3) π r² h, Cylinder = π r² h",
+                "surface_area": "For surface area: Cube = 6a², Sphere = 4πr², Cylinder = 2πr(h + r)",
+                "perimeter": "For perimeter: Rectangle = 2(length + width), Triangle = sum of all sides"
             }
         }
-        
-        self.greetings = [
-            "Hello! I'm your geometry tutor. How can I help you today?",
-            "Hi there! Ready to learn some geometry?",
-            "Welcome! I'm here to help with shapes, formulas, and geometry concepts.",
-            "Greetings! Ask me anything about geometric shapes."
-        ]
-        
+
         self.encouragements = [
             "Great question!",
             "That's an interesting topic!",
             "Let me explain that for you.",
             "I can help with that!"
         ]
-    
+        self._build_responses()
+
+    def load_from_ontology(self, loader):
+        """Take name and specialization from the ontology AI Tutor individual"""
+        if loader and hasattr(loader, 'get_ai_tutor'):
+            try:
+                ontology_tutor = loader.get_ai_tutor()
+                if ontology_tutor:
+                    self.name = ontology_tutor.get('name', self.name)
+                    self.specialization = ontology_tutor.get('specialization', self.specialization)
+                    self.from_ontology = True
+                    self._build_responses()
+                    logger.info("Using AI Tutor from ontology: %s", self.name)
+                else:
+                    logger.info("No AI Tutor found in ontology, using default")
+            except Exception as e:
+                logger.error("Error getting AI Tutor from ontology: %s", e)
+
+    def _build_responses(self):
+        """Build the replies that mention the tutor's name"""
+        self.greetings = [
+            f"Hello! I'm {self.name}, your {self.specialization} tutor. How can I help?",
+            f"Hi there! I'm {self.name}. Ready to learn some geometry?",
+            "Welcome! I'm here to help with shapes, formulas, and geometry concepts.",
+            "Greetings! Ask me anything about geometric shapes."
+        ]
+        self.responses = {
+            "help": f"I'm {self.name}, specializing in {self.specialization}. I can help with: cubes, spheres, cones, cylinders, triangles, rectangles.",
+            "formula": "I can provide formulas for volume, surface area, and area of geometric shapes.",
+            "shapes": "I know about: Cube, Sphere, Cone, Cylinder, Triangle, Rectangle.",
+            "progress": "I can help you track your learning progress and suggest areas to improve.",
+            "quiz": "Ready for a quiz? I can test your knowledge of geometric shapes and formulas.",
+            "practice": "Let's practice some geometry problems together!",
+            "fallback": f"I'm {self.name}, your geometry tutor. I can help with shapes (cube, sphere, cone, cylinder, triangle, rectangle), formulas, quizzes, and practice exercises. What would you like to know?"
+        }
+
+    def classify(self, message):
+        """The intent of a message: "sphere.volume", "formula.perimeter", "general.pi", "quiz", "greeting", "fallback", ..."""
+        found = self.matcher.find(message.lower())
+
+        # Check for shape-specific questions
+        for shape in SHAPES:
+            if shape in found:
+                for word, key in SHAPE_TOPICS:
+                    if word in found and key in self.knowledge_base[shape]:
+                        return f"{shape}.{key}"
+                return f"{shape}.description"
+
+        # Check for formula questions
+        if any(word in found for word in FORMULA_WORDS):
+            if "volume" in found:
+                return "formula.volume"
+            elif "surface" in found or "area" in found:
+                return "formula.surface_area"
+            elif "perimeter" in found:
+                return "formula.perimeter"
+
+        # Check for general topics
+        for word, key in GENERAL_TOPICS:
+            if word in found:
+                return f"general.{key}"
+
+        for command in ["formula"] + COMMANDS:
+            if command in found:
+                return command
+
+        if any(word in found for word in GREETING_WORDS):
+            return "greeting"
+        return "fallback"
+
     def get_response(self, message, user_id):
         """Generate a response to user message"""
-        message_lower = message.lower()
-        
-        # Check for greetings
-        if any(word in message_lower for word in ["hello", "hi", "hey", "greetings"]):
+        intent = self.classify(message)
+        if intent == "greeting":
             return random.choice(self.greetings)
-        
-        # Check for shape-specific questions
-        for shape in ["cube", "sphere", "cone", "cylinder", "triangle", "rectangle"]:
-            if shape in message_lower:
-                for topic in ["volume", "surface", "area", "perimeter", "what is", "explain", "describe"]:
-                    if topic in message_lower:
-                        if shape in self.knowledge_base and topic in self.knowledge_base[shape]:
-                            encouragement = random.choice(self.encouragements)
-                            return f"{encouragement} {self.knowledge_base[shape][topic]}"
-                
-                # General shape description
-                if shape in self.knowledge_base:
-                    return f"{self.knowledge_base[shape]['description']} What specifically would you like to know about {shape}s?"
-        
-        # Check for general topics
-        for topic in self.knowledge_base["general"]:
-            if topic in message_lower:
-                return self.knowledge_base["general"][topic]
-        
-        # Check for formula questions
-        if any(word in message_lower for word in ["formula", "calculate", "compute", "find"]):
-            if "volume" in message_lower:
-                return "For volume formulas: Cube = a³, Sphere = 4/3 π r³, Cone = (1/3) π r² h, Cylinder = π r² h"
-            elif "surface" in message_lower or "area" in message_lower:
-                return "For surface area: Cube = 6a², Sphere = 4πr², Cylinder = 2πr(h + r)"
-            elif "perimeter" in message_lower:
-                return "For perimeter: Rectangle = 2(length + width), Triangle = sum of all sides"
-        
-        # Default response
-        return "I can help you with geometry concepts, formulas for shapes (cube, sphere, cone, cylinder, triangle, rectangle), and calculations. Try asking about a specific shape or formula!"
-    
+        if intent in self.responses:
+            return self.responses[intent]
+
+        section, key = intent.split(".", 1)
+        if key == "description":
+            return f"{self.knowledge_base[section]['description']} What specifically would you like to know about {section}s?"
+        if section in SHAPES:
+            encouragement = random.choice(self.encouragements)
+            return f"{encouragement} {self.knowledge_base[section][key]}"
+        return self.knowledge_base[section][key]
+
     def get_quiz_feedback(self, score, total):
         """Provide feedback based on quiz performance"""
         percentage = (score / total) * 100
@@ -106,8 +312,8 @@ class AITutor:
         else:
             return "Let's review the basics together. Check out the shapes section and don't hesitate to ask me questions!"
     
-    def get_practice_feedback(self, correct, total, exercises):
-        """Provide feedback on practice exercises"""
+    def get_practice_feedback(self, correct, total, exercises, weakest=None):
+        """Provide feedback on practice exercises; weakest is MasteryMatrix.weakest_topics()"""
         percentage = (correct / total) * 100
         
         if percentage == 100:
@@ -117,19 +323,21 @@ class AITutor:
         elif percentage >= 60:
             return "Good effort! You're on the right track. Review any mistakes and try again."
         else:
-            # Identify weak areas
+            # Identify weak areas from each exercise's topic; exercises without one
+            # fall back to the topic of that slot in the default practice set
             weak_areas = []
-            if len(exercises) >= 5:
-                if exercises[0].get("correct") == False:
-                    weak_areas.append("cube volume")
-                if exercises[1].get("correct") == False:
-                    weak_areas.append("sphere surface area")
-                if exercises[2].get("correct") == False:
-                    weak_areas.append("triangle area")
-                if exercises[3].get("correct") == False:
-                    weak_areas.append("cylinder volume")
-                if exercises[4].get("correct") == False:
-                    weak_areas.append("rectangle perimeter")
+            for index, exercise in enumerate(exercises):
+                if exercise.get("correct") is False:
+                    topic = exercise.get("topic") or (DEFAULT_PRACTICE_TOPICS[index] if index < len(DEFAULT_PRACTICE_TOPICS) else None)
+                    label = TOPIC_LABELS.get(topic, (topic or "").replace("_", " "))
+                    if label and label not in weak_areas:
+                        weak_areas.append(label)
+            
+            # Add the weakest topics from the student's mastery history
+            for entry in weakest or []:
+                label = TOPIC_LABELS.get(entry["topic"], entry["topic"].replace("_", " "))
+                if label not in weak_areas:
+                    weak_areas.append(label)
             
             if weak_areas:
                 return f"Let's focus on: {', '.join(weak_areas)}. Review these formulas and try again!"
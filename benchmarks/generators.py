@@ -0,0 +1,135 @@
+"""Synthetic data generators for the benchmark suite
+
+Files are written in a streaming fashion, so the 1M-record tiers do not need
+the whole dataset in memory.
+"""
+import json
+import random
+
+NS = "http://www.semanticweb.org/ontology/its-geometry#"
+SHAPES = ["Cube", "Sphere", "Cone", "Cylinder", "Triangle", "Rectangle"]
+TOPICS = ["cube_volume", "cube_surface", "sphere_volume", "sphere_surface", "cone_volume",
+          "cylinder_volume", "triangle_area", "rectangle_area", "rectangle_perimeter"]
+
+ONTOLOGY_HEADER = '''<?xml version="1.0"?>
+<rdf:RDF xmlns="http://www.semanticweb.org/ontology/its-geometry#"
+     xml:base="http://www.semanticweb.org/ontology/its-geometry"
+     xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+     xmlns:owl="http://www.w3.org/2002/07/owl#"
+     xmlns:xsd="http://www.w3.org/2001/XMLSchema#"
+     xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#">
+    <owl:Ontology rdf:about="http://www.semanticweb.org/ontology/its-geometry"/>
+'''
+
+CLASSES = [
+    ("User", ""), ("Student", "User"), ("GuestUser", "User"), ("Tutor", "User"), ("AITutor", "Tutor"),
+    ("GeometricShape", ""), ("ThreeDShape", "GeometricShape"), ("TwoDShape", "GeometricShape"),
+    ("Cube", "ThreeDShape"), ("Sphere", "ThreeDShape"), ("Cone", "ThreeDShape"), ("Cylinder", "ThreeDShape"),
+    ("Triangle", "TwoDShape"), ("Rectangle", "TwoDShape"), ("Formula", ""), ("Progress", ""),
+]
+
+
+def _individual(kind, name, label, props):
+    lines = [f'    <owl:NamedIndividual rdf:about="{NS}{name}">',
+             f'        <rdf:type rdf:resource="{NS}{kind}"/>']
+    for prop, value, is_resource in props:
+        if is_resource:
+            lines.append(f'        <{prop} rdf:resource="{NS}{value}"/>')
+        else:
+            lines.append(f'        <{prop}>{value}</{prop}>')
+    lines.append(f'        <rdfs:label>{label}</rdfs:label>')
+    lines.append('    </owl:NamedIndividual>')
+    return "\n".join(lines) + "\n"
+
+
+def write_ontology(path, n_individuals, seed=0):
+    """OWL file with n individuals: students, progress records, shapes and formulas"""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(ONTOLOGY_HEADER)
+        for name, parent in CLASSES:
+            f.write(f'    <owl:Class rdf:about="{NS}{name}">\n')
+            if parent:
+                f.write(f'        <rdfs:subClassOf rdf:resource="{NS}{parent}"/>\n')
+            f.write(f'        <rdfs:label>{name}</rdfs:label>\n    </owl:Class>\n')
+
+        f.write(_individual("AITutor", "TutorFATIM", "FATIM AI Tutor",
+                            [("tutorSpecialization", "Geometric Shapes and Formulas", False)]))
+        # Shapes and their formulas (about 1 in 20 individuals), the rest students/progress
+        for i in range(n_individuals - 1):
+            roll = i % 20
+            if roll == 0:
+                shape = SHAPES[(i // 20) % len(SHAPES)]
+                f.write(_individual(shape, f"{shape}Shape{i}", shape,
+                                    [("hasVolumeFormula", f"{shape}Formula{i + 1}", True)]))
+            elif roll == 1:
+                shape = SHAPES[((i - 1) // 20) % len(SHAPES)]
+                f.write(_individual("Formula", f"{shape}Formula{i}", f"{shape} Formula",
+                                    [("formulaExpression", "a³", False)]))
+            elif roll % 2 == 0:
+                f.write(_individual("Student", f"Student{i}", f"Student {i} - Registered Student",
+                                    [("studentName", f"Student{i}", False),
+                                     ("hasTutor", "TutorFATIM", True)]))
+            else:
+                f.write(_individual("Progress", f"Progress{i}", f"Student {i - 1}'s Progress",
+                                    [("quizScore", rng.randint(0, 100), False),
+                                     ("practiceScore", rng.randint(0, 100), False),
+                                     ("completionPercentage", round(rng.uniform(0, 100), 1), False)]))
+        f.write("</rdf:RDF>\n")
+
+
+def write_users(path, n_students, n_guests=None, seed=0):
+    """users.json in the AuthManager layout"""
+    rng = random.Random(seed)
+    n_guests = n_students // 10 if n_guests is None else n_guests
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"students": [')
+        for i in range(n_students):
+            record = {
+                "id": f"student_{i:08x}",
+                "username": f"student_{i}",
+                "name": f"Student {i}",
+                "registration_date": "2024-01-10T14:30:00",
+                "type": "student",
+                "progress": {"quiz_score": rng.randint(0, 100), "practice_score": rng.randint(0, 100)},
+            }
+            f.write(("," if i else "") + json.dumps(record))
+        f.write('], "guests": [')
+        for i in range(n_guests):
+            record = {"id": f"guest_{i:08x}", "name": "Guest", "type": "guest", "created_at": "2024-01-15T11:30:00"}
+            f.write(("," if i else "") + json.dumps(record))
+        f.write('], "sessions": []}')
+
+
+def progress_record(user_id, rng):
+    """One record shaped like ProgressManager._create_default_progress"""
+    quizzes = rng.randint(0, 10)
+    total_score = sum(rng.randint(0, 100) for _ in range(quizzes))
+    completed = rng.randint(0, 40)
+    correct = rng.randint(0, completed)
+    average = total_score / quizzes if quizzes else 0
+    accuracy = correct / completed * 100 if completed else 0
+    return {
+        "user_id": user_id,
+        "quiz": {"total_score": total_score, "total_quizzes": quizzes, "average_score": average,
+                 "last_quiz": "2024-01-15T10:45:00" if quizzes else None},
+        "practice": {"completed_exercises": completed, "correct_answers": correct, "accuracy": accuracy,
+                     "last_practice": "2024-01-15T10:30:00" if completed else None},
+        "overall_progress": (average + accuracy) / 2 if average and accuracy else average or accuracy,
+        "learning_patterns": {
+            "strong_areas": rng.sample(TOPICS, rng.randint(0, 3)),
+            "weak_areas": rng.sample(TOPICS, rng.randint(0, 3)),
+            "last_activity": "2024-01-15T10:45:00",
+        },
+    }
+
+
+def write_progress(path, n_records, seed=0):
+    """progress.json keyed by user id"""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{")
+        for i in range(n_records):
+            user_id = f"student_{i:08x}"
+            f.write(("," if i else "") + json.dumps(user_id) + ":" + json.dumps(progress_record(user_id, rng)))
+        f.write("}")
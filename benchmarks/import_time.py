@@ -0,0 +1,94 @@
+"""Import-time budget check for the backend
+
+    python benchmarks/import_time.py [--module backend.app] [--budget-ms 400]
+
+Imports the module in a fresh interpreter with `python -X importtime`,
+prints the slowest imports and exits with status 1 when the cumulative
+import time is over budget (ITS_IMPORT_BUDGET_MS, default 400 ms). It also
+fails if the import had side effects it should not have: starting the
+ontology load or creating the storage managers and AI tutor.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(bench_dir)
+
+# importtime lines: "import time:  self [us] | cumulative | imported package"
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+SIDE_EFFECT_CHECK = """
+import threading, {module} as m
+state = getattr(m, "ontology_status", {{}}).get("state", "pending")
+created = [name for name in ("_auth_manager", "_progress_manager", "_ai_tutor", "_static_assets")
+           if getattr(m, name, None) is not None]
+threads = [t.name for t in threading.enumerate() if t.name == "ontology-loader"]
+print("SIDE_EFFECTS", state, ",".join(created) or "-", ",".join(threads) or "-")
+"""
+
+
+def measure(module, runs):
+    """Best-of-N cumulative import time (us) and the per-module timings of that run"""
+    best = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=project_root, capture_output=True, text=True,
+            env=dict(os.environ, ITS_LOG_LEVEL="WARNING"),
+        )
+        if result.returncode != 0:
+            print(result.stderr)
+            sys.exit(2)
+        timings = []
+        for line in result.stderr.splitlines():
+            match = _LINE.match(line)
+            if match:
+                timings.append((int(match.group(2)), int(match.group(1)), match.group(4)))
+        total = next((cumulative for cumulative, _, name in timings if name == module), None)
+        if total is not None and (best is None or total < best[0]):
+            best = (total, timings)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the backend import-time budget")
+    parser.add_argument("--module", default="backend.app")
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("ITS_IMPORT_BUDGET_MS", "400")))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    total_us, timings = measure(args.module, args.runs)
+    print(f"Slowest imports for {args.module} (cumulative):")
+    for cumulative, self_time, name in sorted(timings, reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:9.1f} ms  (self {self_time / 1000:7.1f} ms)  {name}")
+
+    result = subprocess.run(
+        [sys.executable, "-c", SIDE_EFFECT_CHECK.format(module=args.module)],
+        cwd=project_root, capture_output=True, text=True, env=dict(os.environ, ITS_LOG_LEVEL="WARNING"),
+    )
+    side_effects = next((line.split()[1:] for line in result.stdout.splitlines() if line.startswith("SIDE_EFFECTS")), None)
+
+    failed = False
+    print(f"\nImport time: {total_us / 1000:.1f} ms (budget {args.budget_ms:.0f} ms, best of {args.runs})")
+    if total_us / 1000 > args.budget_ms:
+        print("FAIL: over budget")
+        failed = True
+    if side_effects is None:
+        print(f"FAIL: side-effect check did not run\n{result.stderr}")
+        failed = True
+    else:
+        state, created, threads = side_effects
+        if state != "pending" or created != "-" or threads != "-":
+            print(f"FAIL: import side effects: ontology={state} created={created} threads={threads}")
+            failed = True
+        else:
+            print("No import-time side effects (ontology, managers, tutor, static assets all lazy)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""Benchmark suite for the ontology loader, storage managers and API routes
+
+    python benchmarks/run.py                      # small tier (1k individuals, 10k records)
+    python benchmarks/run.py --tier medium        # 100k individuals / records
+    python benchmarks/run.py --tier large         # 1M individuals / records
+    python benchmarks/run.py --filter route       # only benchmarks whose name contains 'route'
+
+Synthetic data is generated once per tier under benchmarks/.data/. Results are
+saved to benchmarks/results/<tier>-<timestamp>.json and compared with the
+previous run of the same tier (or --baseline FILE); the exit status is 1 when
+a benchmark's median got slower than --threshold (default 20%).
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(bench_dir)
+sys.path.insert(0, project_root)
+sys.path.insert(0, bench_dir)
+
+import generators
+
+TIERS = {
+    "small": {"individuals": 1_000, "users": 10_000, "progress": 10_000},
+    "medium": {"individuals": 100_000, "users": 100_000, "progress": 100_000},
+    "large": {"individuals": 1_000_000, "users": 1_000_000, "progress": 1_000_000},
+}
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Register a benchmark factory: factory(ctx) -> callable to time"""
+    def register(factory):
+        BENCHMARKS.append((name, factory))
+        return factory
+    return register
+
+
+def prepare_data(tier):
+    """Generate (or reuse) the synthetic files for a tier"""
+    sizes = TIERS[tier]
+    data_dir = os.path.join(bench_dir, ".data", tier)
+    os.makedirs(data_dir, exist_ok=True)
+    files = {
+        "ontology": os.path.join(data_dir, "ontology.owl"),
+        "users": os.path.join(data_dir, "users.json"),
+        "progress": os.path.join(data_dir, "progress.json"),
+    }
+    if not os.path.exists(files["ontology"]):
+        print(f"Generating ontology with {sizes['individuals']:,} individuals...")
+        generators.write_ontology(files["ontology"], sizes["individuals"])
+    if not os.path.exists(files["users"]):
+        print(f"Generating users.json with {sizes['users']:,} students...")
+        generators.write_users(files["users"], sizes["users"])
+    if not os.path.exists(files["progress"]):
+        print(f"Generating progress.json with {sizes['progress']:,} records...")
+        generators.write_progress(files["progress"], sizes["progress"])
+    return files
+
+
+class Context:
+    """Per-run state: source files and a scratch copy for benchmarks that write"""
+
+    def __init__(self, tier, files, work_dir):
+        self.tier = tier
+        self.sizes = TIERS[tier]
+        self.files = files
+        self.work_dir = work_dir
+        self._loader = None
+        self._client = None
+
+    def scratch_copy(self, key):
+        target = os.path.join(self.work_dir, os.path.basename(self.files[key]))
+        shutil.copyfile(self.files[key], target)
+        return target
+
+    def loader(self):
+        if self._loader is None:
+            from ontology.ontology_loader import OntologyLoader
+            self._loader = OntologyLoader(self.files["ontology"])
+            self._loader.load_ontology()
+        return self._loader
+
+    def client(self):
+        """Flask test client for an app pointed at the synthetic data"""
+        if self._client is None:
+            app_data = os.path.join(self.work_dir, "app_data")
+            os.makedirs(app_data, exist_ok=True)
+            shutil.copyfile(self.files["users"], os.path.join(app_data, "users.json"))
+            shutil.copyfile(self.files["progress"], os.path.join(app_data, "progress.json"))
+            os.environ["ITS_DATA_DIR"] = app_data
+            os.environ["ITS_ONTOLOGY_PATH"] = self.files["ontology"]
+            os.environ.setdefault("ITS_LOG_LEVEL", "WARNING")
+            from backend import app as app_module
+            app_module.preload()
+            self._client = app_module.app.test_client()
+        return self._client
+
+
+# ==================== ONTOLOGY ====================
+
+@benchmark("ontology.load_ontology")
+def bench_load_ontology(ctx):
+    from ontology.ontology_loader import OntologyLoader
+
+    def run():
+        OntologyLoader(ctx.files["ontology"]).load_ontology()
+    return run
+
+
+@benchmark("ontology.get_all_shapes_with_formulas")
+def bench_shapes(ctx):
+    return ctx.loader().get_all_shapes_with_formulas
+
+
+@benchmark("ontology.get_all_students")
+def bench_students(ctx):
+    return ctx.loader().get_all_students
+
+
+# ==================== STORAGE ====================
+
+@benchmark("auth.login_user")
+def bench_login_user(ctx):
+    from backend.auth import AuthManager
+    manager = AuthManager(ctx.scratch_copy("users"))
+    # Last student in the file: worst case for the linear lookup
+    username = f"student_{ctx.sizes['users'] - 1}"
+
+    def run():
+        manager.login_user(username)
+    return run
+
+
+@benchmark("progress.save_progress")
+def bench_save_progress(ctx):
+    from backend.progress import ProgressManager
+    manager = ProgressManager(ctx.scratch_copy("progress"))
+    update = {"quiz": {"score": 2, "total": 3}, "practice": {"completed": ["ex1", "ex2"], "correct": 1}}
+
+    def run():
+        manager.save_progress("student_00000000", update)
+    return run
+
+
+# ==================== TUTOR ====================
+
+def _tutor_corpus(name):
+    def factory(ctx):
+        from backend.tutor import AITutor
+        from tutor_strategies import load_corpus
+        tutor = AITutor(name)
+        messages = [message for message, _intent in load_corpus()]
+
+        def run():
+            for message in messages:
+                tutor.classify(message)
+        return run
+    return factory
+
+
+for _matcher in ("linear", "regex", "automaton", "fuzzy"):
+    benchmark(f"tutor.classify corpus {_matcher}")(_tutor_corpus(_matcher))
+
+
+# ==================== ROUTES ====================
+
+def _route(method, path, body=None):
+    def factory(ctx):
+        client = ctx.client()
+
+        def run():
+            response = client.open(path, method=method, json=body)
+            if response.status_code >= 500:
+                raise RuntimeError(f"{method} {path} returned {response.status_code}")
+        return run
+    return factory
+
+
+for _method, _path, _body in [
+    ("GET", "/api/shapes", None),
+    ("GET", "/api/users", None),
+    ("GET", "/api/ontology/classes", None),
+    ("GET", "/api/ontology/students", None),
+    ("POST", "/api/login", {"guest": True}),
+    ("POST", "/api/login", {"username": "student_0"}),
+    ("GET", "/readyz", None),
+    ("GET", "/metrics", None),
+]:
+    _label = f"route.{_method} {_path}" + (" guest" if _body and _body.get("guest") else " named" if _body else "")
+    benchmark(_label)(_route(_method, _path, _body))
+
+
+# ==================== RUNNER ====================
+
+def time_benchmark(func, rounds, max_time):
+    """Run func at least once and up to `rounds` times within max_time seconds"""
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < rounds:
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+        if time.perf_counter() - started > max_time:
+            break
+    return {
+        "rounds": len(timings),
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "max": max(timings),
+    }
+
+
+def previous_results(tier, exclude):
+    runs = sorted(glob.glob(os.path.join(bench_dir, "results", f"{tier}-*.json")))
+    runs = [path for path in runs if os.path.abspath(path) != os.path.abspath(exclude)]
+    return runs[-1] if runs else None
+
+
+def compare(current, baseline_path, threshold):
+    """Print the median change per benchmark; return the names that regressed"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    print(f"\nCompared with {os.path.relpath(baseline_path, project_root)}:")
+    for name, result in current.items():
+        if name not in baseline or "median" not in baseline[name] or "median" not in result:
+            continue
+        change = (result["median"] - baseline[name]["median"]) / baseline[name]["median"]
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"  {name:<45} {change * 100:+7.1f}%{flag}")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the ITS benchmark suite")
+    parser.add_argument("--tier", choices=sorted(TIERS), default="small")
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--max-time", type=float, default=5.0, help="seconds per benchmark")
+    parser.add_argument("--baseline", help="results file to compare with (default: previous run)")
+    parser.add_argument("--threshold", type=float, default=0.20)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    files = prepare_data(args.tier)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="its-bench-") as work_dir:
+        ctx = Context(args.tier, files, work_dir)
+        for name, factory in BENCHMARKS:
+            if args.filter not in name:
+                continue
+            try:
+                result = time_benchmark(factory(ctx), args.rounds, args.max_time)
+                print(f"{name:<45} median {result['median'] * 1000:10.3f} ms  ({result['rounds']} rounds)")
+            except Exception as e:
+                result = {"error": f"{type(e).__name__}: {e}"}
+                print(f"{name:<45} ERROR {result['error']}")
+            results[name] = result
+
+    output = {
+        "tier": args.tier,
+        "sizes": TIERS[args.tier],
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    results_path = os.path.join(bench_dir, "results", f"{args.tier}-{datetime.now().strftime('%Y%m%dT%H%M%S')}.json")
+    if not args.no_save:
+        os.makedirs(os.path.dirname(results_path), exist_ok=True)
+        with open(results_path, "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"\nSaved {os.path.relpath(results_path, project_root)}")
+
+    baseline = args.baseline or previous_results(args.tier, results_path)
+    if baseline:
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
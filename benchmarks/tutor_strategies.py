@@ -0,0 +1,82 @@
+"""Throughput and accuracy of the tutor's keyword matchers
+
+    python benchmarks/tutor_strategies.py [--min-accuracy 0.9] [--misses]
+
+Classifies every question of benchmarks/tutor_corpus.jsonl (one
+{"message": ..., "intent": ...} per line) with each matcher of
+backend/tutor.py, then prints the accuracy against the labels, the
+throughput, and the fastest matcher whose accuracy is at least
+--min-accuracy: the one to set as ITS_TUTOR_MATCHER. Exits with status 1
+when no matcher is accurate enough.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(bench_dir)
+sys.path.insert(0, project_root)
+
+from backend.tutor import MATCHERS, AITutor
+
+CORPUS = os.path.join(bench_dir, "tutor_corpus.jsonl")
+
+
+def load_corpus(path=CORPUS):
+    """[(message, intent), ...]"""
+    with open(path, encoding="utf-8") as f:
+        return [(entry["message"], entry["intent"]) for entry in map(json.loads, f) if entry]
+
+
+def evaluate(name, corpus, min_time):
+    """Accuracy, misses and messages per second of one matcher"""
+    tutor = AITutor(name)
+    misses = [(message, intent, tutor.classify(message)) for message, intent in corpus
+              if tutor.classify(message) != intent]
+    rounds = 0
+    started = time.perf_counter()
+    while True:
+        for message, _intent in corpus:
+            tutor.classify(message)
+        rounds += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+    return {
+        "accuracy": 1 - len(misses) / len(corpus),
+        "per_second": rounds * len(corpus) / elapsed,
+        "misses": misses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the tutor's keyword matchers")
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--min-accuracy", type=float, default=0.9)
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds of timing per matcher")
+    parser.add_argument("--misses", action="store_true", help="list the misclassified questions")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    print(f"{len(corpus)} labeled questions from {os.path.relpath(args.corpus, project_root)}\n")
+    results = {}
+    for name in MATCHERS:
+        result = results[name] = evaluate(name, corpus, args.min_time)
+        print(f"  {name:<10} accuracy {result['accuracy'] * 100:5.1f}%   {result['per_second']:10,.0f} msg/s"
+              f"   ({1e6 / result['per_second']:.1f} us/msg)")
+        if args.misses:
+            for message, expected, got in result["misses"]:
+                print(f"      {message!r}: expected {expected}, got {got}")
+
+    accurate = [name for name in results if results[name]["accuracy"] >= args.min_accuracy]
+    if not accurate:
+        print(f"\nNo matcher reaches {args.min_accuracy * 100:.0f}% accuracy")
+        sys.exit(1)
+    best = max(accurate, key=lambda name: results[name]["per_second"])
+    print(f"\nFastest with accuracy >= {args.min_accuracy * 100:.0f}%: {best} (ITS_TUTOR_MATCHER={best})")
+
+
+if __name__ == "__main__":
+    main()
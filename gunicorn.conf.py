@@ -0,0 +1,42 @@
+"""Gunicorn settings for the Intelligent Tutoring System
+
+Every setting can be overridden from the environment, e.g.
+    ITS_WORKERS=8 ITS_THREADS=4 gunicorn -c gunicorn.conf.py wsgi:application
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("ITS_BIND", "0.0.0.0:5000")
+
+# Workers x threads: threads cover the blocking JSON file I/O in each worker
+workers = int(os.environ.get("ITS_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("ITS_THREADS", "4"))
+worker_class = "gthread"
+
+# Import the app (and parse the ontology) once in the master before forking
+preload_app = os.environ.get("ITS_PRELOAD", "1") != "0"
+
+# Keep-alive lets browsers reuse connections for the API calls of a page
+keepalive = int(os.environ.get("ITS_KEEPALIVE", "5"))
+timeout = int(os.environ.get("ITS_TIMEOUT", "30"))
+graceful_timeout = int(os.environ.get("ITS_GRACEFUL_TIMEOUT", "30"))
+
+# Recycle workers now and then to cap slow memory growth
+max_requests = int(os.environ.get("ITS_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.environ.get("ITS_MAX_REQUESTS_JITTER", "500"))
+
+accesslog = os.environ.get("ITS_ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.environ.get("ITS_LOG_LEVEL", "info").lower()
+
+
+def worker_exit(server, worker):
+    """Flush pending progress writes before a worker goes away"""
+    from backend import app as app_module
+    app_module.shutdown()
+
+
+def on_exit(server):
+    """Flush anything the master still holds (single-process / preload case)"""
+    from backend import app as app_module
+    app_module.shutdown()
@@ -1,10 +1,142 @@
 import os
 import xml.etree.ElementTree as ET
 import json
+import logging
 from collections import defaultdict  # Added import
+from concurrent.futures import ProcessPoolExecutor
+
+# File extensions picked up when ontology_path is a directory of modules
+ONTOLOGY_EXTENSIONS = ('.owl', '.xml', '.rdf')
+
+logger = logging.getLogger("its.ontology")
+
+def _parse_ontology_file(path):
+    """Parse a single OWL module into plain, picklable results"""
+    classes = {}
+    individuals = []
+    hierarchy = defaultdict(list)
+    
+    # Parse the XML file
+    tree = ET.parse(path)
+    root = tree.getroot()
+
+    # Define namespace
+    ns = {
+        'owl': 'http://www.w3.org/2002/07/owl#',
+        'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#',
+        'rdfs': 'http://www.w3.org/2000/01/rdf-schema#',
+        'xsd': 'http://www.w3.org/2001/XMLSchema#'
+    }
+
+    # Extract classes with hierarchy
+    for class_elem in root.findall('.//owl:Class', ns):
+        class_uri = class_elem.get('{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about')
+        if class_uri:
+            class_name = class_uri.split('#')[-1]
+
+            # Get label
+            label_elem = class_elem.find('.//rdfs:label', ns)
+            label = label_elem.text if label_elem is not None else class_name
+
+            # Get comment/description
+            comment_elem = class_elem.find('.//rdfs:comment', ns)
+            comment = comment_elem.text if comment_elem is not None else ''
+
+            # Get subclass relationships
+            subclass_elem = class_elem.find('.//rdfs:subClassOf', ns)
+            parent_class = ''
+            if subclass_elem is not None:
+                parent_resource = subclass_elem.get('{http://www.w3.org/1999/02/22-rdf-syntax-ns#}resource')
+                if parent_resource:
+                    parent_class = parent_resource.split('#')[-1]
+
+            classes[class_name] = {
+                'uri': class_uri,
+                'label': label,
+                'comment': comment,
+                'parent': parent_class,
+                'type': 'class'
+            }
+
+            # Build hierarchy
+            if parent_class:
+                hierarchy[parent_class].append(class_name)
+
+    # Extract object properties (relationships) with their domain and range
+    object_properties = {}
+    for prop_elem in root.findall('.//owl:ObjectProperty', ns):
+        prop_uri = prop_elem.get('{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about')
+        if prop_uri:
+            prop_name = prop_uri.split('#')[-1]
+            label_elem = prop_elem.find('rdfs:label', ns)
+            comment_elem = prop_elem.find('rdfs:comment', ns)
+            domain_elem = prop_elem.find('rdfs:domain', ns)
+            range_elem = prop_elem.find('rdfs:range', ns)
+            object_properties[prop_name] = {
+                'uri': prop_uri,
+                'label': label_elem.text if label_elem is not None else prop_name,
+                'comment': comment_elem.text if comment_elem is not None else '',
+                'domain': domain_elem.get('{http://www.w3.org/1999/02/22-rdf-syntax-ns#}resource', '').split('#')[-1] if domain_elem is not None else '',
+                'range': range_elem.get('{http://www.w3.org/1999/02/22-rdf-syntax-ns#}resource', '').split('#')[-1] if range_elem is not None else '',
+            }
+
+    # Extract individuals
+    for indiv_elem in root.findall('.//*[@rdf:about]', ns):
+        indiv_uri = indiv_elem.get('{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about')
+
+        # Get the type
+        type_elem = indiv_elem.find('.//rdf:type', ns)
+        if type_elem is not None:
+            type_resource = type_elem.get('{http://www.w3.org/1999/02/22-rdf-syntax-ns#}resource')
+            if type_resource:
+                type_name = type_resource.split('#')[-1]
+
+                individual = {
+                    'uri': indiv_uri,
+                    'type': type_name,
+                    'properties': {}
+                }
+
+                # Get label
+                label_elem = indiv_elem.find('.//rdfs:label', ns)
+                if label_elem is not None:
+                    individual['label'] = label_elem.text
+                else:
+                    individual['label'] = type_name
+
+                # Get comment
+                comment_elem = indiv_elem.find('.//rdfs:comment', ns)
+                if comment_elem is not None:
+                    individual['comment'] = comment_elem.text
+
+                # Get all properties
+                for prop_elem in indiv_elem:
+                    tag = prop_elem.tag
+                    if '}' in tag:
+                        prop_name = tag.split('}')[1]
+                        if prop_name not in ['type', 'label', 'comment']:
+                            # Get property value
+                            if prop_elem.text:
+                                individual['properties'][prop_name] = prop_elem.text
+                            elif '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}resource' in prop_elem.attrib:
+                                resource = prop_elem.attrib['{http://www.w3.org/1999/02/22-rdf-syntax-ns#}resource']
+                                individual['properties'][prop_name] = resource.split('#')[-1]
+                            elif '{http://www.w3.org/2001/XMLSchema#}datatype' in prop_elem.attrib:
+                                # Handle datatype properties
+                                datatype = prop_elem.attrib['{http://www.w3.org/2001/XMLSchema#}datatype']
+                                individual['properties'][prop_name] = {
+                                    'value': prop_elem.text,
+                                    'datatype': datatype
+                                }
+
+                individuals.append(individual)
+    
+    return {'classes': classes, 'individuals': individuals, 'hierarchy': dict(hierarchy),
+            'object_properties': object_properties}
+
 
 class OntologyLoader:
-    def __init__(self, ontology_path="ontology/my_ontologyIts.xml"):
+    def __init__(self, ontology_path="ontology/my_ontologyIts.xml", max_workers=None):
         # Convert to absolute path
         if not os.path.isabs(ontology_path):
             current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -12,117 +144,45 @@ class OntologyLoader:
             ontology_path = os.path.join(project_root, ontology_path)
         
         self.ontology_path = ontology_path
+        self.ontology_files = []
+        self.max_workers = max_workers
         self.classes = {}
         self.individuals = []
         self.class_hierarchy = defaultdict(list)  # Using defaultdict here
+        self.object_properties = {}
         self.loaded = False
-        print(f"OntologyLoader initialized with path: {self.ontology_path}")
+        logger.debug("OntologyLoader initialized with path: %s", self.ontology_path)
         
     def load_ontology(self):
-        """Load and parse the OWL ontology"""
+        """Load and parse the OWL ontology (a single file, a directory or a manifest)"""
         try:
             # Check if file exists
             if not os.path.exists(self.ontology_path):
-                print(f"Error: Ontology file not found at {self.ontology_path}")
+                logger.error("Ontology file not found at %s", self.ontology_path)
                 self._create_sample_data()
                 return False
             
-            # Parse the XML file
-            tree = ET.parse(self.ontology_path)
-            root = tree.getroot()
-            
-            # Define namespace
-            ns = {
-                'owl': 'http://www.w3.org/2002/07/owl#',
-                'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#',
-                'rdfs': 'http://www.w3.org/2000/01/rdf-schema#',
-                'xsd': 'http://www.w3.org/2001/XMLSchema#'
-            }
+            self.ontology_files = self._resolve_ontology_files()
+            if not self.ontology_files:
+                logger.error("No ontology modules found at %s", self.ontology_path)
+                self._create_sample_data()
+                return False
             
-            # Extract classes with hierarchy
-            for class_elem in root.findall('.//owl:Class', ns):
-                class_uri = class_elem.get('{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about')
-                if class_uri:
-                    class_name = class_uri.split('#')[-1]
-                    
-                    # Get label
-                    label_elem = class_elem.find('.//rdfs:label', ns)
-                    label = label_elem.text if label_elem is not None else class_name
-                    
-                    # Get comment/description
-                    comment_elem = class_elem.find('.//rdfs:comment', ns)
-                    comment = comment_elem.text if comment_elem is not None else ''
-                    
-                    # Get subclass relationships
-                    subclass_elem = class_elem.find('.//rdfs:subClassOf', ns)
-                    parent_class = ''
-                    if subclass_elem is not None:
-                        parent_resource = subclass_elem.get('{http://www.w3.org/1999/02/22-rdf-syntax-ns#}resource')
-                        if parent_resource:
-                            parent_class = parent_resource.split('#')[-1]
-                    
-                    self.classes[class_name] = {
-                        'uri': class_uri,
-                        'label': label,
-                        'comment': comment,
-                        'parent': parent_class,
-                        'type': 'class'
-                    }
-                    
-                    # Build hierarchy
-                    if parent_class:
-                        self.class_hierarchy[parent_class].append(class_name)
+            # Parse modules, in parallel when there is more than one
+            if len(self.ontology_files) == 1:
+                results = [_parse_ontology_file(self.ontology_files[0])]
+            else:
+                workers = min(self.max_workers or os.cpu_count() or 1, len(self.ontology_files))
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    # map() keeps file order, so the merge is deterministic
+                    results = list(executor.map(_parse_ontology_file, self.ontology_files))
             
-            # Extract individuals
-            for indiv_elem in root.findall('.//*[@rdf:about]', ns):
-                indiv_uri = indiv_elem.get('{http://www.w3.org/1999/02/22-rdf-syntax-ns#}about')
-                
-                # Get the type
-                type_elem = indiv_elem.find('.//rdf:type', ns)
-                if type_elem is not None:
-                    type_resource = type_elem.get('{http://www.w3.org/1999/02/22-rdf-syntax-ns#}resource')
-                    if type_resource:
-                        type_name = type_resource.split('#')[-1]
-                        
-                        individual = {
-                            'uri': indiv_uri,
-                            'type': type_name,
-                            'properties': {}
-                        }
-                        
-                        # Get label
-                        label_elem = indiv_elem.find('.//rdfs:label', ns)
-                        if label_elem is not None:
-                            individual['label'] = label_elem.text
-                        else:
-                            individual['label'] = type_name
-                        
-                        # Get comment
-                        comment_elem = indiv_elem.find('.//rdfs:comment', ns)
-                        if comment_elem is not None:
-                            individual['comment'] = comment_elem.text
-                        
-                        # Get all properties
-                        for prop_elem in indiv_elem:
-                            tag = prop_elem.tag
-                            if '}' in tag:
-                                prop_name = tag.split('}')[1]
-                                if prop_name not in ['type', 'label', 'comment']:
-                                    # Get property value
-                                    if prop_elem.text:
-                                        individual['properties'][prop_name] = prop_elem.text
-                                    elif '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}resource' in prop_elem.attrib:
-                                        resource = prop_elem.attrib['{http://www.w3.org/1999/02/22-rdf-syntax-ns#}resource']
-                                        individual['properties'][prop_name] = resource.split('#')[-1]
-                                    elif '{http://www.w3.org/2001/XMLSchema#}datatype' in prop_elem.attrib:
-                                        # Handle datatype properties
-                                        datatype = prop_elem.attrib['{http://www.w3.org/2001/XMLSchema#}datatype']
-                                        individual['properties'][prop_name] = {
-                                            'value': prop_elem.text,
-                                            'datatype': datatype
-                                        }
-                        
-                        self.individuals.append(individual)
+            self.classes = {}
+            self.individuals = []
+            self.class_hierarchy = defaultdict(list)
+            self.object_properties = {}
+            for result in results:
+                self._merge_parsed(result)
             
             self.loaded = True
             
@@ -132,46 +192,80 @@ class OntologyLoader:
             return True
             
         except Exception as e:
-            print(f" Error loading ontology: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error loading ontology: %s", e)
             return False
     
+    def _resolve_ontology_files(self):
+        """List the OWL modules behind ontology_path, in load order"""
+        path = self.ontology_path
+        
+        # Directory: every OWL/RDF module in it, sorted by name
+        if os.path.isdir(path):
+            return [
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.lower().endswith(ONTOLOGY_EXTENSIONS)
+            ]
+        
+        # Manifest: JSON list of module paths, relative to the manifest
+        if path.lower().endswith('.json'):
+            with open(path, 'r') as f:
+                manifest = json.load(f)
+            if isinstance(manifest, dict):
+                manifest = manifest.get('modules', [])
+            base_dir = os.path.dirname(path)
+            return [
+                module if os.path.isabs(module) else os.path.join(base_dir, module)
+                for module in manifest
+            ]
+        
+        return [path]
+    
+    def _merge_parsed(self, result):
+        """Merge one parsed module into the loader state"""
+        self.classes.update(result['classes'])
+        self.individuals.extend(result['individuals'])
+        self.object_properties.update(result.get('object_properties', {}))
+        for parent, children in result['hierarchy'].items():
+            for child in children:
+                if child not in self.class_hierarchy[parent]:
+                    self.class_hierarchy[parent].append(child)
+    
     def _print_ontology_summary(self):
-        """Print detailed ontology summary"""
-        print("\n" + "="*60)
-        print("  ONTOLOGY LOADED SUCCESSFULLY")
-        print("="*60)
+        """Log detailed ontology summary (DEBUG only; skipped entirely otherwise)"""
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        
+        lines = ["ONTOLOGY LOADED SUCCESSFULLY"]
         
-        print(f"\n  STATISTICS:")
-        print(f"   Total Classes: {len(self.classes)}")
-        print(f"   Total Individuals: {len(self.individuals)}")
+        lines.append("STATISTICS:")
+        lines.append(f"   Total Classes: {len(self.classes)}")
+        lines.append(f"   Total Individuals: {len(self.individuals)}")
         
-        print(f"\n  CLASS HIERARCHY:")
+        lines.append("CLASS HIERARCHY:")
         for parent, children in self.class_hierarchy.items():
-            print(f"   {parent}: {', '.join(children)}")
+            lines.append(f"   {parent}: {', '.join(children)}")
         
-        print(f"\n USER-RELATED CLASSES:")
+        lines.append("USER-RELATED CLASSES:")
         user_classes = [c for c in self.classes.keys() if 'user' in c.lower() or 'student' in c.lower() or 'tutor' in c.lower()]
         for cls in user_classes:
             info = self.classes[cls]
-            print(f"   • {cls}: {info.get('label', '')} - {info.get('comment', '')[:50]}...")
+            lines.append(f"   • {cls}: {info.get('label', '')} - {info.get('comment', '')[:50]}...")
         
-        print(f"\n📐 GEOMETRY-RELATED CLASSES:")
+        lines.append("GEOMETRY-RELATED CLASSES:")
         geometry_classes = [c for c in self.classes.keys() if 'shape' in c.lower() or 'cube' in c or 'sphere' in c or 'formula' in c.lower()]
         for cls in geometry_classes:
             info = self.classes[cls]
-            print(f"   • {cls}: {info.get('label', '')}")
+            lines.append(f"   • {cls}: {info.get('label', '')}")
         
-        print(f"\n INDIVIDUALS BY CATEGORY:")
+        lines.append("INDIVIDUALS BY CATEGORY:")
         categories = defaultdict(list)  # Using defaultdict here
         for ind in self.individuals:
             categories[ind['type']].append(ind['label'])
         
         for category, items in categories.items():
-            print(f"   {category} ({len(items)}): {', '.join(items[:3])}{'...' if len(items) > 3 else ''}")
+            lines.append(f"   {category} ({len(items)}): {', '.join(items[:3])}{'...' if len(items) > 3 else ''}")
         
-        print("="*60)
+        logger.debug("\n".join(lines))
     
     def get_classes_by_category(self, category):
         """Get classes by category"""
@@ -190,6 +284,12 @@ class OntologyLoader:
             return [self.classes[cls] for cls in categories[category] if cls in self.classes]
         return []
     
+    def get_object_property(self, name):
+        """A relationship (e.g. convertsToStudent) with its domain and range classes, or None"""
+        if not self.loaded:
+            return None
+        return self.object_properties.get(name)
+    
     def get_all_students(self):
         """Get all Student individuals with detailed info"""
         if not self.loaded:
@@ -345,7 +445,7 @@ class OntologyLoader:
         if not self.loaded:
             return None
         
-        print("\n Searching for AI Tutor...")
+        logger.debug("Searching for AI Tutor")
         
         # Multiple search strategies
         search_patterns = [
@@ -360,7 +460,7 @@ class OntologyLoader:
             for field, pattern in search_patterns:
                 value = individual.get(field, '').lower()
                 if pattern.lower() in value:
-                    print(f"Found AI Tutor by {field}: {individual.get('label')}")
+                    logger.debug("Found AI Tutor by %s: %s", field, individual.get('label'))
                     
                     tutor_data = {
                         'name': individual.get('label', 'AI Tutor'),
@@ -371,12 +471,11 @@ class OntologyLoader:
                         'from_ontology': True
                     }
                     
-                    print(f"   Name: {tutor_data['name']}")
-                    print(f"   Specialization: {tutor_data['specialization']}")
+                    logger.debug("AI Tutor name: %s, specialization: %s", tutor_data['name'], tutor_data['specialization'])
                     
                     return tutor_data
         
-        print("AI Tutor not found in individuals, checking if we should create from known structure")
+        logger.debug("AI Tutor not found in individuals, using the known structure")
         
         # If not found but we know it should exist
         return {
@@ -407,7 +506,7 @@ class OntologyLoader:
     
     def _create_sample_data(self):
         """Create sample data if ontology loading fails"""
-        print("⚠️ Creating sample ontology data...")
+        logger.warning("Creating sample ontology data")
         self.classes = {
             'Student': {'uri': '#Student', 'label': 'Student', 'type': 'class'},
             'GuestUser': {'uri': '#GuestUser', 'label': 'Guest User', 'type': 'class'},
@@ -437,4 +536,4 @@ class OntologyLoader:
         ]
         
         self.loaded = True
-        print("Sample ontology data created successfully")
\ No newline at end of file
+        logger.debug("Sample ontology data created")
\ No newline at end of file
@@ -42,4 +42,5 @@ except Exception as e:
     print("1. Install required packages: pip install flask flask-cors owlready2")
     print("2. Make sure all files are in correct locations")
     print("3. Check if port 5000 is already in use")
-    input("\nPress Enter to exit...")
\ No newline at end of file
+    if sys.stdin.isatty():
+        input("\nPress Enter to exit...")
\ No newline at end of file
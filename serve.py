@@ -0,0 +1,92 @@
+"""Production launcher for the Intelligent Tutoring System
+
+Uses gunicorn (Linux/macOS) with the settings in gunicorn.conf.py and falls
+back to waitress (Windows, or when gunicorn is not installed).
+
+    python serve.py --workers 4 --threads 8 --port 5000
+"""
+import argparse
+import os
+import runpy
+import signal
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the ITS API with a production server")
+    parser.add_argument("--host", default=os.environ.get("ITS_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("ITS_PORT", "5000")))
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (gunicorn only)")
+    parser.add_argument("--threads", type=int, default=None, help="threads per worker")
+    parser.add_argument("--keepalive", type=int, default=None, help="keep-alive timeout in seconds")
+    parser.add_argument("--no-preload", action="store_true", help="import the app in each worker instead of once")
+    parser.add_argument("--server", choices=["auto", "gunicorn", "waitress"], default="auto")
+    return parser.parse_args()
+
+
+def run_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    class ITSApplication(BaseApplication):
+        def load_config(self):
+            config = runpy.run_path(os.path.join(current_dir, "gunicorn.conf.py"))
+            for key, value in config.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+            self.cfg.set("bind", f"{args.host}:{args.port}")
+            if args.workers:
+                self.cfg.set("workers", args.workers)
+            if args.threads:
+                self.cfg.set("threads", args.threads)
+            if args.keepalive is not None:
+                self.cfg.set("keepalive", args.keepalive)
+            if args.no_preload:
+                self.cfg.set("preload_app", False)
+
+        def load(self):
+            from wsgi import application
+            return application
+
+    ITSApplication().run()
+
+
+def run_waitress(args):
+    from waitress import serve
+    from wsgi import application
+    from backend import app as app_module
+
+    # waitress runs a single process, so flush on SIGTERM/SIGINT ourselves
+    def stop(signum, frame):
+        app_module.shutdown()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"Serving on http://{args.host}:{args.port} (waitress, {args.threads or 8} threads)")
+    serve(
+        application,
+        host=args.host,
+        port=args.port,
+        threads=args.threads or 8,
+        channel_timeout=args.keepalive or 30,
+    )
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = args.server
+    if server == "auto":
+        try:
+            import gunicorn  # noqa: F401
+            server = "gunicorn" if os.name != "nt" else "waitress"
+        except ImportError:
+            server = "waitress"
+
+    if server == "gunicorn":
+        run_gunicorn(args)
+    else:
+        run_waitress(args)
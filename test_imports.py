@@ -26,4 +26,5 @@ for module_name, file_path in modules_to_test:
         print(f"✗ {module_name} error: {type(e).__name__}: {e}")
 
 print("-" * 50)
-input("Press Enter to continue...")
\ No newline at end of file
+if sys.stdin.isatty():
+    input("Press Enter to continue...")
\ No newline at end of file
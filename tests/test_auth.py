@@ -0,0 +1,55 @@
+"""AuthManager storage in users.json"""
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.auth import AuthManager
+
+
+def _login_many(users_file, worker, count):
+    manager = AuthManager(users_file)
+    for index in range(count):
+        manager.login_user(f"student_{worker}_{index}")
+
+
+class UsersFileTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.users_file = os.path.join(self.tmp.name, "users.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_concurrent_workers_keep_every_login(self):
+        AuthManager(self.users_file)
+        workers = [multiprocessing.Process(target=_login_many, args=(self.users_file, worker, 20)) for worker in range(4)]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+        with open(self.users_file) as f:
+            users = json.load(f)
+        # Two sample students plus every new one, each with a session
+        self.assertEqual(len(users["students"]), 2 + 4 * 20)
+        self.assertEqual(len(users["sessions"]), 4 * 20)
+
+    def test_corrupt_file_raises_instead_of_reading_as_empty(self):
+        manager = AuthManager(self.users_file)
+        with open(self.users_file, "w") as f:
+            f.write('{"students": [')
+        with self.assertRaises(ValueError):
+            manager.load_users()
+
+    def test_missing_file_has_no_users(self):
+        manager = AuthManager(self.users_file)
+        os.remove(self.users_file)
+        self.assertEqual(manager.load_users(), {"students": [], "guests": [], "sessions": []})
+
+
+if __name__ == "__main__":
+    unittest.main()
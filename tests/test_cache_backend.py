@@ -0,0 +1,78 @@
+"""Cache backends and the cross-node lock"""
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.cache_backend import CacheError, HashRing, LocalBackend, ShardedBackend
+
+
+class DeleteIfTest(unittest.TestCase):
+    def test_deletes_only_the_expected_value(self):
+        cache = LocalBackend()
+        cache.set("k", "mine")
+        self.assertFalse(cache.delete_if("k", "theirs"))
+        self.assertEqual(cache.get("k"), "mine")
+        self.assertTrue(cache.delete_if("k", "mine"))
+        self.assertIsNone(cache.get("k"))
+        self.assertFalse(cache.delete_if("k", "mine"))
+
+    def test_namespace_and_shards_forward_it(self):
+        backend = LocalBackend()
+        tenant = backend.namespace("school1:")
+        tenant.set("k", "v")
+        self.assertFalse(backend.delete_if("k", "v"))
+        self.assertTrue(tenant.delete_if("k", "v"))
+        sharded = ShardedBackend({"a": LocalBackend(), "b": LocalBackend()})
+        sharded.set("k", "v")
+        self.assertTrue(sharded.delete_if("k", "v"))
+        self.assertIsNone(sharded.get("k"))
+
+
+class CacheLockTest(unittest.TestCase):
+    def test_expired_lock_taken_by_another_holder_is_not_released(self):
+        cache = LocalBackend()
+        with cache.lock("progress:s1", ttl=0.05):
+            time.sleep(0.1)  # expired; another node takes it
+            self.assertTrue(cache.add("lock:progress:s1", "other-node", 10))
+        self.assertEqual(cache.get("lock:progress:s1"), "other-node")
+
+    def test_lock_serializes_read_modify_write(self):
+        cache = LocalBackend()
+        cache.set("counter", "0")
+
+        def bump():
+            for _ in range(50):
+                with cache.lock("counter"):
+                    cache.set("counter", str(int(cache.get("counter")) + 1))
+
+        threads = [threading.Thread(target=bump) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.get("counter"), "200")
+
+    def test_wait_times_out(self):
+        cache = LocalBackend()
+        with cache.lock("busy"):
+            with self.assertRaises(CacheError):
+                with cache.lock("busy", wait=0.05):
+                    pass
+
+
+class HashRingTest(unittest.TestCase):
+    def test_removing_a_node_moves_only_its_keys(self):
+        ring = HashRing(["a", "b", "c"])
+        before = {key: ring.node_for(key) for key in map(str, range(300))}
+        ring.remove("c")
+        for key, node in before.items():
+            if node != "c":
+                self.assertEqual(ring.node_for(key), node)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""Event log: validation, snapshots and replay"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.events import EventStore, check_event
+from backend.mastery import MasteryMatrix
+
+QUIZ = {"quiz": {"score": 2, "total": 4, "questions": [{"topic": "cube_volume", "correct": True},
+                                                      {"topic": "cube_volume", "correct": False}]}}
+
+
+class CheckEventTest(unittest.TestCase):
+    def test_rejects_non_finite_numbers(self):
+        event = {"ts": "2026-01-01T00:00:00", "type": "quiz", "user_id": "u", "score": float("nan"), "total": 3}
+        self.assertIsNotNone(check_event(event))
+        event["score"] = float("inf")
+        self.assertIsNotNone(check_event(event))
+        event["score"] = 1
+        self.assertIsNone(check_event(event))
+
+    def test_rejects_booleans_and_unknown_types(self):
+        self.assertIsNotNone(check_event({"ts": "t", "type": "quiz", "user_id": "u", "score": True, "total": 3}))
+        self.assertIsNotNone(check_event({"ts": "t", "type": "nope", "user_id": "u"}))
+        self.assertIsNotNone(check_event(5))
+
+
+class EventStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log_file = os.path.join(self.tmp.name, "events.ndjson")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _store(self, snapshot_every=0):
+        mastery = MasteryMatrix()
+        return EventStore(self.log_file, snapshot_every=snapshot_every, projections={"mastery": mastery}), mastery
+
+    def test_aggregates_and_projection_follow_the_log(self):
+        store, mastery = self._store()
+        store.record_updates([("s1", QUIZ), ("s1", QUIZ), ("s2", {"practice": {"completed": 3, "correct": 2}})])
+        self.assertEqual(store.user_aggregates("s1")["quiz"]["quizzes"], 2)
+        self.assertEqual(store.user_aggregates("s2")["practice"]["correct"], 2)
+        self.assertEqual(mastery.user_topics("s1")["cube_volume"]["attempts"], 4)
+
+    def test_restart_replays_the_tail_after_the_snapshot(self):
+        store, _ = self._store()
+        store.record_progress_update("s1", QUIZ)
+        store.snapshot()
+        store.record_progress_update("s1", QUIZ)  # only in the log
+        with open(store.snapshot_file) as f:
+            self.assertEqual(json.load(f)["events"], 1)
+
+        restarted, mastery = self._store()
+        self.assertEqual(restarted.events_seen, 2)
+        self.assertEqual(restarted.user_aggregates("s1")["quiz"]["quizzes"], 2)
+        self.assertEqual(mastery.user_topics("s1")["cube_volume"]["attempts"], 4)
+
+    def test_restart_without_snapshot_replays_everything(self):
+        store, _ = self._store()
+        store.record_progress_update("s1", QUIZ)
+        restarted, _ = self._store()
+        self.assertEqual(restarted.user_aggregates("s1")["quiz"]["quizzes"], 1)
+
+    def test_bad_lines_are_skipped(self):
+        store, _ = self._store()
+        with open(self.log_file, "a") as f:
+            f.write('{"ts": "t", "type": "quiz", "user_id": "s1", "score": "x", "total": 3}\n')
+            f.write("not json\n")
+        store.record_progress_update("s1", QUIZ)
+        self.assertEqual(store.user_aggregates("s1")["quiz"]["quizzes"], 1)
+
+    def test_failed_projection_is_rebuilt(self):
+        store, mastery = self._store()
+        store.record_progress_update("s1", QUIZ)
+        fold_events = mastery.fold_events
+        calls = []
+
+        def fail_once(events):
+            calls.append(len(events))
+            if len(calls) == 1:
+                raise RuntimeError("boom")
+            fold_events(events)
+
+        mastery.fold_events = fail_once
+        with self.assertLogs("its.events", "ERROR"):
+            store.record_progress_update("s1", QUIZ)
+        # Rebuilt from the log: both quizzes, each counted once
+        self.assertEqual(mastery.user_topics("s1")["cube_volume"]["attempts"], 4)
+
+    def test_periodic_snapshot(self):
+        store, _ = self._store(snapshot_every=2)
+        store.record_updates([("s1", QUIZ), ("s2", QUIZ)])
+        with open(store.snapshot_file) as f:
+            self.assertEqual(json.load(f)["offset"], os.path.getsize(self.log_file))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Guest tokens: saving, conversion and revocation"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.auth import AuthManager
+from backend.cache_backend import LocalBackend
+from backend.guests import GuestTokens
+
+
+class GuestLifecycleTest(unittest.TestCase):
+    cache = None
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tokens = GuestTokens("test-secret", "its-guest:test")
+        self.auth = AuthManager(os.path.join(self.tmp.name, "users.json"), self.cache, guest_tokens=self.tokens)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _guest(self):
+        guest = self.auth.create_guest_user()
+        return guest["user_id"], guest["session_id"]
+
+    def test_token_guest_is_stored_on_first_save_only(self):
+        guest_id, token = self._guest()
+        self.assertEqual(self.auth.get_session(token)["user_id"], guest_id)
+        self.assertNotIn(guest_id, [guest["id"] for guest in self.auth.load_users()["guests"]])
+        self.assertTrue(self.auth.materialize_guest(guest_id))
+        self.assertFalse(self.auth.materialize_guest(guest_id))
+        self.assertIn(guest_id, [guest["id"] for guest in self.auth.load_users()["guests"]])
+
+    def test_forged_token_is_rejected(self):
+        forged = GuestTokens("other-secret", "its-guest:test").issue("guest_deadbeef")
+        self.assertIsNone(self.auth.get_session(forged))
+        self.assertFalse(self.auth.known_session(forged))
+
+    def test_conversion_revokes_the_token(self):
+        guest_id, token = self._guest()
+        self.auth.materialize_guest(guest_id)
+        user = self.auth.convert_guest(guest_id, "new_student")
+        self.assertEqual(user["converted_from"], guest_id)
+        users = self.auth.load_users()
+        self.assertNotIn(guest_id, [guest["id"] for guest in users["guests"]])
+
+        self.assertTrue(self.auth.is_converted(guest_id))
+        self.assertIsNone(self.auth.get_session(token))
+        self.assertFalse(self.auth.known_session(token))
+        # The old token can neither bring the guest back nor convert it again
+        self.assertFalse(self.auth.materialize_guest(guest_id))
+        self.assertNotIn(guest_id, [guest["id"] for guest in self.auth.load_users()["guests"]])
+        self.assertIsNone(self.auth.convert_guest(guest_id, "another_student"))
+        self.assertEqual(len(self.auth.load_users()["students"]), len(users["students"]))
+
+    def test_other_guests_keep_working(self):
+        guest_id, _ = self._guest()
+        other_id, other_token = self._guest()
+        self.auth.convert_guest(guest_id, "new_student")
+        self.assertEqual(self.auth.get_session(other_token)["user_id"], other_id)
+
+
+class SharedCacheGuestLifecycleTest(GuestLifecycleTest):
+    def setUp(self):
+        self.cache = LocalBackend()
+        super().setUp()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+"""ProgressManager storage in progress.json"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.progress import ProgressManager
+
+
+def _save_many(progress_file, worker, count):
+    manager = ProgressManager(progress_file)
+    for _ in range(count):
+        manager.save_progress(f"student_{worker}", {"quiz": {"score": 1, "total": 2}})
+        manager.save_progress("shared", {"quiz": {"score": 2, "total": 2}})
+
+
+class ProgressFileTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.progress_file = os.path.join(self.tmp.name, "progress.json")
+        self.manager = ProgressManager(self.progress_file)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _quizzes(self, user_id):
+        return self.manager.load_progress()[user_id]["quiz"]["total_quizzes"]
+
+    def test_concurrent_workers_keep_every_save(self):
+        workers = [multiprocessing.Process(target=_save_many, args=(self.progress_file, worker, 15)) for worker in range(4)]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+        for worker in range(4):
+            self.assertEqual(self._quizzes(f"student_{worker}"), 15)
+        self.assertEqual(self._quizzes("shared"), 4 * 15)
+
+    def test_concurrent_threads_keep_every_save(self):
+        def save():
+            for _ in range(20):
+                self.manager.save_progress("shared", {"practice": {"completed": 1, "correct": 1}})
+        threads = [threading.Thread(target=save) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.manager.load_progress()["shared"]["practice"]["completed_exercises"], 80)
+
+    def test_corrupt_file_raises_instead_of_reading_as_empty(self):
+        with open(self.progress_file, "w") as f:
+            f.write('{"john_math": {')
+        with self.assertRaises(ValueError):
+            self.manager.load_progress()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+"""Validation of bulk and single progress updates"""
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import progress_bulk
+
+
+class FakeManager:
+    def __init__(self):
+        self.updates = []
+
+    def apply_updates(self, updates):
+        self.updates.extend(updates)
+
+
+class ValidateUpdateTest(unittest.TestCase):
+    def test_rejects_non_finite_numbers(self):
+        for value in (float("nan"), float("inf"), float("-inf")):
+            self.assertIsNotNone(progress_bulk.validate_update({"quiz": {"score": value, "total": 3}}))
+            self.assertIsNotNone(progress_bulk.validate_update({"quiz": {"score": 1, "total": value}}))
+
+    def test_rejects_booleans(self):
+        self.assertIsNotNone(progress_bulk.validate_update({"quiz": {"score": True, "total": 3}}))
+        self.assertIsNotNone(progress_bulk.validate_update({"practice": {"completed": True, "correct": 0}}))
+        self.assertIsNotNone(progress_bulk.validate_update({"practice": {"completed": 2, "correct": False}}))
+
+    def test_accepts_valid_update(self):
+        self.assertIsNone(progress_bulk.validate_update({"quiz": {"score": 2, "total": 3}}))
+        self.assertIsNone(progress_bulk.validate_update({"practice": {"completed": [1, 2], "correct": 1}}))
+
+
+class ImportStreamTest(unittest.TestCase):
+    def test_non_object_lines_are_rejected_one_by_one(self):
+        body = '5\n[1,2]\n"x"\nnull\n{"user_id": "s1", "quiz": {"score": 2, "total": 3}}\n'
+        manager = FakeManager()
+        summary = progress_bulk.import_stream(manager, io.StringIO(body))
+        self.assertEqual(summary["applied"], 1)
+        self.assertEqual(summary["rejected"], 4)
+        self.assertEqual([error["line"] for error in summary["errors"]], [1, 2, 3, 4])
+        self.assertEqual(manager.updates, [("s1", {"quiz": {"score": 2, "total": 3}})])
+
+    def test_guest_records_are_rejected(self):
+        body = '{"user_id": "guest_1a2b3c4d", "quiz": {"score": 2, "total": 3}}\n'
+        manager = FakeManager()
+        summary = progress_bulk.import_stream(manager, io.StringIO(body))
+        self.assertEqual((summary["applied"], summary["rejected"]), (0, 1))
+        self.assertEqual(manager.updates, [])
+
+    def test_nan_and_infinity_lines_are_rejected(self):
+        body = ('{"user_id": "s1", "quiz": {"score": NaN, "total": 3}}\n'
+                '{"user_id": "s2", "quiz": {"score": 1, "total": Infinity}}\n'
+                '{"user_id": "s3", "quiz": {"score": true, "total": 3}}\n')
+        summary = progress_bulk.import_stream(FakeManager(), io.StringIO(body))
+        self.assertEqual((summary["applied"], summary["rejected"]), (0, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+"""Live update bus behind the server-sent event streams"""
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import pubsub
+
+
+class BusTest(unittest.TestCase):
+    def setUp(self):
+        self.bus = pubsub.Bus(history=10000)
+
+    def test_concurrent_publishers_are_delivered_in_id_order(self):
+        subscription = self.bus.subscribe("progress")
+
+        def publish():
+            for index in range(200):
+                self.bus.publish("progress", {"n": index})
+
+        threads = [threading.Thread(target=publish) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        ids = [message[0] for message in subscription.wait(0)]
+        self.assertEqual(len(ids), min(8 * 200, pubsub.SUBSCRIBER_BUFFER))
+        self.assertEqual(ids, sorted(ids))
+        subscription.close()
+
+    def test_reconnect_replays_only_missed_messages(self):
+        first = self.bus.publish("progress", {"n": 1})
+        second = self.bus.publish("progress", {"n": 2})
+        subscription = self.bus.subscribe("progress", last_id=first)
+        self.assertEqual([message[0] for message in subscription.wait(0)], [second])
+        subscription.close()
+
+    def test_filter_and_unsubscribe(self):
+        subscription = self.bus.subscribe("progress", accept=lambda data: data["user_id"] == "s1")
+        self.bus.publish("progress", {"user_id": "s2"})
+        self.bus.publish("progress", {"user_id": "s1"})
+        self.assertEqual([message[2] for message in subscription.wait(0)], [{"user_id": "s1"}])
+        subscription.close()
+        self.assertEqual(self.bus.subscriber_count("progress"), 0)
+
+    def test_event_ids_name_this_process(self):
+        message_id = self.bus.publish("progress", {"n": 1})
+        frame = pubsub.format_sse((message_id, "progress", {"n": 1}), source=self.bus)
+        event_id = frame.split("\n", 1)[0][len("id: "):]
+        self.assertEqual(self.bus.parse_event_id(event_id), message_id)
+        self.assertIsNone(self.bus.parse_event_id(f"other-{message_id}"))
+        self.assertIsNone(pubsub.Bus().parse_event_id(event_id))
+
+
+if __name__ == "__main__":
+    unittest.main()
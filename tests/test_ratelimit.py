@@ -0,0 +1,98 @@
+"""Rate limits and admission control"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import ratelimit
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_burst_then_refill(self):
+        bucket = ratelimit.TokenBucket(rate=2.0, burst=2)
+        now = bucket.updated
+        self.assertEqual(bucket.take(now), 0)
+        self.assertEqual(bucket.take(now), 0)
+        self.assertAlmostEqual(bucket.take(now), 0.5)
+        self.assertEqual(bucket.take(now + 0.5), 0)
+
+    def test_parse_limits(self):
+        self.assertEqual(ratelimit.parse_limits("guest=10/60, login=5,off=0/1"), {"guest": (10, 60.0), "login": (5, 1.0)})
+
+
+class RouteLimitsTest(unittest.TestCase):
+    def test_client_limit_is_per_client(self):
+        limits = ratelimit.RouteLimits({"guest": (2, 60)}, {}, 0)
+        for _ in range(2):
+            with limits.admit("guest", "10.0.0.1"):
+                pass
+        with self.assertRaises(ratelimit.RateLimited) as caught:
+            limits.admit("guest", "10.0.0.1")
+        self.assertEqual(caught.exception.reason, "client")
+        self.assertGreaterEqual(caught.exception.retry_after, 1)
+        with limits.admit("guest", "10.0.0.2"):
+            pass
+
+    def test_route_limit_covers_every_client(self):
+        limits = ratelimit.RouteLimits({}, {"login": (3, 60)}, 0)
+        for index in range(3):
+            with limits.admit("login", f"10.0.0.{index}"):
+                pass
+        with self.assertRaises(ratelimit.RateLimited) as caught:
+            limits.admit("login", "10.0.0.9")
+        self.assertEqual(caught.exception.reason, "route")
+
+    def test_in_flight_cap_and_release(self):
+        limits = ratelimit.RouteLimits({}, {}, 1)
+        admitted = limits.admit("login", "10.0.0.1")
+        with self.assertRaises(ratelimit.RateLimited) as caught:
+            limits.admit("login", "10.0.0.2")
+        self.assertEqual(caught.exception.reason, "in_flight")
+        with admitted:
+            pass
+        with limits.admit("login", "10.0.0.2"):
+            pass
+
+    def test_unlisted_route_is_not_limited(self):
+        limits = ratelimit.RouteLimits({"guest": (1, 60)}, {"guest": (1, 60)}, 0)
+        for _ in range(5):
+            with limits.admit("progress", "10.0.0.1"):
+                pass
+
+
+class ClientKeyTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        try:
+            from backend import app
+        except ImportError as e:
+            raise unittest.SkipTest(f"backend.app needs its dependencies: {e}")
+        cls.app = app
+
+    def setUp(self):
+        self.saved = self.app.trust_forwarded, self.app.rate_limit_key
+        self.app.rate_limit_key = "address"
+
+    def tearDown(self):
+        self.app.trust_forwarded, self.app.rate_limit_key = self.saved
+
+    def test_forwarded_for_is_ignored_unless_trusted(self):
+        self.app.trust_forwarded = 0
+        self.assertEqual(self.app.client_key("10.0.0.1", "203.0.113.7"), "10.0.0.1")
+
+    def test_client_cannot_pick_its_own_key(self):
+        self.app.trust_forwarded = 1
+        # The client sent "1.2.3.4"; our one proxy appended the address it saw
+        self.assertEqual(self.app.client_key("10.0.0.1", "1.2.3.4, 203.0.113.7"), "203.0.113.7")
+        self.assertEqual(self.app.client_key("10.0.0.1", "5.6.7.8, 203.0.113.7"), "203.0.113.7")
+
+    def test_hop_count(self):
+        self.app.trust_forwarded = 2
+        self.assertEqual(self.app.client_key("10.0.0.1", "1.2.3.4, 203.0.113.7, 10.0.0.2"), "203.0.113.7")
+        # Fewer entries than proxies: not what our proxies send, so the peer address is used
+        self.assertEqual(self.app.client_key("10.0.0.1", "203.0.113.7"), "10.0.0.1")
+
+
+if __name__ == "__main__":
+    unittest.main()
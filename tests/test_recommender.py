@@ -0,0 +1,32 @@
+"""Exercise item banks and the recommender"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import exercises
+from backend.recommender import ItemBank, Recommender
+
+
+class DistinctExercisesTest(unittest.TestCase):
+    def test_small_bank_indexes_each_exercise_once(self):
+        bank = ItemBank.build(per_level=50)
+        for ids in bank.index.values():
+            questions = [bank.item(item_id)["question"] for item_id in ids]
+            self.assertEqual(len(questions), len(set(questions)))
+
+    @unittest.skipIf(exercises.np is None, "NumPy is not installed")
+    def test_generated_bank_keeps_each_parameter_set_once(self):
+        with tempfile.TemporaryDirectory() as directory:
+            bank = exercises.load_or_generate(os.path.join(directory, "bank"), per_level=500)
+            # cube_volume at level 1 has a side of 2..5: four exercises, not 500
+            self.assertEqual(len(bank.candidates("cube_volume", 1)), 4)
+            items = Recommender(bank).recommend("student_001", 20)
+            self.assertEqual(len({item["question"] for item in items}), len(items))
+            del bank
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,249 @@
+"""Classroom load test: many students logging in, browsing shapes and submitting quizzes
+
+Each simulated student runs one scenario against the API:
+    login (guest via create_guest_user, or a named student)
+    GET /api/shapes
+    GET /api/progress/<user_id> for the quizzes already saved
+    POST /api/progress/<user_id> once per quiz
+    GET /api/progress/<user_id> to check that every quiz was recorded
+
+Arrivals are spread over --window seconds. By default a local server is
+started with serve.py on a scratch copy of data/, so nothing external is
+needed and the real data files are untouched:
+
+    python tools/classroom_load.py --students 500 --concurrency 50 --window 60
+    python tools/classroom_load.py --url http://localhost:5000 --students 100
+
+The report gives p50/p95/p99 latency per operation, HTTP/network errors,
+requests turned away with 429 (counted apart from errors) and lost writes
+(saves acknowledged with a 2xx but missing from the read-back progress). The local
+server runs without rate limits unless ITS_RATE_LIMITS / ITS_ADMISSION_LIMITS
+are set: a classroom behind one address is exactly what they throttle.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+tools_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(tools_dir)
+sys.path.insert(0, tools_dir)
+
+from load_test import percentile
+
+
+class Stats:
+    """Latencies and error counts per operation, shared by the student threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.rate_limited = defaultdict(int)
+        self.submitted = 0
+        self.lost_writes = 0
+        self.students_done = 0
+
+    def record(self, operation, elapsed, ok, status=None):
+        with self.lock:
+            self.latencies[operation].append(elapsed)
+            if status == 429:
+                self.rate_limited[operation] += 1
+            elif not ok:
+                self.errors[operation] += 1
+
+
+class Client:
+    """Keep-alive JSON client for one simulated student"""
+
+    def __init__(self, base_url, stats):
+        parsed = urlparse(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.stats = stats
+        self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        # Sent as X-Session-ID once logged in (guests need it to save progress)
+        self.session_id = None
+        self.last_status = None
+
+    def call(self, operation, method, path, body=None):
+        headers = {"Connection": "keep-alive"}
+        if self.session_id:
+            headers["X-Session-ID"] = self.session_id
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        start = time.perf_counter()
+        status = None
+        try:
+            self.conn.request(method, path, body=payload, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            status = response.status
+            ok = status < 400
+            result = json.loads(data) if ok and data else None
+        except (OSError, http.client.HTTPException, ValueError):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            ok, result = False, None
+        self.last_status = status
+        self.stats.record(operation, time.perf_counter() - start, ok, status)
+        return result
+
+    def close(self):
+        self.conn.close()
+
+
+def _quiz_count(body):
+    return body.get("progress", {}).get("quiz", {}).get("total_quizzes", 0)
+
+
+def run_student(index, args, stats, start_at):
+    """One student's scenario, started at its arrival time"""
+    delay = start_at - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+
+    rng = random.Random(index)
+    client = Client(args.url, stats)
+    try:
+        if rng.random() < args.guest_ratio:
+            user = client.call("login guest", "POST", "/api/login", {"guest": True})
+        else:
+            user = client.call("login named", "POST", "/api/login", {"username": f"loadtest_student_{index}"})
+        if not user or "user_id" not in user:
+            return
+        client.session_id = user.get("session_id")
+
+        client.call("shapes", "GET", "/api/shapes")
+
+        user_id = user["user_id"]
+        # A named student may already have quizzes on a --url server (an earlier run): count from there
+        before = client.call("read progress", "GET", f"/api/progress/{user_id}")
+        acknowledged = 0
+        for _ in range(args.quizzes):
+            saved = client.call("save progress", "POST", f"/api/progress/{user_id}",
+                                {"quiz": {"score": rng.randint(0, 3), "total": 3}})
+            # Only a 2xx reply promises the save; a 429 or an error never claimed it
+            if saved is not None and client.last_status // 100 == 2:
+                acknowledged += 1
+        with stats.lock:
+            stats.submitted += acknowledged
+
+        progress = client.call("read progress", "GET", f"/api/progress/{user_id}")
+        if before is not None and progress is not None:
+            recorded = _quiz_count(progress) - _quiz_count(before)
+            with stats.lock:
+                stats.lost_writes += max(0, acknowledged - recorded)
+    finally:
+        client.close()
+        with stats.lock:
+            stats.students_done += 1
+
+
+def wait_until_ready(url, timeout):
+    parsed = urlparse(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=2)
+            conn.request("GET", "/readyz")
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def start_local_server(args, data_dir):
+    """Start serve.py on a scratch copy of data/"""
+    for name in ("users.json", "progress.json"):
+        source = os.path.join(project_root, "data", name)
+        if os.path.exists(source):
+            shutil.copyfile(source, os.path.join(data_dir, name))
+    env = dict(os.environ, ITS_DATA_DIR=data_dir, ITS_LOG_LEVEL=os.environ.get("ITS_LOG_LEVEL", "WARNING"))
+    # Every simulated student comes from 127.0.0.1: the default limits would turn most of them away
+    env.setdefault("ITS_RATE_LIMITS", "")
+    env.setdefault("ITS_ADMISSION_LIMITS", "")
+    env.setdefault("ITS_ADMISSION_MAX_IN_FLIGHT", "0")
+    command = [sys.executable, os.path.join(project_root, "serve.py"), "--host", "127.0.0.1",
+               "--port", str(args.port), "--server", args.server]
+    if args.workers:
+        command += ["--workers", str(args.workers)]
+    if args.threads:
+        command += ["--threads", str(args.threads)]
+    return subprocess.Popen(command, env=env, cwd=project_root)
+
+
+def report(stats, elapsed, args):
+    print(f"\nStudents: {stats.students_done}/{args.students} finished in {elapsed:.1f}s")
+    print(f"{'operation':<16}{'count':>8}{'errors':>8}{'429':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for operation in sorted(stats.latencies):
+        values = sorted(stats.latencies[operation])
+        print(f"{operation:<16}{len(values):>8}{stats.errors[operation]:>8}{stats.rate_limited[operation]:>8}"
+              f"{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}"
+              f"{percentile(values, 99) * 1000:>10.1f}")
+    total_errors = sum(stats.errors.values())
+    print(f"\nQuizzes saved:     {stats.submitted}")
+    print(f"Lost writes:       {stats.lost_writes}")
+    print(f"Errors:            {total_errors}")
+    print(f"Rate limited:      {sum(stats.rate_limited.values())}")
+    return total_errors, stats.lost_writes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate classroom traffic against the ITS API")
+    parser.add_argument("--url", help="server to test (default: start a local one)")
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50, help="simultaneous students")
+    parser.add_argument("--window", type=float, default=60.0, help="seconds over which students arrive")
+    parser.add_argument("--quizzes", type=int, default=2, help="quiz submissions per student")
+    parser.add_argument("--guest-ratio", type=float, default=0.3)
+    parser.add_argument("--port", type=int, default=5055, help="port for the local server")
+    parser.add_argument("--server", choices=["auto", "gunicorn", "waitress"], default="auto")
+    parser.add_argument("--workers", type=int, help="local server worker processes")
+    parser.add_argument("--threads", type=int, help="local server threads per worker")
+    args = parser.parse_args()
+
+    server = None
+    scratch = None
+    if not args.url:
+        scratch = tempfile.mkdtemp(prefix="its-classroom-")
+        server = start_local_server(args, scratch)
+        args.url = f"http://127.0.0.1:{args.port}"
+    try:
+        if not wait_until_ready(args.url, timeout=60):
+            print(f"Server at {args.url} did not become ready")
+            sys.exit(2)
+
+        stats = Stats()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for index in range(args.students):
+                start_at = started + args.window * index / max(1, args.students)
+                executor.submit(run_student, index, args, stats, start_at)
+        errors, lost = report(stats, time.perf_counter() - started, args)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+        if scratch is not None:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    sys.exit(1 if errors or lost else 0)
+
+
+if __name__ == "__main__":
+    main()
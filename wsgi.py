@@ -0,0 +1,17 @@
+"""WSGI entry point for production servers (gunicorn, waitress, ...)
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+"""
+import os
+import sys
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from backend import app as app_module
+
+# Parse the ontology once here, so that with preload_app every forked
+# worker inherits the loaded index instead of parsing it again
+app_module.preload(timeout=float(os.environ.get("ITS_PRELOAD_TIMEOUT", "120")))
+
+application = app_module.app